@@ -1,10 +1,57 @@
-import logging
-import os
-
-import uvicorn
-from dotenv import load_dotenv
-
-if __name__ == "__main__":
-    load_dotenv()
-    logging.basicConfig(level=os.environ.get("LOG_LEVEL", logging.INFO))
-    uvicorn.run("app:app", host=os.environ["UVICORN_HOST"], port=8000, reload=True)
+import copy
+import os
+from typing import Any
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def log_config(level: str) -> dict[str, Any]:
+    """
+    The logging configuration of uvicorn, extended to the logs of the API.
+    uvicorn applies it in every worker process, unlike logging.basicConfig in this process
+    """
+    config = copy.deepcopy(uvicorn.config.LOGGING_CONFIG)
+    config["root"] = {"handlers": ["default"], "level": level}
+    return config
+
+
+def main() -> None:
+    """
+    Runs the API with uvicorn, configured by environment variables, see README.
+    By default it serves in production mode with one worker process per core.
+    With UVICORN_RELOAD=true, it serves with a single worker that reloads on code changes instead
+    """
+    load_dotenv()
+    level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    reload = os.environ.get("UVICORN_RELOAD", "false").lower() in ("1", "true")
+    cpu_count = os.cpu_count() or 1
+    workers = 1 if reload else int(os.environ.get("UVICORN_WORKERS", cpu_count))
+    # Each worker process splits in its own compute pool, together they should not use more processes than cores
+    os.environ.setdefault("COMPUTE_WORKERS", str(max(1, cpu_count // workers)))
+    limit_concurrency = os.environ.get("UVICORN_LIMIT_CONCURRENCY")
+
+    uvicorn.run(
+        "arch_api.app:app",
+        host=os.environ.get("UVICORN_HOST", "127.0.0.1"),
+        port=int(os.environ.get("UVICORN_PORT", 8000)),
+        reload=reload,
+        workers=workers,
+        # uvloop and httptools are used if they are installed, which they are except on Windows
+        loop="auto",
+        http="auto",
+        # Connections waiting to be accepted, e.g. during a burst of requests
+        backlog=int(os.environ.get("UVICORN_BACKLOG", 2048)),
+        # Seconds an idle connection is kept open for the next request, should exceed the one of a load balancer
+        timeout_keep_alive=int(os.environ.get("UVICORN_TIMEOUT_KEEP_ALIVE", 5)),
+        # Connections and tasks per worker beyond which requests get 503 Service Unavailable
+        limit_concurrency=int(limit_concurrency) if limit_concurrency else None,
+        # On shutdown, seconds to wait for requests in flight, e.g. splits being computed, before cancelling them
+        timeout_graceful_shutdown=int(os.environ.get("UVICORN_TIMEOUT_GRACEFUL_SHUTDOWN", 30)),
+        log_level=level.lower(),
+        log_config=log_config(level),
+    )
+
+
+if __name__ == "__main__":
+    main()
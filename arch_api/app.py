@@ -1,30 +1,217 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import datetime
+import functools
+import json
 import logging
 import os
-from typing import Annotated
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import TYPE_CHECKING, Annotated, Any, Literal
 
 import bson
 import fastapi
 from annotated_types import Interval
+from arch_api.cache import SplitCache, split_cache_key
+from arch_api.compute import ComputeExecutor, ExecutorKind
 from arch_api.db import (
+    DEFAULT_PAGE_SIZE,
     MAX_PAGE_SIZE,
+    DatabaseConnection,
+    PoolSettings,
+    ReadPreferenceMode,
+    WriteConcernLevel,
     delete_all_split_triples,
     delete_split_triple,
-    get_db,
+    ensure_indexes,
+    ensure_profiles_collection,
+    ensure_split_cache_ttl,
+    find_missing_indexes,
+    get_split_profile,
     get_split_triple,
+    iter_split_triples,
+    list_split_profiles,
     list_split_triples,
+    replace_split_triple,
+    save_split_profile,
     save_split_triple,
+    save_split_triples,
 )
-from arch_api.exceptions import SplittingError, invalid_object_id_handler
-from arch_api.models.io import CreateSplitInput, CreateSplitOutput
-from arch_api.splitting import split_building_limits_by_height_plateaus
+from arch_api.encoding import GeometryStorage, decode_feature_collection, encode_split_triple
+from arch_api.exceptions import (
+    ComputeQueueFullError,
+    ComputeTimeoutError,
+    InvalidCursorError,
+    InvalidFeatureChangesError,
+    SplittingError,
+    compute_queue_full_handler,
+    compute_timeout_handler,
+    invalid_cursor_handler,
+    invalid_feature_changes_handler,
+    invalid_object_id_handler,
+    splitting_error_handler,
+)
+from arch_api.metrics import (
+    CONTENT_TYPE,
+    ApiMetrics,
+    CommandDurationListener,
+    RequestMetricsMiddleware,
+    monitor_event_loop_lag,
+)
+from arch_api.models.io import (
+    MAX_BATCH_SIZE,
+    CreateSplitBatchItemOutput,
+    CreateSplitInput,
+    CreateSplitOutput,
+    FeatureCollectionChanges,
+    ImportSplitLineOutput,
+    ListSplitsOutput,
+    ProfileOutput,
+    ProfileSummaryOutput,
+    SplitField,
+    SplitFieldsOutput,
+    UpdateSplitInput,
+)
+from arch_api.pagination import decode_cursor, encode_cursor
+from arch_api.profiling import Profile, ProfileReason, ProfilingPolicy, run_profiled
+from arch_api.streaming import (
+    MAX_RECORD_SIZE,
+    RequestStreamingResponse,
+    chunked,
+    geojson_feature_collection,
+    gzip_compressed,
+    ndjson_lines,
+    ndjson_records,
+)
+from arch_api.warmup import BackgroundImport
 from bson.errors import InvalidId
 from dotenv import load_dotenv
-from fastapi import HTTPException, Query
-from pydantic.types import NonNegativeInt
+from fastapi import Body, Header, HTTPException, Query
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from pymongo.errors import PyMongoError
+
+if TYPE_CHECKING:
+    from arch_api.splitting import SplitResult
 
-# Initialize DB
+# Initialize the metrics that are served at GET /metrics
+_METRICS = ApiMetrics(compute_pending=lambda: _COMPUTE_EXECUTOR.pending)
+
+# Initialize DB. The client is only created in the lifespan of the app, and closed with it
 load_dotenv()
-_DATABASE = get_db(os.environ["MONGODB_URL"])
+_WRITE_CONCERN = os.environ.get("MONGODB_WRITE_CONCERN")
+_READ_PREFERENCE = os.environ.get("MONGODB_READ_PREFERENCE")
+_COMPRESSORS = os.environ.get("MONGODB_COMPRESSORS", "zstd")
+_MONGODB = DatabaseConnection(
+    os.environ["MONGODB_URL"],
+    write_concern=WriteConcernLevel(_WRITE_CONCERN) if _WRITE_CONCERN else None,
+    read_preference=ReadPreferenceMode(_READ_PREFERENCE) if _READ_PREFERENCE else None,
+    pool=PoolSettings(
+        max_size=int(os.environ["MONGODB_MAX_POOL_SIZE"]) if "MONGODB_MAX_POOL_SIZE" in os.environ else None,
+        min_size=int(os.environ["MONGODB_MIN_POOL_SIZE"]) if "MONGODB_MIN_POOL_SIZE" in os.environ else None,
+        max_idle_time=float(os.environ["MONGODB_MAX_IDLE_TIME"]) if "MONGODB_MAX_IDLE_TIME" in os.environ else None,
+        wait_queue_timeout=(
+            float(os.environ["MONGODB_WAIT_QUEUE_TIMEOUT"]) if "MONGODB_WAIT_QUEUE_TIMEOUT" in os.environ else None
+        ),
+    ),
+    compressors=_COMPRESSORS.split(",") if _COMPRESSORS else None,
+    event_listeners=[CommandDurationListener(_METRICS.mongodb_command_duration)],
+)
+
+# Initialize the executor that runs the CPU-heavy splitting off the event loop
+_COMPUTE_EXECUTOR: ComputeExecutor = ComputeExecutor(
+    kind=ExecutorKind(os.environ.get("COMPUTE_EXECUTOR", ExecutorKind.PROCESS)),
+    max_workers=int(os.environ["COMPUTE_WORKERS"]) if "COMPUTE_WORKERS" in os.environ else None,
+    max_queue_size=int(os.environ.get("COMPUTE_QUEUE_SIZE", 64)),
+    timeout=float(os.environ["COMPUTE_TIMEOUT"]) if "COMPUTE_TIMEOUT" in os.environ else None,
+    warm_up_modules=["arch_api.splitting"],
+)
+# Whether to start the workers of a process pool at startup, instead of on demand
+_COMPUTE_WARM_UP = os.environ.get("COMPUTE_WARM_UP", "true").lower() in ("1", "true")
+
+# The geospatial stack that arch_api.splitting uses takes over a tenth of a second to import. It is imported in the
+# background at startup instead, so that the API is ready sooner. Requests that split wait for it
+_SPLITTING = BackgroundImport("arch_api.splitting")
+
+# Initialize the cache for split results. The shared tier in MongoDB is opt-in, and enabled in the lifespan
+_SPLIT_CACHE = SplitCache(max_bytes=int(os.environ.get("SPLIT_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+_SPLIT_CACHE_SHARED = os.environ.get("SPLIT_CACHE_SHARED", "false").lower() in ("1", "true")
+# How long splits are kept in the shared tier
+_SPLIT_CACHE_TTL = datetime.timedelta(seconds=float(os.environ.get("SPLIT_CACHE_TTL", 7 * 24 * 60 * 60)))
+
+
+# How the geometry of new split triples is stored, existing ones can be converted with arch_api.migrate
+_GEOMETRY_STORAGE = GeometryStorage(os.environ.get("GEOMETRY_STORAGE", GeometryStorage.GEOJSON))
+
+
+# Which splits are profiled, see arch_api.profiling. Profiles are stored in a capped collection of PROFILE_MAX_BYTES
+_PROFILING = ProfilingPolicy(
+    sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0)),
+    min_duration=float(os.environ.get("PROFILE_MIN_DURATION", 1.0)),
+    allow_header=os.environ.get("PROFILE_HEADER", "false").lower() in ("1", "true"),
+)
+_PROFILE_MAX_BYTES = int(os.environ.get("PROFILE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+# Whether to create missing indexes at startup. If disabled, missing indexes are only reported
+_MANAGE_INDEXES = os.environ.get("MONGODB_MANAGE_INDEXES", "true").lower() in ("1", "true")
+
+
+async def _manage_indexes() -> None:
+    """
+    Creates the indexes of the database if enabled and reports the ones that are missing
+    """
+    try:
+        if _MANAGE_INDEXES:
+            await ensure_indexes(_MONGODB.db)
+            if _SPLIT_CACHE_SHARED:
+                await ensure_split_cache_ttl(_MONGODB.db, _SPLIT_CACHE_TTL)
+        missing = await find_missing_indexes(_MONGODB.db)
+    except PyMongoError:
+        logging.exception("Failed to manage the indexes of the database")
+        return
+    if missing:
+        logging.warning(f"Missing indexes on the splits collection: {', '.join(missing)}")
+
+
+async def _warm_up_compute() -> None:
+    """
+    Starts the workers of the compute pool, so that the first splits do not wait for them
+    """
+    try:
+        await _COMPUTE_EXECUTOR.warm_up()
+    except Exception:
+        logging.exception("Failed to warm up the compute pool")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_: fastapi.FastAPI) -> AsyncIterator[None]:
+    _SPLITTING.start()
+    warm_up_task = asyncio.create_task(_warm_up_compute()) if _COMPUTE_WARM_UP else None
+    database = _MONGODB.connect()
+    if _SPLIT_CACHE_SHARED:
+        _SPLIT_CACHE.db = database
+    # Building indexes can take a while on large collections, so it does not block startup
+    index_task = asyncio.create_task(_manage_indexes())
+    lag_task = asyncio.create_task(monitor_event_loop_lag(_METRICS.event_loop_lag))
+    # Profiles must not be stored before their collection is created as capped collection
+    if _PROFILING.enabled:
+        try:
+            await ensure_profiles_collection(database, _PROFILE_MAX_BYTES)
+        except PyMongoError:
+            logging.exception("Failed to create the profiles collection")
+    yield
+    index_task.cancel()
+    lag_task.cancel()
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    # Let pending splits finish before shutting down
+    await asyncio.to_thread(_COMPUTE_EXECUTOR.shutdown, wait=True)
+    _SPLIT_CACHE.db = None
+    _MONGODB.close()
+
 
 # Intialize app
 app = fastapi.FastAPI(
@@ -33,54 +220,533 @@ app = fastapi.FastAPI(
         "Consumes building limits and height plateaus, splits up the building limits "
         "according to the height plateaus, and stores these three entities persistently"
     ),
+    lifespan=lifespan,
 )
 # Attach exception handlers
 app.add_exception_handler(InvalidId, invalid_object_id_handler)
-app.add_exception_handler(SplittingError, invalid_object_id_handler)
+app.add_exception_handler(InvalidCursorError, invalid_cursor_handler)
+app.add_exception_handler(InvalidFeatureChangesError, invalid_feature_changes_handler)
+app.add_exception_handler(SplittingError, splitting_error_handler)
+app.add_exception_handler(ComputeQueueFullError, compute_queue_full_handler)
+app.add_exception_handler(ComputeTimeoutError, compute_timeout_handler)
+# Observe the duration of all requests
+app.add_middleware(RequestMetricsMiddleware, metrics=_METRICS)
+
+
+def _server_timing(timings: dict[str, float]) -> str:
+    """
+    Formats stage timings in seconds as Server-Timing header value with durations in milliseconds
+    """
+    return ", ".join(f"{name};dur={duration * 1000:.3f}" for name, duration in timings.items())
 
 
 @app.get("/health")
-async def health() -> dict[str, str]:
-    return {"health": "OK"}
+async def health() -> dict[str, Any]:
+    """
+    Reports that the API is up, and how saturated the connection pools to MongoDB are
+    """
+    return {"health": "OK", "mongodb_pool": _MONGODB.pool_monitor.stats()}
+
+
+@app.get("/cache/stats")
+async def cache_stats() -> dict[str, int]:
+    """
+    Hit and miss counters of the split cache
+    """
+    return _SPLIT_CACHE.stats()
+
+
+@app.get("/metrics", response_class=fastapi.responses.PlainTextResponse)
+async def metrics() -> fastapi.Response:
+    """
+    Metrics of this API instance in the text exposition format of Prometheus: latency histograms per route
+    and per stage of handling splits, the sizes of inputs, the durations of MongoDB commands,
+    the lag of the event loop, and the number of requests and splits in flight
+    """
+    return fastapi.Response(content=_METRICS.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/profiles")
+async def list_profiles(limit: Annotated[int, Query(ge=1, le=100)] = 20) -> list[ProfileSummaryOutput]:
+    """
+    List the most recent profiles of splits, newest first.
+    Requests are profiled if they ask for it with the X-Profile header, or at random. See README
+    """
+    return [ProfileSummaryOutput.from_doc(doc) for doc in await list_split_profiles(_MONGODB.db, limit)]
+
+
+@app.get("/profiles/{id}")
+async def get_profile(id: str) -> ProfileOutput:
+    """
+    Retrieve a profile of a split by id, with the input of the split, so that it can be reproduced,
+    and the functions with the highest cumulative time
+    """
+    # potential bson.errors.InvalidId is handled by exception handler
+    doc = await get_split_profile(_MONGODB.db, bson.ObjectId(id))
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return ProfileOutput.from_doc(doc)
+
+
+@app.get(
+    "/profiles/{id}/stats",
+    response_class=fastapi.Response,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+async def download_profile_stats(id: str) -> fastapi.Response:
+    """
+    Download the statistics of a profile of a split in the binary format of pstats,
+    e.g. to inspect them with python -m pstats or snakeviz
+    """
+    # potential bson.errors.InvalidId is handled by exception handler
+    doc = await get_split_profile(_MONGODB.db, bson.ObjectId(id), with_stats=True)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return fastapi.Response(
+        content=bytes(doc["stats"]),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{id}.prof"'},
+    )
 
 
-@app.get("/projects/{project}/splits/{id}")
-async def get_split(project: str, id: str) -> CreateSplitOutput:
+@app.get("/projects/{project}/splits/{id}", response_model=CreateSplitOutput | SplitFieldsOutput)
+async def get_split(
+    project: str, id: str, fields: Annotated[list[SplitField] | None, Query()] = None
+) -> fastapi.Response:
     """
-    Retrieve a split triple in a given project by id
+    Retrieve a split triple in a given project by id.
+    Pass fields, e.g. ?fields=summary, to only retrieve some fields besides id and project
     """
     # potential bson.errors.InvalidId is handled by exception handler
     object_id = bson.ObjectId(id)
 
-    doc = await get_split_triple(_DATABASE, project, object_id)
+    doc = await get_split_triple(_MONGODB.db, project, object_id, fields)
     if doc is None:
         raise HTTPException(status_code=404, detail="Split not found")
 
-    # Build output object
-    return CreateSplitOutput.from_doc(doc)
+    # The document was validated before it was stored, so it is serialized directly instead of being validated again
+    with _METRICS.stage_timer("serialize"):
+        if fields is not None:
+            content = SplitFieldsOutput.json_from_doc(doc, fields)
+        else:
+            content = CreateSplitOutput.json_from_doc(doc)
+    return fastapi.Response(content=content, media_type="application/json")
 
 
-@app.post("/projects/{project}/splits", status_code=fastapi.status.HTTP_201_CREATED)
-async def create_split(project: str, input: CreateSplitInput) -> CreateSplitOutput:
+async def _compute_split(
+    input: CreateSplitInput, pipeline: Callable[..., "SplitResult"] | None = None, profile: bool = False
+) -> tuple[dict[str, Any], str, dict[str, Any] | None]:
     """
-    Create a split triple in a given project from height_plateaus and building_limits
+    Splits the building limits of the input by its height plateaus, or takes the split from the cache
+
+    Args:
+        input (CreateSplitInput): The building limits and height plateaus
+        pipeline (Callable[..., SplitResult] | None): Called with the building limits and height plateaus to split
+            them, a partial of run_resplit_pipeline, or None for run_split_pipeline
+        profile (bool): Whether to profile the pipeline. The split is then computed even if it is cached
+
+    Returns:
+        tuple[dict[str, Any], str, dict[str, Any] | None]: Dict with the split as GeoJSON FeatureCollection under
+            "split", its summary under "summary" and its provenance under "provenance", the value of the
+            Server-Timing header, and if profiled, the stage timings, the statistics and the summary of the profile
     """
     logging.debug("Processing split")
-    split = split_building_limits_by_height_plateaus(input.building_limits, input.height_plateaus)
-    logging.debug("Processing split done")
+    complexity = input.complexity()
+    for collection in ("building_limits", "height_plateaus"):
+        _METRICS.input_features.observe(complexity[f"{collection}_features"], collection=collection)
+        _METRICS.input_vertices.observe(complexity[f"{collection}_vertices"], collection=collection)
+    # Hashing large inputs takes long enough to hold up other requests
+    cache_key = await asyncio.to_thread(split_cache_key, input.building_limits, input.height_plateaus)
+    if not profile:
+        entry = await _SPLIT_CACHE.get(cache_key)
+        if entry is not None:
+            logging.debug("Processing split done, served from cache")
+            return entry, 'cache;desc="hit"', None
+
+    await _SPLITTING.ready()
+    from arch_api.splitting import run_split_pipeline
+
+    if pipeline is None:
+        pipeline = run_split_pipeline
+    result: SplitResult
+    profile_doc = None
+    if profile:
+        profiled: tuple[SplitResult, Profile] = await _COMPUTE_EXECUTOR.run(
+            run_profiled, pipeline, input.building_limits, input.height_plateaus
+        )
+        result, split_profile = profiled
+        profile_doc = {
+            "timings": result.timings,
+            "stats": bson.Binary(split_profile.stats),
+            "summary": split_profile.summary,
+        }
+    else:
+        result = await _COMPUTE_EXECUTOR.run(pipeline, input.building_limits, input.height_plateaus)
+    for stage, duration in result.timings.items():
+        _METRICS.stage_duration.observe(duration, stage=stage)
+    entry = {"split": result.geojson, "summary": result.summary, "provenance": result.provenance}
+    await _SPLIT_CACHE.put(cache_key, entry)
+    logging.debug(f"Processing split done, stage timings: {result.timings}")
+    return entry, _server_timing(result.timings), profile_doc
+
+
+async def _save_profile(
+    reason: ProfileReason,
+    route: str,
+    project: str,
+    split_id: bson.ObjectId,
+    input: CreateSplitInput,
+    profile: dict[str, Any],
+    start: float,
+    changes: UpdateSplitInput | None = None,
+) -> str | None:
+    """
+    Stores the profile of a split together with its input, if the policy keeps it
+
+    Args:
+        reason (ProfileReason): Why the request was profiled
+        route (str): Method and route template of the request
+        project (str): Project name
+        split_id (bson.ObjectId): Id of the split triple that was stored
+        input (CreateSplitInput): The building limits and height plateaus that were split
+        profile (dict[str, Any]): The profile as returned by _compute_split
+        start (float): Value of time.perf_counter() when handling the request started
+        changes (UpdateSplitInput | None): The changes of a PATCH request
+
+    Returns:
+        str | None: The id of the stored profile, or None if it was not kept or could not be stored
+    """
+    duration = time.perf_counter() - start
+    if not _PROFILING.keep(reason, duration):
+        return None
+    doc = {
+        "created_at": datetime.datetime.now(datetime.UTC),
+        "route": route,
+        "project": project,
+        "split_id": split_id,
+        "reason": reason.value,
+        "duration": duration,
+        "complexity": input.complexity(),
+        "input": input.model_dump(),
+        "changes": changes.model_dump() if changes is not None else None,
+        **profile,
+    }
+    try:
+        profile_id = await save_split_profile(_MONGODB.db, doc)
+    except PyMongoError:
+        logging.exception("Failed to store the profile of a split")
+        return None
+    logging.info(f"Stored profile {profile_id} of a split that took {duration:.3f} s")
+    return str(profile_id)
+
+
+# Header of requests that ask to be profiled, and of their responses with the id of the stored profile
+ProfileHeader = Annotated[
+    bool, Header(description="Profile splitting this input, if enabled with PROFILE_HEADER. See GET /profiles")
+]
+
+
+@app.post("/projects/{project}/splits", status_code=fastapi.status.HTTP_201_CREATED, response_model=CreateSplitOutput)
+async def create_split(project: str, input: CreateSplitInput, x_profile: ProfileHeader = False) -> fastapi.Response:
+    """
+    Create a split triple in a given project from height_plateaus and building_limits.
+    The durations of the splitting stages are reported in the Server-Timing header.
+    The id of the profile of a profiled request is returned in the X-Profile-Id header
+    """
+    start = time.perf_counter()
+    reason = _PROFILING.decide(x_profile)
+    entry, server_timing, profile = await _compute_split(input, profile=reason is not None)
 
     # Persist the split
     logging.debug("Before save_split_triple")
     split_triple = {
         "building_limits": input.building_limits.model_dump(),
         "height_plateaus": input.height_plateaus.model_dump(),
-        "split": split.model_dump(),
+        "split": entry["split"],
+        "summary": entry["summary"],
+        "provenance": entry["provenance"],
     }
-    doc = await save_split_triple(_DATABASE, project, split_triple)
+    doc = await save_split_triple(_MONGODB.db, project, encode_split_triple(split_triple, _GEOMETRY_STORAGE))
     logging.debug("After save_split_triple")
 
-    # Build output object
-    return CreateSplitOutput.from_doc(doc)
+    # The split was produced by us and the inputs were validated on the way in,
+    # so the output is serialized directly instead of being validated again.
+    # It is built from the split triple as computed, so stored geometry never needs to be decoded here
+    with _METRICS.stage_timer("serialize"):
+        content = CreateSplitOutput.json_from_doc({**doc, **split_triple})
+    headers = {"Server-Timing": server_timing}
+    if reason is not None and profile is not None:
+        profile_id = await _save_profile(
+            reason, "POST /projects/{project}/splits", project, doc["_id"], input, profile, start
+        )
+        if profile_id is not None:
+            headers["X-Profile-Id"] = profile_id
+    return fastapi.Response(
+        content=content,
+        status_code=fastapi.status.HTTP_201_CREATED,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+async def _split_triple_or_error(
+    item: dict[str, Any] | bytes, semaphore: asyncio.Semaphore
+) -> dict[str, Any] | CreateSplitBatchItemOutput:
+    """
+    Validates and splits a single item of a batch or import, without letting its errors affect other items
+
+    Args:
+        item (dict[str, Any] | bytes): The input of the split, as dict or as JSON
+        semaphore (asyncio.Semaphore): Limits the number of items of the batch or import that are split at once
+
+    Returns:
+        dict[str, Any] | CreateSplitBatchItemOutput: The split triple to store, encoded for the geometry storage,
+            or the error that prevented creating it
+    """
+    try:
+        with _METRICS.stage_timer("parse"):
+            input = (
+                CreateSplitInput.model_validate_json(item)
+                if isinstance(item, bytes)
+                else CreateSplitInput.model_validate(item)
+            )
+    except ValidationError as exc:
+        return CreateSplitBatchItemOutput(
+            status=fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+            error={"detail": json.loads(exc.json(include_url=False))},
+        )
+    try:
+        async with semaphore:
+            entry, _, _ = await _compute_split(input)
+    except SplittingError as exc:
+        return CreateSplitBatchItemOutput(
+            status=fastapi.status.HTTP_400_BAD_REQUEST, error={"detail": str(exc), **exc.payload}
+        )
+    except (ComputeQueueFullError, ComputeTimeoutError) as exc:
+        return CreateSplitBatchItemOutput(
+            status=fastapi.status.HTTP_503_SERVICE_UNAVAILABLE, error={"detail": str(exc)}
+        )
+    except concurrent.futures.BrokenExecutor:
+        # A worker died while splitting, the pool is replaced for the next items
+        logging.exception("Compute pool broke while splitting an item")
+        return CreateSplitBatchItemOutput(
+            status=fastapi.status.HTTP_503_SERVICE_UNAVAILABLE, error={"detail": "The compute pool is restarting"}
+        )
+    except Exception:
+        logging.exception("Failed to split an item")
+        return CreateSplitBatchItemOutput(
+            status=fastapi.status.HTTP_500_INTERNAL_SERVER_ERROR, error={"detail": "Failed to split the input"}
+        )
+    split_triple = {
+        "building_limits": input.building_limits.model_dump(),
+        "height_plateaus": input.height_plateaus.model_dump(),
+        "split": entry["split"],
+        "summary": entry["summary"],
+        "provenance": entry["provenance"],
+    }
+    return encode_split_triple(split_triple, _GEOMETRY_STORAGE)
+
+
+@app.post("/projects/{project}/splits:batch", status_code=fastapi.status.HTTP_200_OK)
+async def create_splits_batch(
+    project: str,
+    items: Annotated[list[dict[str, Any]], Body(min_length=1, max_length=MAX_BATCH_SIZE)],
+) -> list[CreateSplitBatchItemOutput]:
+    """
+    Create split triples in a given project from a list of items, each having height_plateaus and building_limits
+    like the input of POST /projects/{project}/splits.
+    The items are split in parallel and all successful splits are stored with a single bulk insert.
+    Returns for each item, in the same order, either the id of the created split triple or the error.
+    An invalid item, or one that fails to be split, does not affect the others
+    """
+    # Leave room in the compute queue for other requests
+    semaphore = asyncio.Semaphore(_COMPUTE_EXECUTOR.max_workers)
+    results = await asyncio.gather(*(_split_triple_or_error(item, semaphore) for item in items))
+
+    # Persist all successful splits at once
+    split_triples = [result for result in results if isinstance(result, dict)]
+    ids = iter(await save_split_triples(_MONGODB.db, project, split_triples) if split_triples else [])
+    return [
+        CreateSplitBatchItemOutput(status=fastapi.status.HTTP_201_CREATED, id=str(next(ids)))
+        if isinstance(result, dict)
+        else result
+        for result in results
+    ]
+
+
+# Number of split triples that are stored at once by an import
+_IMPORT_INSERT_SIZE = int(os.environ.get("IMPORT_INSERT_SIZE", 100))
+
+
+async def _import_results(project: str, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Splits each line of an NDJSON body and stores the split triples in chunks
+
+    Args:
+        project (str): Project name
+        body (AsyncIterator[bytes]): The request body as it arrives
+
+    Yields:
+        bytes: One ImportSplitLineOutput as JSON line per non-empty line of the body
+    """
+    # Leave room in the compute queue for other requests, and bound the number of lines held in memory
+    semaphore = asyncio.Semaphore(_COMPUTE_EXECUTOR.max_workers)
+    max_pending = 2 * _COMPUTE_EXECUTOR.max_workers
+    pending: collections.deque[
+        tuple[int, asyncio.Task[dict[str, Any] | CreateSplitBatchItemOutput]]
+    ] = collections.deque()
+    to_insert: list[tuple[int, dict[str, Any]]] = []
+
+    def output(line: int, result: CreateSplitBatchItemOutput) -> bytes:
+        return ImportSplitLineOutput(line=line, **result.model_dump()).model_dump_json().encode() + b"\n"
+
+    async def insert() -> bytes:
+        lines = [line for line, _ in to_insert]
+        try:
+            ids = await save_split_triples(_MONGODB.db, project, [split_triple for _, split_triple in to_insert])
+        except PyMongoError:
+            logging.exception("Failed to store imported splits")
+            error = CreateSplitBatchItemOutput(
+                status=fastapi.status.HTTP_500_INTERNAL_SERVER_ERROR, error={"detail": "Failed to store the split"}
+            )
+            return b"".join(output(line, error) for line in lines)
+        finally:
+            to_insert.clear()
+        return b"".join(
+            output(line, CreateSplitBatchItemOutput(status=fastapi.status.HTTP_201_CREATED, id=str(id)))
+            for line, id in zip(lines, ids, strict=True)
+        )
+
+    async def complete_oldest() -> bytes:
+        line, task = pending.popleft()
+        result = await task
+        if isinstance(result, CreateSplitBatchItemOutput):
+            return output(line, result)
+        to_insert.append((line, result))
+        return await insert() if len(to_insert) >= _IMPORT_INSERT_SIZE else b""
+
+    try:
+        async for line, record in ndjson_records(body):
+            if record is None:
+                yield output(
+                    line,
+                    CreateSplitBatchItemOutput(
+                        status=fastapi.status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        error={"detail": f"Lines must not be longer than {MAX_RECORD_SIZE} bytes"},
+                    ),
+                )
+                continue
+            pending.append((line, asyncio.create_task(_split_triple_or_error(record, semaphore))))
+            if len(pending) >= max_pending:
+                yield await complete_oldest()
+        while pending:
+            yield await complete_oldest()
+        if to_insert:
+            yield await insert()
+    finally:
+        # The client went away, stop splitting its lines
+        for _, task in pending:
+            task.cancel()
+
+
+@app.post(
+    "/projects/{project}/splits:import",
+    status_code=fastapi.status.HTTP_200_OK,
+    response_class=RequestStreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def import_splits(project: str, request: fastapi.Request) -> RequestStreamingResponse:
+    """
+    Import split triples into a given project from a newline-delimited JSON body.
+    Each line is an input like the one of POST /projects/{project}/splits.
+    The body is read as it arrives, lines are split in parallel, and the split triples are stored in chunks.
+    Streams back one JSON line per non-empty line of the body, with the line number
+    and either the id of the created split triple or the error. Results are streamed as soon as they are known,
+    successful lines only once their chunk is stored. An invalid line, or one that fails to be split,
+    does not affect the others
+    """
+    return RequestStreamingResponse(_import_results(project, request.stream()), media_type="application/x-ndjson")
+
+
+@app.patch("/projects/{project}/splits/{id}", response_model=CreateSplitOutput)
+async def update_split(
+    project: str, id: str, input: UpdateSplitInput, x_profile: ProfileHeader = False
+) -> fastapi.Response:
+    """
+    Update a split triple in a given project by adding, removing or modifying features of its building_limits
+    or height_plateaus, and split it again. Indices refer to the features as stored.
+    Only the intersections of added or changed features are recomputed, the rest of the previous split is reused.
+    Modifying only properties, e.g. the elevation of a height plateau, needs no geometry work at all.
+    The durations of the splitting stages are reported in the Server-Timing header.
+    The id of the profile of a profiled request is returned in the X-Profile-Id header
+    """
+    start = time.perf_counter()
+    reason = _PROFILING.decide(x_profile)
+    # potential bson.errors.InvalidId is handled by exception handler
+    object_id = bson.ObjectId(id)
+
+    doc = await get_split_triple(_MONGODB.db, project, object_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Split not found")
+
+    await _SPLITTING.ready()
+    from arch_api.splitting import apply_feature_changes, run_resplit_pipeline, run_split_pipeline
+
+    # potential InvalidFeatureChangesError is handled by exception handler
+    previous_building_limits = decode_feature_collection(doc["building_limits"])
+    previous_height_plateaus = decode_feature_collection(doc["height_plateaus"])
+    building_limits_features, building_limits_changes = apply_feature_changes(
+        previous_building_limits["features"], input.building_limits or FeatureCollectionChanges()
+    )
+    height_plateaus_features, height_plateaus_changes = apply_feature_changes(
+        previous_height_plateaus["features"], input.height_plateaus or FeatureCollectionChanges()
+    )
+    try:
+        split_input = CreateSplitInput(
+            building_limits={**previous_building_limits, "features": building_limits_features},
+            height_plateaus={**previous_height_plateaus, "features": height_plateaus_features},
+        )
+    except ValidationError as exc:
+        raise RequestValidationError(json.loads(exc.json(include_url=False))) from exc
+
+    pipeline: Callable[..., SplitResult] = run_split_pipeline
+    # Split triples stored before the provenance of their features was recorded are split from scratch
+    if "provenance" in doc:
+        previous = {
+            "split": decode_feature_collection(doc["split"]),
+            "summary": doc["summary"],
+            "provenance": doc["provenance"],
+        }
+        pipeline = functools.partial(
+            run_resplit_pipeline,
+            previous=previous,
+            building_limits_changes=building_limits_changes,
+            height_plateaus_changes=height_plateaus_changes,
+        )
+    entry, server_timing, profile = await _compute_split(split_input, pipeline, profile=reason is not None)
+
+    split_triple = {
+        "building_limits": split_input.building_limits.model_dump(),
+        "height_plateaus": split_input.height_plateaus.model_dump(),
+        "split": entry["split"],
+        "summary": entry["summary"],
+        "provenance": entry["provenance"],
+    }
+    replaced = await replace_split_triple(
+        _MONGODB.db, project, object_id, encode_split_triple(split_triple, _GEOMETRY_STORAGE)
+    )
+    if not replaced:
+        raise HTTPException(status_code=404, detail="Split not found")
+    with _METRICS.stage_timer("serialize"):
+        content = CreateSplitOutput.json_from_doc({"_id": object_id, "project": project, **split_triple})
+    headers = {"Server-Timing": server_timing}
+    if reason is not None and profile is not None:
+        profile_id = await _save_profile(
+            reason, "PATCH /projects/{project}/splits/{id}", project, object_id, split_input, profile, start, input
+        )
+        if profile_id is not None:
+            headers["X-Profile-Id"] = profile_id
+    return fastapi.Response(content=content, media_type="application/json", headers=headers)
 
 
 @app.delete("/projects/{project}/splits/{id}", status_code=fastapi.status.HTTP_204_NO_CONTENT)
@@ -91,7 +757,7 @@ async def delete_split(project: str, id: str) -> None:
     # potential bson.errors.InvalidId is handled by exception handler
     object_id = bson.ObjectId(id)
 
-    deleted = await delete_split_triple(_DATABASE, project, object_id)
+    deleted = await delete_split_triple(_MONGODB.db, project, object_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Split not found")
 
@@ -101,21 +767,72 @@ async def delete_all_splits(project: str) -> dict[str, int]:
     """
     Delete all split triple in a given project
     """
-    num_deleted = await delete_all_split_triples(_DATABASE, project)
+    num_deleted = await delete_all_split_triples(_MONGODB.db, project)
     return {"num_deleted": num_deleted}
 
 
-IntInPageSizeInterval = Annotated[int, Interval(ge=0, le=MAX_PAGE_SIZE)]
+# Maximum number of split triples a client may request per page
+_MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", MAX_PAGE_SIZE))
+_DEFAULT_PAGE_SIZE = min(DEFAULT_PAGE_SIZE, _MAX_PAGE_SIZE)
+IntInPageSizeInterval = Annotated[int, Interval(ge=1, le=_MAX_PAGE_SIZE)]
 
 
-@app.get("/projects/{project}/splits", status_code=fastapi.status.HTTP_200_OK)
+@app.get("/projects/{project}/splits", status_code=fastapi.status.HTTP_200_OK, response_model=ListSplitsOutput)
 async def list_splits(
     project: str,
-    skip: Annotated[NonNegativeInt, Query()] = 0,
-    limit: Annotated[IntInPageSizeInterval, Query()] = MAX_PAGE_SIZE,
-) -> list[CreateSplitOutput]:
+    after: Annotated[str | None, Query()] = None,
+    limit: Annotated[IntInPageSizeInterval, Query()] = _DEFAULT_PAGE_SIZE,
+    fields: Annotated[list[SplitField] | None, Query()] = None,
+) -> fastapi.Response:
     """
-    List all split triples in a given project. Pagination can be achieved by using skip and limit.
+    List all split triples in a given project, one page at a time.
+    To get the next page, pass the next_cursor of the current page as after. next_cursor is null on the last page.
+    Pass fields, e.g. ?fields=summary, to only retrieve some fields besides id and project
     """
-    docs = await list_split_triples(_DATABASE, project, skip, limit)
-    return [CreateSplitOutput.from_doc(doc) for doc in docs]
+    # Fetch one more split triple to know whether there is a next page
+    docs = await list_split_triples(_MONGODB.db, project, decode_cursor(after) if after else None, limit + 1, fields)
+    next_cursor = encode_cursor(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    # The documents were validated before they were stored, see get_split
+    with _METRICS.stage_timer("serialize"):
+        content = ListSplitsOutput.json_from_docs(docs[:limit], next_cursor, fields)
+    return fastapi.Response(content=content, media_type="application/json")
+
+
+def _accepts_gzip(request: fastapi.Request) -> bool:
+    """
+    Whether the Accept-Encoding header of the request allows a gzip compressed response
+    """
+    for encoding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = encoding.strip().partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+@app.get("/projects/{project}/splits:export", status_code=fastapi.status.HTTP_200_OK)
+async def export_splits(
+    project: str,
+    request: fastapi.Request,
+    format: Annotated[Literal["ndjson", "geojson"], Query()] = "ndjson",
+    fields: Annotated[list[SplitField] | None, Query()] = None,
+) -> fastapi.responses.StreamingResponse:
+    """
+    Export all split triples in a given project as a stream.
+    With format=ndjson, each line is a split triple like the output of GET /projects/{project}/splits/{id},
+    restricted to fields if given. With format=geojson, the features of all splits are streamed as
+    a single GeoJSON FeatureCollection, with the id of their split triple in the "split_id" property.
+    The stream is compressed with gzip if the request accepts it
+    """
+    if format == "geojson":
+        parts = geojson_feature_collection(iter_split_triples(_MONGODB.db, project, ["split"]))
+        media_type = "application/geo+json"
+    else:
+        parts = ndjson_lines(iter_split_triples(_MONGODB.db, project, fields), fields)
+        media_type = "application/x-ndjson"
+
+    chunks = chunked(parts)
+    headers = {"Vary": "Accept-Encoding"}
+    if _accepts_gzip(request):
+        chunks = gzip_compressed(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return fastapi.responses.StreamingResponse(chunks, media_type=media_type, headers=headers)
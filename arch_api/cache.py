@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import math
+from collections import OrderedDict
+from collections.abc import Mapping
+from itertools import pairwise
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+from arch_api.db import get_cached_split, save_cached_split
+from arch_api.geometry import TOL, RaggedPolygonBuffers, polygon_buffers
+from arch_api.models.geojson import NonEmptyPolygon2dFeatureCollection
+from arch_api.models.io import BuildingLimits, HeightPlateaus
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
+
+# Coordinates are rounded to the number of decimals corresponding to the splitting tolerance,
+# so that inputs which only differ by rounding errors share a cache entry
+_NDIGITS = round(-math.log10(TOL))
+
+# Approximate size in JSON of a position with real-world coordinates, e.g. [10.7578362,59.9135581],
+# and of the rest of a feature of a split together with its properties and provenance
+_POSITION_BYTES = 40
+_FEATURE_BYTES = 100
+
+
+def split_cache_key(building_limits: BuildingLimits, height_plateaus: HeightPlateaus) -> str:
+    """
+    Computes a stable content hash of the inputs of a split.
+    The geometries are canonicalized first, so that the key does not depend on
+    the orientation and start vertex of the rings, the order of inner rings, or rounding errors below TOL.
+    The coordinates are canonicalized with numpy, as the key is computed for every split.
+    Computing it takes a while for large inputs, so the app computes it in a worker thread
+
+    Args:
+        building_limits (BuildingLimits): The building limits to split
+        height_plateaus (HeightPlateaus): The height plateaus to split by
+
+    Returns:
+        str: Hex digest identifying the inputs
+    """
+    digest = hashlib.sha256()
+    for feature_collection in (building_limits, height_plateaus):
+        _hash_feature_collection(digest, feature_collection)
+    return digest.hexdigest()
+
+
+def _hash_feature_collection(digest: "hashlib._Hash", feature_collection: NonEmptyPolygon2dFeatureCollection) -> None:
+    # The order of the features is kept, as it determines the order of the split results
+    features = feature_collection.features
+    properties = json.dumps([feature.properties or {} for feature in features], sort_keys=True, separators=(",", ":"))
+    coords, ring_offsets, polygon_offsets = _canonicalize_polygons(*polygon_buffers(features))
+    # Each part is prefixed with its length, so that the boundaries between them are part of the hash
+    for part in (properties.encode(), polygon_offsets.tobytes(), ring_offsets.tobytes(), coords.tobytes()):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+
+
+def _canonicalize_polygons(
+    coords: npt.NDArray[np.float64], ring_offsets: npt.NDArray[np.int64], polygon_offsets: npt.NDArray[np.int64]
+) -> RaggedPolygonBuffers:
+    # Adding 0.0 turns -0.0 into 0.0
+    coords = np.round(coords, _NDIGITS) + 0.0
+    # Drop the closing vertex of each ring, it is the same as the first one
+    is_closing = np.zeros(len(coords), dtype=bool)
+    is_closing[ring_offsets[1:] - 1] = True
+    vertices = coords[~is_closing]
+    starts = ring_offsets[:-1] - np.arange(len(ring_offsets) - 1)
+    lengths = np.diff(ring_offsets) - 1
+    ring_ids = np.repeat(np.arange(len(lengths)), lengths)
+
+    # Shoelace formula, positive for counterclockwise rings
+    following = np.arange(len(vertices)) + 1
+    following[starts + lengths - 1] = starts
+    x, y = vertices[:, 0], vertices[:, 1]
+    signed_areas = np.bincount(ring_ids, weights=x * y[following] - x[following] * y, minlength=len(lengths))
+    # Follow the right-hand rule of GeoJSON: exterior rings are counterclockwise, interior rings clockwise
+    is_exterior = np.zeros(len(lengths), dtype=bool)
+    is_exterior[polygon_offsets[:-1]] = True
+    reverse = (signed_areas > 0) != is_exterior
+
+    # Start each ring at its smallest vertex, and walk it backwards if it has to be reversed
+    smallest = np.lexsort((y, x, ring_ids))[starts] - starts
+    steps = np.arange(len(vertices)) - np.repeat(starts, lengths)
+    direction = np.where(reverse, -1, 1)
+    rotated = np.repeat(starts, lengths) + np.mod(
+        np.repeat(smallest, lengths) + np.repeat(direction, lengths) * steps, np.repeat(lengths, lengths)
+    )
+    # Close the rings again
+    closed = np.empty(len(coords), dtype=np.int64)
+    closed[~is_closing] = rotated
+    closed[is_closing] = rotated[starts]
+    coords = vertices[closed]
+
+    # The order of the inner rings has no geometric meaning
+    order = np.arange(len(lengths))
+    for start, end in pairwise(polygon_offsets.tolist()):
+        if end - start > 2:
+            order[start + 1 : end] = sorted(
+                order[start + 1 : end], key=lambda ring: coords[ring_offsets[ring] : ring_offsets[ring + 1]].tobytes()
+            )
+    if np.all(order[:-1] < order[1:]):
+        return coords, ring_offsets, polygon_offsets
+    ordered_lengths = np.diff(ring_offsets)[order]
+    ordered_offsets = np.zeros_like(ring_offsets)
+    np.cumsum(ordered_lengths, out=ordered_offsets[1:])
+    moved = np.repeat(ring_offsets[order] - ordered_offsets[:-1], ordered_lengths) + np.arange(len(coords))
+    return coords[moved], ordered_offsets, polygon_offsets
+
+
+class SplitCache:
+    """
+    Cache for split results, keyed by split_cache_key. Entries are dicts with the split as GeoJSON FeatureCollection
+    under "split", its summary metadata under "summary" and the provenance of its features under "provenance".
+
+    Consists of an in-process LRU tier, which evicts the least recently used splits once the
+    estimated serialized size of all entries exceeds max_bytes, and an optional shared tier in MongoDB
+    """
+
+    def __init__(self, max_bytes: int, db: AsyncIOMotorDatabase | None = None):
+        """
+        Args:
+            max_bytes (int): Maximum total size of the in-process tier. 0 disables the in-process tier
+            db (AsyncIOMotorDatabase | None): Database handle for the shared tier, or None to disable it
+        """
+        self.max_bytes = max_bytes
+        self.db = db
+        self._entries: OrderedDict[str, tuple[dict[str, Any], int]] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """
+        Returns the cached entry for the key, or None if there is none
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        if self.db is not None:
+            try:
+                doc = await get_cached_split(self.db, key)
+            except PyMongoError:
+                logging.exception("Failed to read from the shared split cache")
+                doc = None
+            if doc is not None:
+                self._put_local(key, doc, _estimated_size(doc))
+                self.shared_hits += 1
+                return doc
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, entry: dict[str, Any]) -> None:
+        """
+        Stores an entry under the key in all tiers
+        """
+        self._put_local(key, entry, _estimated_size(entry))
+        if self.db is not None:
+            try:
+                await save_cached_split(self.db, key, entry)
+            except PyMongoError:
+                logging.exception("Failed to write to the shared split cache")
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the hit and miss counters as well as the size of the in-process tier
+        """
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _put_local(self, key: str, entry: dict[str, Any], size: int) -> None:
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous[1]
+        self._entries[key] = (entry, size)
+        self._size += size
+        # Evict least recently used entries
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+
+def _estimated_size(entry: Mapping[str, Any]) -> int:
+    # Estimates the size of the entry serialized as JSON from its number of positions and features,
+    # which takes a fraction of the time of serializing it
+    features = entry["split"]["features"]
+    positions = sum(len(ring) for feature in features for ring in feature["geometry"]["coordinates"])
+    return _POSITION_BYTES * positions + _FEATURE_BYTES * len(features)
@@ -0,0 +1,188 @@
+import asyncio
+import concurrent.futures
+import enum
+import functools
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+from collections.abc import Callable, Sequence
+from typing import ParamSpec, TypeVar
+
+from arch_api.exceptions import ComputeQueueFullError, ComputeTimeoutError
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class ExecutorKind(str, enum.Enum):
+    """
+    The kind of executor that CPU-heavy jobs are run on
+    """
+
+    # Run jobs directly on the event loop. Useful for debugging and tests
+    INLINE = "inline"
+    # Run jobs in a thread pool. Shapely releases the GIL for most geometry operations
+    THREAD = "thread"
+    # Run jobs in a process pool, using all cores of the node
+    PROCESS = "process"
+
+
+class ComputeExecutor:
+    """
+    Runs CPU-heavy jobs, such as splitting building limits, off the event loop
+    so that I/O-bound requests are not stalled by them.
+
+    The number of jobs that are running or waiting for a worker is bounded by
+    max_workers + max_queue_size. Submitting a job beyond that raises a ComputeQueueFullError.
+    """
+
+    def __init__(
+        self,
+        kind: ExecutorKind = ExecutorKind.PROCESS,
+        max_workers: int | None = None,
+        max_queue_size: int = 64,
+        timeout: float | None = None,
+        retry_after: int = 1,
+        warm_up_modules: Sequence[str] = (),
+    ):
+        """
+        Args:
+            kind (ExecutorKind): Whether to run jobs inline, in a thread pool or in a process pool
+            max_workers (int | None): Number of workers. Defaults to the number of cores
+            max_queue_size (int): Number of jobs that may wait for a free worker
+            timeout (float | None): Timeout in seconds for a single job, or None for no timeout.
+                Not enforced for inline jobs
+            retry_after (int): Seconds a client is asked to wait before retrying when the queue is full
+            warm_up_modules (Sequence[str]): Modules that each worker of a process pool imports when it starts,
+                e.g. the ones of the jobs, so that its first job does not wait for them
+        """
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_queue_size < 0:
+            raise ValueError("max_queue_size must not be negative")
+        self.kind = ExecutorKind(kind)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.warm_up_modules = tuple(warm_up_modules)
+        self._pool: concurrent.futures.Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        """
+        Maximum number of jobs that can be running or waiting at the same time
+        """
+        return self.max_workers + self.max_queue_size
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of jobs that are currently running or waiting for a worker
+        """
+        return self._pending
+
+    async def run(self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """
+        Runs fn(*args, **kwargs) on the executor and waits for its result.
+        For process pools, fn, its arguments and its result must be picklable.
+
+        Raises:
+            ComputeQueueFullError: If there are already too many pending jobs
+            ComputeTimeoutError: If the job did not finish within the timeout
+        """
+        self._acquire()
+        if self.kind == ExecutorKind.INLINE:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._release()
+
+        try:
+            pool = self._get_pool()
+            future = pool.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Release the slot only once the worker is actually done with the job,
+        # which may be later than the timeout below
+        future.add_done_callback(lambda _: self._release())
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except TimeoutError as e:
+            raise ComputeTimeoutError(f"Computation did not finish within {self.timeout} seconds") from e
+        except concurrent.futures.BrokenExecutor:
+            # A worker died, e.g. because it ran out of memory. Start with a fresh pool for the next job
+            self._reset_pool(pool)
+            raise
+
+    async def warm_up(self) -> None:
+        """
+        Starts all workers of a process pool ahead of the first job, each importing warm_up_modules,
+        and waits until they are ready. Does nothing for other kinds, which share the imports of this process
+        """
+        if self.kind != ExecutorKind.PROCESS:
+            return
+        pool = self._get_pool()
+        # Without an idle worker, each job spawns another worker, up to max_workers
+        futures = [pool.submit(_noop) for _ in range(self.max_workers)]
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shuts down the underlying pool. If wait is True, blocks until all pending jobs are done
+        """
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise ComputeQueueFullError(
+                    "Too many splits are being computed at the moment, please retry later",
+                    retry_after=self.retry_after,
+                )
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _get_pool(self) -> concurrent.futures.Executor:
+        if self._pool is None:
+            if self.kind == ExecutorKind.THREAD:
+                self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            else:
+                # Forking a process that runs an event loop and database connections is unsafe,
+                # so the workers are spawned as fresh interpreters
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.warm_up_modules,),
+                )
+        return self._pool
+
+    def _reset_pool(self, broken_pool: concurrent.futures.Executor) -> None:
+        # Concurrent jobs on the broken pool must not discard a pool that was already replaced
+        if self._pool is broken_pool:
+            self._pool = None
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _init_worker(modules: tuple[str, ...]) -> None:
+    # Ctrl+C in a terminal interrupts the whole process group. The workers must finish their jobs
+    # while the API shuts down gracefully, and are stopped by ComputeExecutor.shutdown instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _noop() -> None:
+    pass
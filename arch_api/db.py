@@ -1,60 +1,428 @@
-from collections.abc import Mapping
+import dataclasses
+import datetime
+import enum
+import hashlib
+import threading
+from collections import Counter
+from collections.abc import AsyncIterator, Callable, Mapping, Sequence
 from typing import Any
 
 import bson
+from arch_api.encoding import GEOMETRY_FIELDS, GeometryStorage, decode_feature_collection, encode_feature_collection
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReadPreference, ReturnDocument, UpdateOne, common, monitoring
+from pymongo.errors import CollectionInvalid, OperationFailure
+from pymongo.read_preferences import _ServerMode
+from pymongo.write_concern import WriteConcern
 
-MAX_PAGE_SIZE = 10
+# Number of split triples per page when listing a project, and the default maximum a client may request
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
+# Indexes of the "splits" collection. All queries filter by project. The compound index
+# serves lookups by project and id, deleting all splits of a project, and listing a project in id order
+SPLIT_INDEXES = [
+    IndexModel([("project", ASCENDING), ("_id", ASCENDING)], name="project_1__id_1"),
+]
 
-def get_db(db_url: str) -> AsyncIOMotorDatabase:
+# Inputs of split triples that are stored once in a content-addressed collection of the same name,
+# and referenced from the split triples by their content hash under "<field>_id".
+# Each stored input counts the split triples that reference it under "refs", and is deleted once none does
+INPUT_FIELDS = ("building_limits", "height_plateaus")
+
+# Deleting all split triples of a project first claims them. A claim that is older than this belongs to a deletion
+# that failed midway, e.g. on a network error, and its split triples can be deleted again. Deleting takes far less
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+# Name of the TTL index of the shared split cache, which deletes cached splits some time after they were cached
+SPLIT_CACHE_TTL_INDEX = "created_at_ttl"
+# Error code of MongoDB for creating an index that exists with other options
+_INDEX_OPTIONS_CONFLICT = 85
+
+
+class WriteConcernLevel(str, enum.Enum):
+    """
+    How durable a write must be before MongoDB acknowledges it
+    """
+
+    # The primary applied the write
+    ACKNOWLEDGED = "acknowledged"
+    # A majority of the replica set applied the write
+    MAJORITY = "majority"
+    # The primary wrote the write to its on-disk journal
+    JOURNALED = "journaled"
+
+    def write_concern(self) -> WriteConcern:
+        """
+        Returns the pymongo WriteConcern corresponding to the level
+        """
+        if self is WriteConcernLevel.MAJORITY:
+            return WriteConcern(w="majority")
+        if self is WriteConcernLevel.JOURNALED:
+            return WriteConcern(w=1, j=True)
+        return WriteConcern(w=1)
+
+
+class ReadPreferenceMode(str, enum.Enum):
+    """
+    Which members of a replica set serve reads. Writes always go to the primary
+    """
+
+    # Only the primary, reads always see the latest writes
+    PRIMARY = "primary"
+    # The primary, or a secondary if the primary is unavailable
+    PRIMARY_PREFERRED = "primaryPreferred"
+    # Only secondaries, reads may not see the latest writes
+    SECONDARY = "secondary"
+    # A secondary, or the primary if no secondary is available
+    SECONDARY_PREFERRED = "secondaryPreferred"
+    # The member with the lowest latency, primary or secondary
+    NEAREST = "nearest"
+
+    def read_preference(self) -> _ServerMode:
+        """
+        Returns the pymongo read preference corresponding to the mode
+        """
+        return {
+            ReadPreferenceMode.PRIMARY: ReadPreference.PRIMARY,
+            ReadPreferenceMode.PRIMARY_PREFERRED: ReadPreference.PRIMARY_PREFERRED,
+            ReadPreferenceMode.SECONDARY: ReadPreference.SECONDARY,
+            ReadPreferenceMode.SECONDARY_PREFERRED: ReadPreference.SECONDARY_PREFERRED,
+            ReadPreferenceMode.NEAREST: ReadPreference.NEAREST,
+        }[self]
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolSettings:
+    """
+    Settings of the connection pool that the motor client keeps per server.
+    Settings that are None are left to the connection string, or to the defaults of pymongo
+    """
+
+    # Maximum number of connections. Beyond it, operations wait for a connection to be checked in
+    max_size: int | None = None
+    # Number of connections that are kept open even when idle, so that bursts do not wait for new connections
+    min_size: int | None = None
+    # Seconds after which an idle connection beyond min_size is closed
+    max_idle_time: float | None = None
+    # Seconds an operation waits for a connection when max_size are in use, before failing
+    wait_queue_timeout: float | None = None
+
+    def client_options(self) -> dict[str, Any]:
+        """
+        Returns the settings as keyword arguments of AsyncIOMotorClient
+        """
+        options = {
+            "maxPoolSize": self.max_size,
+            "minPoolSize": self.min_size,
+            "maxIdleTimeMS": int(self.max_idle_time * 1000) if self.max_idle_time is not None else None,
+            "waitQueueTimeoutMS": int(self.wait_queue_timeout * 1000) if self.wait_queue_timeout is not None else None,
+        }
+        return {name: value for name, value in options.items() if value is not None}
+
+
+@dataclasses.dataclass
+class _PoolState:
+    max_size: int
+    open: int = 0
+    checked_out: int = 0
+    waiting: int = 0
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Tracks the connection pools of a motor client, one per server, to report how saturated they are.
+    pymongo notifies it from its own threads, so the counters are guarded by a lock
+    """
+
+    def __init__(self) -> None:
+        self._pools: dict[Any, _PoolState] = {}
+        self._lock = threading.Lock()
+        self.wait_queue_timeouts = 0
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the number of connections over all pools, and the saturation of the most saturated pool,
+        the share of its max_size that is checked out. At a saturation of 1, operations wait for a connection
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+            wait_queue_timeouts = self.wait_queue_timeouts
+        return {
+            "pools": len(pools),
+            "max_size": sum(pool.max_size for pool in pools),
+            "open": sum(pool.open for pool in pools),
+            "checked_out": sum(pool.checked_out for pool in pools),
+            "waiting": sum(pool.waiting for pool in pools),
+            "wait_queue_timeouts": wait_queue_timeouts,
+            # A max_size of 0 means that the pool is not bounded
+            "saturation": max((pool.checked_out / pool.max_size for pool in pools if pool.max_size), default=0.0),
+        }
+
+    def _update(self, address: Any, **deltas: int) -> None:
+        with self._lock:
+            pool = self._pools.get(address)
+            if pool is not None:
+                for name, delta in deltas.items():
+                    setattr(pool, name, getattr(pool, name) + delta)
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        # The options only contain the settings that differ from the defaults
+        max_size = event.options.get("maxPoolSize", common.MAX_POOL_SIZE)
+        with self._lock:
+            self._pools[event.address] = _PoolState(max_size=max_size)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        with self._lock:
+            self._pools.pop(event.address, None)
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        self._update(event.address, waiting=-1)
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            with self._lock:
+                self.wait_queue_timeouts += 1
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        self._update(event.address, waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        self._update(event.address, checked_out=-1)
+
+
+def get_db(
+    db_url: str,
+    write_concern: WriteConcernLevel | None = None,
+    read_preference: ReadPreferenceMode | None = None,
+    pool: PoolSettings | None = None,
+    compressors: Sequence[str] | None = None,
+    event_listeners: Sequence[monitoring.CommandListener | monitoring.ConnectionPoolListener] = (),
+) -> AsyncIOMotorDatabase:
     """
     Connects to MongoDB using motor and creates a "splits" collection in the "arch-api" database.
 
     Args:
         db_url (str): A MongoDB connection string, e.g. mongodb://localhost:27017
+        write_concern (WriteConcernLevel | None): Write concern for all writes to the database,
+            or None to use the one of the connection string
+        read_preference (ReadPreferenceMode | None): Which members of a replica set serve reads,
+            or None to use the one of the connection string
+        pool (PoolSettings | None): Settings of the connection pools, or None to use the ones of the connection string
+        compressors (Sequence[str] | None): Wire protocol compressors in order of preference, e.g. zstd or snappy,
+            or None to use the ones of the connection string. The first one the server supports is used
+        event_listeners (Sequence[monitoring.CommandListener | monitoring.ConnectionPoolListener]): Listeners
+            that are notified of every command, e.g. to measure its duration, or of connection pool events
 
     Returns:
         AsyncIOMotorDatabase: A motor database handle to interact with the DB
     """
-    client = AsyncIOMotorClient(db_url)
-    db = client["arch-api"]  # setup mongodb database
+    options = pool.client_options() if pool is not None else {}
+    if compressors is not None:
+        options["compressors"] = list(compressors)
+    client = AsyncIOMotorClient(db_url, event_listeners=list(event_listeners), **options)
+    # setup mongodb database
+    # motor-types misspells the read_preference argument of get_database as read_preferences
+    db = client.get_database(  # type: ignore[call-arg]
+        "arch-api",
+        write_concern=WriteConcernLevel(write_concern).write_concern() if write_concern is not None else None,
+        read_preference=ReadPreferenceMode(read_preference).read_preference() if read_preference is not None else None,
+    )
     _collection = db["splits"]  # setup mongodb collection
     return db
 
 
+class DatabaseConnection:
+    """
+    Holds the motor client of the app, so that it is created and closed with the lifespan of the app
+    instead of at import time. The settings are the ones of get_db
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        write_concern: WriteConcernLevel | None = None,
+        read_preference: ReadPreferenceMode | None = None,
+        pool: PoolSettings | None = None,
+        compressors: Sequence[str] | None = None,
+        event_listeners: Sequence[monitoring.CommandListener] = (),
+    ):
+        self.db_url = db_url
+        self.write_concern = write_concern
+        self.read_preference = read_preference
+        self.pool = pool
+        self.compressors = compressors
+        self.event_listeners = event_listeners
+        self.pool_monitor = PoolMonitor()
+        self._db: AsyncIOMotorDatabase | None = None
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        """
+        The database handle
+
+        Raises:
+            RuntimeError: If the connection is not open
+        """
+        if self._db is None:
+            raise RuntimeError("Not connected to MongoDB, the connection is opened in the lifespan of the app")
+        return self._db
+
+    def connect(self) -> AsyncIOMotorDatabase:
+        """
+        Creates the motor client. It connects in the background, the first operation waits for it
+
+        Returns:
+            AsyncIOMotorDatabase: The database handle
+        """
+        if self._db is None:
+            self._db = get_db(
+                self.db_url,
+                write_concern=self.write_concern,
+                read_preference=self.read_preference,
+                pool=self.pool,
+                compressors=self.compressors,
+                event_listeners=[*self.event_listeners, self.pool_monitor],
+            )
+        return self._db
+
+    def close(self) -> None:
+        """
+        Closes the motor client and all its connections
+        """
+        db, self._db = self._db, None
+        if db is not None:
+            db.client.close()
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> list[str]:
+    """
+    Creates the indexes of the "splits" collection, see SPLIT_INDEXES.
+    Idempotent, indexes that already exist are left untouched.
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+    Returns:
+        list[str]: Names of the indexes
+    """
+    collection: AsyncIOMotorCollection = db["splits"]
+    names: list[str] = await collection.create_indexes(SPLIT_INDEXES)
+    return names
+
+
+async def find_missing_indexes(db: AsyncIOMotorDatabase) -> list[str]:
+    """
+    Checks which indexes of the "splits" collection are missing, see SPLIT_INDEXES.
+    Indexes are compared by their keys, so an index under another name counts as existing.
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+    Returns:
+        list[str]: Names of the missing indexes
+    """
+    collection: AsyncIOMotorCollection = db["splits"]
+    existing = [list(index["key"]) for index in (await collection.index_information()).values()]
+    return [index.document["name"] for index in SPLIT_INDEXES if list(index.document["key"].items()) not in existing]
+
+
 async def save_split_triple(db: AsyncIOMotorDatabase, project: str, split_triple: dict[str, Any]) -> Mapping[str, Any]:
     """
     Saves a split triple consisting of building_limits, height_plateaus, and splits to the database.
     Args:
         db (AsyncIOMotorDatabase): Database handle
         project (str): Project name
-        split_triple (dict): Dict containing the split triple. Keys are "building_limits", "height_plateaus", and "split"
+        split_triple (dict): Dict containing the split triple. Keys are "building_limits", "height_plateaus", and "split",
+            "summary" with the summary metadata of the split, and "provenance" with the provenance of its features
     Returns:
         Mapping[str, Any]: Document representing the saved split triple, containing also id and project
     """
-    # insert
     collection: AsyncIOMotorCollection = db["splits"]
-    res = await collection.insert_one({"project": project, **split_triple})
-    # fetch inserted document
-    doc = await get_split_triple(db, project, res.inserted_id)
-    assert doc is not None
-    return doc
+    (doc,) = await _save_inputs(db, [{"project": project, **split_triple}])
+    res = await collection.insert_one(doc)
+    # The saved split triple is the given one plus its id, no need to read it back
+    return {"_id": res.inserted_id, "project": project, **split_triple}
 
 
-async def get_split_triple(db: AsyncIOMotorDatabase, project: str, id: bson.ObjectId) -> Mapping[str, Any] | None:
+async def save_split_triples(
+    db: AsyncIOMotorDatabase, project: str, split_triples: list[dict[str, Any]]
+) -> list[bson.ObjectId]:
+    """
+    Saves multiple split triples to the database with a single bulk insert.
+    Inputs shared by several of the split triples are only stored once.
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        project (str): Project name
+        split_triples (list[dict]): Dicts containing the split triples, see save_split_triple
+    Returns:
+        list[bson.ObjectId]: The ids of the saved split triples, in the same order as split_triples
+    """
+    collection: AsyncIOMotorCollection = db["splits"]
+    docs = await _save_inputs(db, [{"project": project, **split_triple} for split_triple in split_triples])
+    res = await collection.insert_many(docs)
+    return list(res.inserted_ids)
+
+
+async def replace_split_triple(
+    db: AsyncIOMotorDatabase, project: str, id: bson.ObjectId, split_triple: dict[str, Any]
+) -> bool:
+    """
+    Replaces a saved split triple by id, keeping its id
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        project (str): Project name
+        id (bson.ObjectId): bson ObjectId corresponding to the split triple
+        split_triple (dict): Dict containing the new split triple, see save_split_triple
+    Returns:
+        bool: True if the split triple was replaced, False if there was no object with the given id
+    """
+    collection: AsyncIOMotorCollection = db["splits"]
+    (doc,) = await _save_inputs(db, [{"project": project, **split_triple}])
+    # The inputs of the new split triple are referenced before the ones of the replaced one are released,
+    # so that inputs they share are never deleted in between
+    previous = await collection.find_one_and_replace(
+        {"project": project, "_id": id, **_unclaimed()},
+        doc,
+        projection=_INPUT_KEYS_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+    )
+    await _release_inputs(db, [doc] if previous is None else [previous])
+    return previous is not None
+
+
+async def get_split_triple(
+    db: AsyncIOMotorDatabase, project: str, id: bson.ObjectId, fields: Sequence[str] | None = None
+) -> Mapping[str, Any] | None:
     """
     Retrieves a saved split triple consisting of building_limits, height_plateaus, and splits from the database
     Args:
         db (AsyncIOMotorDatabase): Database handle
         project (str): Project name
         id (bson.ObjectId): bson ObjectId corresponding to the split triple
+        fields (Sequence[str] | None): Fields of the document to fetch besides id and project, or None for all fields
     Returns:
         Mapping[str, Any] | None: Document representing the saved split triple, containing also id and project, or None if there is no object with the given id
     """
     collection: AsyncIOMotorCollection = db["splits"]
-    doc = await collection.find_one({"project": project, "_id": id})
-    return doc
+    projection = _projection(fields)
+    doc = await collection.find_one({"project": project, "_id": id}, projection=projection)
+    if doc is None:
+        return None
+    docs = await _with_inputs(db, [doc], projection)
+    return docs[0] if docs else None
 
 
 async def delete_split_triple(db: AsyncIOMotorDatabase, project: str, id: bson.ObjectId) -> bool:
@@ -68,8 +436,13 @@ async def delete_split_triple(db: AsyncIOMotorDatabase, project: str, id: bson.O
         bool: True if the split triple was deleted, False if there was no object with the given id
     """
     collection: AsyncIOMotorCollection = db["splits"]
-    res = await collection.delete_one({"project": project, "_id": id})
-    return res.deleted_count > 0
+    doc = await collection.find_one_and_delete(
+        {"project": project, "_id": id, **_unclaimed()}, projection=_INPUT_KEYS_PROJECTION
+    )
+    if doc is None:
+        return False
+    await _release_inputs(db, [doc])
+    return True
 
 
 async def delete_all_split_triples(db: AsyncIOMotorDatabase, project: str) -> int:
@@ -82,21 +455,389 @@ async def delete_all_split_triples(db: AsyncIOMotorDatabase, project: str) -> in
         int: The number of deleted objects
     """
     collection: AsyncIOMotorCollection = db["splits"]
-    res = await collection.delete_many({"project": project})
+    # Claim the split triples first, so that each one is released exactly once,
+    # even if it is deleted or replaced concurrently. Claims of failed deletions are taken over
+    claim = {"project": project, "deleting": bson.ObjectId()}
+    await collection.update_many({"project": project, **_unclaimed()}, {"$set": {"deleting": claim["deleting"]}})
+    docs = await collection.find(claim, projection=_INPUT_KEYS_PROJECTION).to_list(length=None)
+    res = await collection.delete_many(claim)
+    await _release_inputs(db, docs)
     return res.deleted_count
 
 
-async def list_split_triples(db: AsyncIOMotorDatabase, project: str, skip: int, limit: int) -> list[Mapping[str, Any]]:
+async def list_split_triples(
+    db: AsyncIOMotorDatabase, project: str, after: bson.ObjectId | None, limit: int, fields: Sequence[str] | None = None
+) -> list[Mapping[str, Any]]:
     """
-    Lists saved split triples for a given project. Pagination can be achieved by using skip and limit.
+    Lists saved split triples for a given project in the order of their ids.
+    Pagination is keyset based: a page starts after the id of the last split triple of the previous page,
+    so that the (project, _id) index leads directly to it, no matter how deep the page is.
     Args:
         db (AsyncIOMotorDatabase): Database handle
         project (str): Project name
-        skip (int): Number of documents to skip in the cursor
-        limit (int): Number of documents to return at the cursor position
+        after (bson.ObjectId | None): Id of the last split triple of the previous page, or None for the first page
+        limit (int): Maximum number of split triples to return
+        fields (Sequence[str] | None): Fields of the documents to fetch besides id and project, or None for all fields
     Returns:
-        list[Mapping[str, Any]]: List of the split triples at the given cursor position
+        list[Mapping[str, Any]]: List of the split triples of the page
     """
     collection: AsyncIOMotorCollection = db["splits"]
-    docs = await collection.find({"project": project}, skip=skip, limit=limit).to_list(length=MAX_PAGE_SIZE)
+    query: dict[str, Any] = {"project": project}
+    if after is not None:
+        query["_id"] = {"$gt": after}
+    projection = _projection(fields)
+    docs = await collection.find(query, projection=projection, sort=[("_id", ASCENDING)], limit=limit).to_list(
+        length=limit
+    )
+    return await _with_inputs(db, docs, projection)
+
+
+async def iter_split_triples(
+    db: AsyncIOMotorDatabase, project: str, fields: Sequence[str] | None = None, batch_size: int = 100
+) -> AsyncIterator[Mapping[str, Any]]:
+    """
+    Iterates over all saved split triples of a given project in the order of their ids.
+    Documents are fetched from the database in batches while iterating, so memory stays bounded
+    no matter how many split triples the project has. The inputs of each batch are fetched at once
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        project (str): Project name
+        fields (Sequence[str] | None): Fields of the documents to fetch besides id and project, or None for all fields
+        batch_size (int): Number of documents fetched from the database at once
+    Yields:
+        Mapping[str, Any]: The split triples
+    """
+    collection: AsyncIOMotorCollection = db["splits"]
+    projection = _projection(fields)
+    cursor = collection.find(
+        {"project": project}, projection=projection, sort=[("_id", ASCENDING)], batch_size=batch_size
+    )
+    batch: list[Mapping[str, Any]] = []
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                for doc in await _with_inputs(db, batch, projection):
+                    yield doc
+                batch = []
+        for doc in await _with_inputs(db, batch, projection):
+            yield doc
+    finally:
+        # Free the cursor on the server if the client stops reading early
+        await cursor.close()
+
+
+async def migrate_geometry_storage(
+    db: AsyncIOMotorDatabase, storage: GeometryStorage, project: str | None = None, batch_size: int = 100
+) -> int:
+    """
+    Converts the geometry of saved split triples and their inputs to the given storage, see arch_api.encoding.
+    Documents that are already stored that way are left alone, so an interrupted migration can be resumed.
+    Inputs keep their content hash as key, as readers decode either storage
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        storage (GeometryStorage): How the geometry should be stored
+        project (str | None): Project name, or None for all projects
+        batch_size (int): Number of documents read and updated at once
+    Returns:
+        int: The number of converted documents
+    """
+    convert = encode_feature_collection if storage is GeometryStorage.BINARY else decode_feature_collection
+    encoded = {"$exists": storage is GeometryStorage.GEOJSON}
+
+    query: dict[str, Any] = {"split.encoding": encoded}
+    if project is not None:
+        query["project"] = project
+    num_converted = await _convert_geometry(db["splits"], query, GEOMETRY_FIELDS, convert, batch_size)
+
+    for field in INPUT_FIELDS:
+        query = {"feature_collection.encoding": encoded}
+        if project is not None:
+            query["_id"] = {"$in": await db["splits"].distinct(f"{field}_id", {"project": project})}
+        num_converted += await _convert_geometry(db[field], query, ("feature_collection",), convert, batch_size)
+    return num_converted
+
+
+async def _convert_geometry(
+    collection: AsyncIOMotorCollection,
+    query: Mapping[str, Any],
+    fields: Sequence[str],
+    convert: Callable[[Mapping[str, Any]], dict[str, Any]],
+    batch_size: int,
+) -> int:
+    # Convert the FeatureCollections in the fields of the matching documents with bulk updates
+    num_converted = 0
+    updates: list[UpdateOne] = []
+    async for doc in collection.find(query, projection=list(fields), batch_size=batch_size):
+        values = {field: convert(doc[field]) for field in fields if field in doc}
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": values}))
+        if len(updates) == batch_size:
+            num_converted += (await collection.bulk_write(updates, ordered=False)).modified_count
+            updates = []
+    if updates:
+        num_converted += (await collection.bulk_write(updates, ordered=False)).modified_count
+    return num_converted
+
+
+def _projection(fields: Sequence[str] | None) -> dict[str, bool] | None:
+    # Only transfer the requested fields from the database, _id is always included
+    if fields is None:
+        return None
+    projection = {"project": True, **{field: True for field in fields}}
+    # Inputs are either embedded or referenced
+    projection.update({f"{field}_id": True for field in INPUT_FIELDS if field in fields})
+    return projection
+
+
+def _content_key(feature_collection: Mapping[str, Any]) -> str:
+    # Hash of the exact stored content, unlike split_cache_key, which identifies geometrically equal inputs
+    return hashlib.sha256(bson.encode(feature_collection)).hexdigest()
+
+
+def _unclaimed() -> dict[str, Any]:
+    # Matches split triples that no deletion of all split triples is deleting, see delete_all_split_triples.
+    # Claims are ObjectIds, which start with the time they were created at
+    stale = bson.ObjectId.from_datetime(datetime.datetime.now(datetime.UTC) - CLAIM_TIMEOUT)
+    return {"$or": [{"deleting": {"$exists": False}}, {"deleting": {"$lt": stale}}]}
+
+
+# Only the references to the inputs are needed to release them
+_INPUT_KEYS_PROJECTION = {f"{field}_id": True for field in INPUT_FIELDS}
+# How often a split triple is read at most while its inputs are released concurrently, see _with_inputs
+_READ_ATTEMPTS = 3
+
+
+async def _save_inputs(db: AsyncIOMotorDatabase, docs: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Stores the inputs of the documents of split triples in their content-addressed collections,
+    or counts the new references to the ones that are stored already
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        docs (list[dict[str, Any]]): Documents of split triples with embedded inputs
+    Returns:
+        list[dict[str, Any]]: The documents with references to the inputs instead of the inputs
+    """
+    docs = [dict(doc) for doc in docs]
+    for field in INPUT_FIELDS:
+        inputs: dict[str, Mapping[str, Any]] = {}
+        refs: Counter[str] = Counter()
+        for doc in docs:
+            key = _content_key(doc[field])
+            inputs[key] = doc.pop(field)
+            refs[key] += 1
+            doc[f"{field}_id"] = key
+        collection: AsyncIOMotorCollection = db[field]
+        # A single atomic upsert per input, so that a concurrent release either sees the new references
+        # or has deleted the input before it is stored again. MongoDB retries upserts that race on the _id
+        updates = [
+            UpdateOne(
+                {"_id": key},
+                {"$setOnInsert": {"feature_collection": value}, "$inc": {"refs": refs[key]}},
+                upsert=True,
+            )
+            for key, value in inputs.items()
+        ]
+        await collection.bulk_write(updates, ordered=False)
     return docs
+
+
+async def _release_inputs(db: AsyncIOMotorDatabase, docs: Sequence[Mapping[str, Any]]) -> None:
+    """
+    Releases the references of deleted or replaced split triples to their inputs,
+    and deletes the inputs that are no longer referenced
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        docs (Sequence[Mapping[str, Any]]): Documents of the split triples with the references to their inputs.
+            Documents with embedded inputs, saved before inputs were deduplicated, are skipped
+    """
+    for field in INPUT_FIELDS:
+        refs = Counter(doc[f"{field}_id"] for doc in docs if f"{field}_id" in doc)
+        if not refs:
+            continue
+        collection: AsyncIOMotorCollection = db[field]
+        updates = [UpdateOne({"_id": key}, {"$inc": {"refs": -count}}) for key, count in refs.items()]
+        await collection.bulk_write(updates, ordered=False)
+        await collection.delete_many({"_id": {"$in": list(refs)}, "refs": {"$lte": 0}})
+
+
+async def _with_inputs(
+    db: AsyncIOMotorDatabase, docs: list[Mapping[str, Any]], projection: Mapping[str, bool] | None = None
+) -> list[Mapping[str, Any]]:
+    """
+    Replaces the references to inputs in documents of split triples by the inputs, fetching each input once.
+    Documents with embedded inputs, saved before inputs were deduplicated, are left as they are.
+
+    A split triple that was deleted or replaced after it was read may reference inputs that are released already.
+    Such split triples are read again, so that replaced ones reference their new inputs and deleted ones are left out
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        docs (list[Mapping[str, Any]]): Documents of split triples
+        projection (Mapping[str, bool] | None): Projection the documents were read with, to read them again
+    Returns:
+        list[Mapping[str, Any]]: The documents with the inputs that were projected, in the same order,
+            without the ones that no longer exist
+    """
+    resolved: dict[bson.ObjectId, Mapping[str, Any]] = {}
+    pending = docs
+    for attempt in range(_READ_ATTEMPTS):
+        stale = []
+        for doc, resolved_doc in zip(pending, await _resolve_inputs(db, pending), strict=True):
+            if resolved_doc is None:
+                stale.append(doc["_id"])
+            else:
+                resolved[doc["_id"]] = resolved_doc
+        if not stale or attempt == _READ_ATTEMPTS - 1:
+            break
+        collection: AsyncIOMotorCollection = db["splits"]
+        pending = await collection.find({"_id": {"$in": stale}}, projection=projection).to_list(length=None)
+    return [resolved[doc["_id"]] for doc in docs if doc["_id"] in resolved]
+
+
+async def _resolve_inputs(db: AsyncIOMotorDatabase, docs: list[Mapping[str, Any]]) -> list[Mapping[str, Any] | None]:
+    # Like _with_inputs, with None for the documents whose inputs no longer exist
+    resolved: list[Mapping[str, Any] | None] = list(docs)
+    for field in INPUT_FIELDS:
+        keys = {doc[f"{field}_id"] for doc in docs if f"{field}_id" in doc}
+        if not keys:
+            continue
+        collection: AsyncIOMotorCollection = db[field]
+        inputs = {doc["_id"]: doc["feature_collection"] async for doc in collection.find({"_id": {"$in": list(keys)}})}
+        for index, doc in enumerate(resolved):
+            if doc is None or f"{field}_id" not in doc:
+                continue
+            key = doc[f"{field}_id"]
+            resolved[index] = (
+                {**{name: value for name, value in doc.items() if name != f"{field}_id"}, field: inputs[key]}
+                if key in inputs
+                else None
+            )
+    return resolved
+
+
+async def get_cached_split(db: AsyncIOMotorDatabase, key: str) -> dict[str, Any] | None:
+    """
+    Retrieves a cached split, its summary and its provenance from the shared split cache
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        key (str): Cache key of the split, see arch_api.cache.split_cache_key
+    Returns:
+        dict[str, Any] | None: Dict with the keys "split", "summary" and "provenance",
+            or None if there is no split cached under the key
+    """
+    collection: AsyncIOMotorCollection = db["split_cache"]
+    doc = await collection.find_one(
+        {"_id": key}, projection={"_id": False, "split": True, "summary": True, "provenance": True}
+    )
+    # Entries cached without summary or provenance are treated as missing
+    if doc is None or "summary" not in doc or "provenance" not in doc:
+        return None
+    return dict(doc)
+
+
+async def save_cached_split(db: AsyncIOMotorDatabase, key: str, entry: dict[str, Any]) -> None:
+    """
+    Saves a split, its summary and its provenance to the shared split cache,
+    replacing any split previously cached under the key
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        key (str): Cache key of the split, see arch_api.cache.split_cache_key
+        entry (dict): Dict with the keys "split", "summary" and "provenance"
+    """
+    collection: AsyncIOMotorCollection = db["split_cache"]
+    doc = {
+        "_id": key,
+        "split": entry["split"],
+        "summary": entry["summary"],
+        "provenance": entry["provenance"],
+        # Expired by the TTL index, see ensure_split_cache_ttl
+        "created_at": datetime.datetime.now(datetime.UTC),
+    }
+    await collection.replace_one({"_id": key}, doc, upsert=True)
+
+
+async def ensure_split_cache_ttl(db: AsyncIOMotorDatabase, ttl: datetime.timedelta) -> None:
+    """
+    Creates the TTL index of the shared split cache, so that MongoDB deletes cached splits ttl after they were cached.
+    The expiry of an existing TTL index is changed to ttl
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        ttl (datetime.timedelta): How long cached splits are kept
+    """
+    collection: AsyncIOMotorCollection = db["split_cache"]
+    expire_after_seconds = int(ttl.total_seconds())
+    try:
+        await collection.create_index("created_at", name=SPLIT_CACHE_TTL_INDEX, expireAfterSeconds=expire_after_seconds)
+    except OperationFailure as exc:
+        if exc.code != _INDEX_OPTIONS_CONFLICT:
+            raise
+        await db.command(
+            "collMod", "split_cache", index={"name": SPLIT_CACHE_TTL_INDEX, "expireAfterSeconds": expire_after_seconds}
+        )
+
+
+async def ensure_profiles_collection(db: AsyncIOMotorDatabase, max_bytes: int) -> None:
+    """
+    Creates the "profiles" collection as a capped collection, so that the oldest profiles are dropped
+    once it reaches max_bytes. An existing collection is left as it is
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        max_bytes (int): Maximum size of the collection in bytes
+    """
+    if await db.list_collection_names(filter={"name": "profiles"}):
+        return
+    try:
+        await db.create_collection("profiles", capped=True, size=max_bytes)
+    except CollectionInvalid:
+        # Another API instance created it in the meantime
+        pass
+
+
+async def save_split_profile(db: AsyncIOMotorDatabase, profile: dict[str, Any]) -> bson.ObjectId:
+    """
+    Saves the profile of a split together with its input, see ensure_profiles_collection
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        profile (dict): Document of the profile
+    Returns:
+        bson.ObjectId: The id of the saved profile
+    """
+    collection: AsyncIOMotorCollection = db["profiles"]
+    res = await collection.insert_one(profile)
+    profile_id: bson.ObjectId = res.inserted_id
+    return profile_id
+
+
+async def list_split_profiles(db: AsyncIOMotorDatabase, limit: int) -> list[Mapping[str, Any]]:
+    """
+    Lists the most recent profiles, newest first, without the profiles themselves and their inputs
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        limit (int): Maximum number of profiles to return
+    Returns:
+        list[Mapping[str, Any]]: The documents of the profiles
+    """
+    collection: AsyncIOMotorCollection = db["profiles"]
+    projection = {"stats": False, "summary": False, "input": False, "changes": False}
+    docs: list[Mapping[str, Any]] = await collection.find(
+        projection=projection, sort=[("_id", DESCENDING)], limit=limit
+    ).to_list(length=limit)
+    return docs
+
+
+async def get_split_profile(
+    db: AsyncIOMotorDatabase, id: bson.ObjectId, with_stats: bool = False
+) -> Mapping[str, Any] | None:
+    """
+    Retrieves a profile by id
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        id (bson.ObjectId): bson ObjectId corresponding to the profile
+        with_stats (bool): Whether to fetch the binary statistics of the profile, which are left out by default
+    Returns:
+        Mapping[str, Any] | None: Document of the profile, or None if there is no profile with the given id
+    """
+    collection: AsyncIOMotorCollection = db["profiles"]
+    doc: Mapping[str, Any] | None = await collection.find_one(
+        {"_id": id}, projection=None if with_stats else {"stats": False}
+    )
+    return doc
@@ -0,0 +1,109 @@
+import enum
+from collections.abc import Mapping
+from typing import Any
+
+import bson
+import numpy as np
+from arch_api.geometry import coordinate_buffers, coordinates_from_buffers
+
+# Fields of a split triple that hold FeatureCollections of Polygons
+GEOMETRY_FIELDS = ("building_limits", "height_plateaus", "split")
+
+# Marks a FeatureCollection whose polygons are stored in packed buffers, see encode_feature_collection
+_ENCODING = "ragged-float64-v1"
+_BUFFER_KEYS = ("encoding", "coordinates", "ring_offsets", "polygon_offsets")
+
+
+class GeometryStorage(str, enum.Enum):
+    """
+    How the geometry of split triples is stored in the database
+    """
+
+    # Nested arrays of positions, as in GeoJSON. About 30 bytes per vertex
+    GEOJSON = "geojson"
+    # Packed float64 coordinates with ring and polygon offsets in binary fields. 16 bytes per vertex
+    BINARY = "binary"
+
+
+def is_encoded(feature_collection: Mapping[str, Any]) -> bool:
+    """
+    Whether the polygons of the FeatureCollection are stored in packed buffers
+    """
+    return feature_collection.get("encoding") == _ENCODING
+
+
+def encode_feature_collection(feature_collection: Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Moves the coordinates of a GeoJSON FeatureCollection of Polygons into packed buffers:
+    little-endian float64 coordinates, and int64 offsets of the rings into the coordinates
+    and of the polygons into the rings. Everything else, e.g. the properties, is kept as it is
+
+    Args:
+        feature_collection (Mapping[str, Any]): GeoJSON FeatureCollection of Polygons, or an already encoded one
+
+    Returns:
+        dict[str, Any]: The encoded FeatureCollection, see decode_feature_collection
+    """
+    if is_encoded(feature_collection):
+        return dict(feature_collection)
+    features = feature_collection["features"]
+    coords, ring_offsets, polygon_offsets = coordinate_buffers(
+        [feature["geometry"]["coordinates"] for feature in features]
+    )
+    # The coordinates stay in place as None, so that decoding restores the order of the members
+    stripped_features = [{**feature, "geometry": {**feature["geometry"], "coordinates": None}} for feature in features]
+    return {
+        **{key: stripped_features if key == "features" else value for key, value in feature_collection.items()},
+        "encoding": _ENCODING,
+        "coordinates": bson.Binary(coords.astype("<f8").tobytes()),
+        "ring_offsets": bson.Binary(ring_offsets.astype("<i8").tobytes()),
+        "polygon_offsets": bson.Binary(polygon_offsets.astype("<i8").tobytes()),
+    }
+
+
+def decode_feature_collection(feature_collection: Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Restores the GeoJSON FeatureCollection of Polygons encoded by encode_feature_collection.
+    FeatureCollections that are not encoded are returned as they are
+
+    Args:
+        feature_collection (Mapping[str, Any]): Encoded or GeoJSON FeatureCollection
+
+    Returns:
+        dict[str, Any]: GeoJSON FeatureCollection with positions as tuples
+    """
+    if not is_encoded(feature_collection):
+        return dict(feature_collection)
+    polygons = coordinates_from_buffers(
+        np.frombuffer(feature_collection["coordinates"], dtype="<f8").reshape(-1, 2),
+        np.frombuffer(feature_collection["ring_offsets"], dtype="<i8"),
+        np.frombuffer(feature_collection["polygon_offsets"], dtype="<i8"),
+    )
+    features = [
+        {**feature, "geometry": {**feature["geometry"], "coordinates": polygon}}
+        for feature, polygon in zip(feature_collection["features"], polygons, strict=True)
+    ]
+    return {
+        key: features if key == "features" else value
+        for key, value in feature_collection.items()
+        if key not in _BUFFER_KEYS
+    }
+
+
+def encode_split_triple(split_triple: Mapping[str, Any], storage: GeometryStorage) -> dict[str, Any]:
+    """
+    Prepares a split triple for storage in the database
+
+    Args:
+        split_triple (Mapping[str, Any]): Split triple with GeoJSON FeatureCollections
+        storage (GeometryStorage): How to store the geometry
+
+    Returns:
+        dict[str, Any]: The split triple with its FeatureCollections encoded for the storage
+    """
+    if storage is GeometryStorage.GEOJSON:
+        return dict(split_triple)
+    return {
+        key: encode_feature_collection(value) if key in GEOMETRY_FIELDS else value
+        for key, value in split_triple.items()
+    }
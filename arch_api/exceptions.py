@@ -1,10 +1,53 @@
+from typing import Any
+
 import fastapi
 from bson.errors import InvalidId
 
 
 class SplittingError(Exception):
     """
-    Error originating from geometries that cannot be split
+    Error originating from geometries that cannot be split.
+    The optional payload carries details for the client, e.g. the region that is not covered
+    """
+
+    def __init__(self, message: str, payload: dict[str, Any] | None = None):
+        super().__init__(message)
+        self.payload = payload or {}
+
+    def __reduce__(self) -> tuple[type["SplittingError"], tuple[str, dict[str, Any]]]:
+        # Keep the payload when the error is sent back from a process pool worker
+        return (SplittingError, (str(self), self.payload))
+
+
+class ComputeQueueFullError(Exception):
+    """
+    Error raised when there are too many pending computations to accept another one
+    """
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ComputeTimeoutError(Exception):
+    """
+    Error raised when a computation did not finish within its timeout
+    """
+
+    ...
+
+
+class InvalidCursorError(Exception):
+    """
+    Error raised when a pagination cursor cannot be decoded
+    """
+
+    ...
+
+
+class InvalidFeatureChangesError(Exception):
+    """
+    Error raised when changes to a FeatureCollection refer to features that do not exist, or contradict each other
     """
 
     ...
@@ -16,7 +59,7 @@ async def splitting_error_handler(_: fastapi.Request, exc: SplittingError) -> fa
     """
     return fastapi.responses.JSONResponse(
         status_code=fastapi.status.HTTP_400_BAD_REQUEST,
-        content={"detail": str(exc)},
+        content={"detail": str(exc), **exc.payload},
     )
 
 
@@ -28,3 +71,46 @@ async def invalid_object_id_handler(_: fastapi.Request, exc: InvalidId) -> fasta
         status_code=fastapi.status.HTTP_400_BAD_REQUEST,
         content={"detail": str(exc)},
     )
+
+
+async def invalid_cursor_handler(_: fastapi.Request, exc: InvalidCursorError) -> fastapi.responses.JSONResponse:
+    """
+    Transforms an InvalidCursorError into a BAD_REQUEST response
+    """
+    return fastapi.responses.JSONResponse(
+        status_code=fastapi.status.HTTP_400_BAD_REQUEST,
+        content={"detail": str(exc)},
+    )
+
+
+async def compute_queue_full_handler(_: fastapi.Request, exc: ComputeQueueFullError) -> fastapi.responses.JSONResponse:
+    """
+    Transforms a ComputeQueueFullError into a SERVICE_UNAVAILABLE response with a Retry-After header
+    """
+    return fastapi.responses.JSONResponse(
+        status_code=fastapi.status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def compute_timeout_handler(_: fastapi.Request, exc: ComputeTimeoutError) -> fastapi.responses.JSONResponse:
+    """
+    Transforms a ComputeTimeoutError into a SERVICE_UNAVAILABLE response
+    """
+    return fastapi.responses.JSONResponse(
+        status_code=fastapi.status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+    )
+
+
+async def invalid_feature_changes_handler(
+    _: fastapi.Request, exc: InvalidFeatureChangesError
+) -> fastapi.responses.JSONResponse:
+    """
+    Transforms an InvalidFeatureChangesError into an UNPROCESSABLE_ENTITY response
+    """
+    return fastapi.responses.JSONResponse(
+        status_code=fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": str(exc)},
+    )
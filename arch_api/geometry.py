@@ -0,0 +1,153 @@
+import functools
+from collections.abc import Sequence
+from itertools import chain, pairwise
+from typing import TYPE_CHECKING
+
+import numpy as np
+import numpy.typing as npt
+from arch_api.models.geojson import Polygon2dFeature
+
+# shapely and pyproj take over a tenth of a second to import. They are only imported by the functions
+# that need them, so that the ragged array conversions used by arch_api.encoding can be imported without them
+if TYPE_CHECKING:
+    import pyproj
+
+# GeoJSON coordinates use 'WGS 84' as coordinate reference system (crs),
+# see GeoJSON format specification https://datatracker.ietf.org/doc/html/rfc7946#section-4
+# The corresponding authority code is 'EPSG:4326', see https://epsg.io/4326
+CRS = "EPSG:4326"
+
+# Tolerance for geometry queries, empirically determined on the
+# vaterlandsparken example by checking the height plateau overlap
+TOL = 1e-7
+
+RaggedPolygonBuffers = tuple[npt.NDArray[np.float64], npt.NDArray[np.int64], npt.NDArray[np.int64]]
+PolygonCoordinates = list[list[tuple[float, float]]]
+
+
+def coordinate_buffers(polygons: Sequence[Sequence[Sequence[Sequence[float]]]]) -> RaggedPolygonBuffers:
+    """
+    Flattens the GeoJSON coordinates of polygons into flat buffers
+
+    Args:
+        polygons (Sequence[Sequence[Sequence[Sequence[float]]]]): For each polygon the list of its rings,
+            each being a list of (x, y) positions
+
+    Returns:
+        RaggedPolygonBuffers: The coordinates as array of shape (n, 2), the offsets of the rings into the coordinates,
+            and the offsets of the polygons into the rings, as expected by shapely.from_ragged_array
+    """
+    rings = [ring for polygon in polygons for ring in polygon]
+
+    ring_offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(ring) for ring in rings), dtype=np.int64, count=len(rings)), out=ring_offsets[1:])
+
+    polygon_offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    np.cumsum(
+        np.fromiter((len(polygon) for polygon in polygons), dtype=np.int64, count=len(polygons)),
+        out=polygon_offsets[1:],
+    )
+
+    # Flatten rings -> positions -> floats in a single pass
+    num_coords = int(ring_offsets[-1])
+    coords = np.fromiter(
+        chain.from_iterable(chain.from_iterable(rings)), dtype=np.float64, count=2 * num_coords
+    ).reshape(num_coords, 2)
+
+    return coords, ring_offsets, polygon_offsets
+
+
+def coordinates_from_buffers(
+    coords: npt.NDArray[np.float64], ring_offsets: npt.NDArray[np.int64], polygon_offsets: npt.NDArray[np.int64]
+) -> list[PolygonCoordinates]:
+    """
+    Rebuilds the GeoJSON coordinates of polygons from flat buffers, the inverse of coordinate_buffers
+
+    Args:
+        coords (npt.NDArray[np.float64]): The coordinates as array of shape (n, 2)
+        ring_offsets (npt.NDArray[np.int64]): The offsets of the rings into the coordinates
+        polygon_offsets (npt.NDArray[np.int64]): The offsets of the polygons into the rings
+
+    Returns:
+        list[PolygonCoordinates]: For each polygon the list of its rings, each being a list of (x, y) positions
+    """
+    positions = list(zip(coords[:, 0].tolist(), coords[:, 1].tolist(), strict=True))
+    rings = [positions[start:end] for start, end in pairwise(ring_offsets.tolist())]
+    return [rings[start:end] for start, end in pairwise(polygon_offsets.tolist())]
+
+
+def polygon_buffers(features: Sequence[Polygon2dFeature]) -> RaggedPolygonBuffers:
+    """
+    Extracts the coordinates of the polygons of the features into flat buffers,
+    without dumping the features to dicts first
+
+    Args:
+        features (Sequence[Polygon2dFeature]): The features to extract the polygons from
+
+    Returns:
+        RaggedPolygonBuffers: The coordinates as array of shape (n, 2), the offsets of the rings into the coordinates,
+            and the offsets of the polygons into the rings, as expected by shapely.from_ragged_array
+    """
+    return coordinate_buffers([feature.geometry.coordinates for feature in features])
+
+
+def polygons_from_features(features: Sequence[Polygon2dFeature]) -> npt.NDArray[np.object_]:
+    """
+    Builds an array of shapely Polygons from the features in bulk
+
+    Args:
+        features (Sequence[Polygon2dFeature]): The features to build the polygons from
+
+    Returns:
+        npt.NDArray[np.object_]: Array of shapely Polygons, one for each feature
+    """
+    import shapely
+
+    coords, ring_offsets, polygon_offsets = polygon_buffers(features)
+    polygons: npt.NDArray[np.object_] = shapely.from_ragged_array(
+        shapely.GeometryType.POLYGON, coords, (ring_offsets, polygon_offsets)
+    )
+    return polygons
+
+
+def polygons_to_coordinates(polygons: npt.NDArray[np.object_]) -> list[PolygonCoordinates]:
+    """
+    Extracts the GeoJSON coordinates of shapely Polygons in bulk from their ragged array representation
+
+    Args:
+        polygons (npt.NDArray[np.object_]): Array of shapely Polygons
+
+    Returns:
+        list[PolygonCoordinates]: For each polygon the list of its rings, each being a list of (x, y) positions
+    """
+    import shapely
+
+    if len(polygons) == 0:
+        return []
+    _, coords, (ring_offsets, polygon_offsets) = shapely.to_ragged_array(polygons)
+    return coordinates_from_buffers(coords, ring_offsets, polygon_offsets)
+
+
+def geodesic_area(polygons: npt.NDArray[np.object_]) -> float:
+    """
+    Computes the total area of Polygons with coordinates in the CRS of GeoJSON on the ellipsoid of 'WGS 84'
+
+    Args:
+        polygons (npt.NDArray[np.object_]): Array of shapely Polygons
+
+    Returns:
+        float: Total area in square metres
+    """
+    geod = _geod()
+    # The sign of the area depends on the orientation of the exterior ring
+    return float(sum(abs(geod.geometry_area_perimeter(polygon)[0]) for polygon in polygons))
+
+
+@functools.cache
+def _geod() -> "pyproj.Geod":
+    """
+    The ellipsoid of 'WGS 84', for measuring areas in square metres
+    """
+    import pyproj
+
+    return pyproj.Geod(ellps="WGS84")
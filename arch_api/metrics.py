@@ -0,0 +1,360 @@
+import abc
+import asyncio
+import bisect
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any, TypeVar
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds of the buckets of histograms, in seconds for durations
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+EVENT_LOOP_LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Powers of 4 up to about a million, for the number of features and vertices of inputs
+SIZE_BUCKETS = tuple(float(4**exponent) for exponent in range(11))
+
+# Content type of the text exposition format of Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[str, ...]
+M = TypeVar("M", bound="_Metric")
+
+
+class _Metric(abc.ABC):
+    """
+    A metric with a value per combination of label values. Thread-safe, as pymongo reports commands from its threads
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict[str, str]) -> Labels:
+        if labels.keys() != set(self.label_names):
+            raise ValueError(f"{self.name} has the labels {', '.join(self.label_names) or 'none'}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        """
+        Yields the name, labels and value of each sample of the metric
+        """
+
+    def render(self) -> str:
+        """
+        Renders the metric in the text exposition format of Prometheus
+        """
+        lines = [f"# HELP {self.name} {_escape_help(self.help)}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            if labels:
+                label_pairs = ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels.items())
+                name = f"{name}{{{label_pairs}}}"
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, e.g. the number of requests in flight.
+    With a function, the value is read from it whenever the metric is rendered
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self, name: str, help: str, label_names: Sequence[str] = (), function: Callable[[], float] | None = None
+    ):
+        if function is not None and label_names:
+            raise ValueError("Gauges that read their value from a function cannot have labels")
+        super().__init__(name, help, label_names)
+        # Gauges without labels start at 0, instead of having no sample until they are first set
+        self._values: dict[Labels, float] = {} if label_names else {(): 0.0}
+        self._function = function
+
+    def set(self, value: float, **labels: str) -> None:
+        label_values = self._label_values(labels)
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        label_values = self._label_values(labels)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        if self._function is not None:
+            yield self.name, {}, self._function()
+            return
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield self.name, dict(zip(self.label_names, label_values, strict=True)), value
+
+
+class Histogram(_Metric):
+    """
+    Counts observations, e.g. request durations, in buckets with the given upper bounds
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS
+    ):
+        if list(buckets) != sorted(set(buckets)):
+            raise ValueError("Buckets must be strictly increasing")
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+        # Per combination of label values, the count of each bucket, not cumulative, plus the overflow, and the sum
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        label_values = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(label_values)
+            if counts is None:
+                counts = self._counts[label_values] = [0] * (len(self.buckets) + 1)
+                self._sums[label_values] = 0.0
+            counts[index] += 1
+            self._sums[label_values] += value
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = [
+                (label_values, list(counts), self._sums[label_values]) for label_values, counts in self._counts.items()
+            ]
+        for label_values, counts, total in values:
+            labels = dict(zip(self.label_names, label_values, strict=True))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of the process and renders them for GET /metrics.
+    Metrics live in memory only, so they need no collector to work, and are scraped by one if there is one
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: M) -> M:
+        """
+        Registers a metric and returns it
+
+        Raises:
+            ValueError: If a metric with the same name is already registered
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"A metric named {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the text exposition format of Prometheus
+        """
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+class ApiMetrics:
+    """
+    The metrics of the API
+    """
+
+    def __init__(self, compute_pending: Callable[[], float] | None = None):
+        """
+        Args:
+            compute_pending (Callable[[], float] | None): Returns the number of splits that are being computed
+                or waiting for a worker
+        """
+        self.registry = MetricsRegistry()
+        register = self.registry.register
+        self.request_duration = register(
+            Histogram(
+                "arch_api_request_duration_seconds",
+                "Duration of requests until their response is sent completely, by route template",
+                ("method", "route", "status"),
+            )
+        )
+        self.requests_in_flight = register(
+            Gauge("arch_api_requests_in_flight", "Number of requests that are being handled")
+        )
+        self.stage_duration = register(
+            Histogram(
+                "arch_api_stage_duration_seconds",
+                "Duration of the stages of handling splits: parsing inputs, "
+                "the stages of the splitting pipeline, and serializing responses",
+                ("stage",),
+            )
+        )
+        self.input_features = register(
+            Histogram(
+                "arch_api_split_input_features",
+                "Number of features of the inputs of splits",
+                ("collection",),
+                SIZE_BUCKETS,
+            )
+        )
+        self.input_vertices = register(
+            Histogram(
+                "arch_api_split_input_vertices",
+                "Number of vertices of the inputs of splits",
+                ("collection",),
+                SIZE_BUCKETS,
+            )
+        )
+        self.mongodb_command_duration = register(
+            Histogram(
+                "arch_api_mongodb_command_duration_seconds",
+                "Duration of MongoDB commands as reported by the driver",
+                ("command", "outcome"),
+            )
+        )
+        self.event_loop_lag = register(
+            Histogram(
+                "arch_api_event_loop_lag_seconds",
+                "Delay of the event loop in waking up a periodic task",
+                buckets=EVENT_LOOP_LAG_BUCKETS,
+            )
+        )
+        if compute_pending is not None:
+            register(
+                Gauge(
+                    "arch_api_compute_pending",
+                    "Number of splits that are being computed or waiting for a worker",
+                    function=compute_pending,
+                )
+            )
+
+    def render(self) -> str:
+        return self.registry.render()
+
+    def stage_timer(self, stage: str) -> "_StageTimer":
+        """
+        Context manager that observes the duration of its block as stage
+        """
+        return _StageTimer(self.stage_duration, stage)
+
+
+class _StageTimer:
+    def __init__(self, histogram: Histogram, stage: str):
+        self._histogram = histogram
+        self._stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *_: object) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, stage=self._stage)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware that observes the duration of each request by method, route template and status code,
+    and counts the requests in flight.
+    Requests that match no route are labelled "unmatched", so that arbitrary paths do not create new label values
+    """
+
+    def __init__(self, app: ASGIApp, metrics: ApiMetrics):
+        self.app = app
+        self.metrics = metrics
+        self._routes: dict[Any, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        self.metrics.requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.requests_in_flight.dec()
+            self.metrics.request_duration.observe(
+                time.perf_counter() - start, method=scope["method"], route=self._route(scope), status=str(status)
+            )
+
+    def _route(self, scope: Scope) -> str:
+        # The router puts the endpoint of the matching route into the scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self._routes:
+            paths = [route.path for route in scope["app"].routes if getattr(route, "endpoint", None) is endpoint]
+            self._routes[endpoint] = paths[0] if paths else "unmatched"
+        return self._routes[endpoint]
+
+
+class CommandDurationListener(monitoring.CommandListener):
+    """
+    Observes the duration of each MongoDB command, e.g. find or insert, as measured by pymongo
+    """
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.histogram.observe(event.duration_micros / 1e6, command=event.command_name, outcome="succeeded")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.histogram.observe(event.duration_micros / 1e6, command=event.command_name, outcome="failed")
+
+
+async def monitor_event_loop_lag(histogram: Histogram, interval: float = 0.5) -> None:
+    """
+    Observes by how much the event loop oversleeps interval, e.g. because a request blocks it with CPU-heavy work.
+    Runs until cancelled
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        histogram.observe(max(0.0, loop.time() - start - interval))
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import logging
+import os
+
+from arch_api.db import get_db, migrate_geometry_storage
+from arch_api.encoding import GeometryStorage
+from dotenv import load_dotenv
+
+
+async def migrate(storage: GeometryStorage, project: str | None, batch_size: int) -> None:
+    db = get_db(os.environ["MONGODB_URL"])
+    num_converted = await migrate_geometry_storage(db, storage, project=project, batch_size=batch_size)
+    logging.info("Converted the geometry of %d split triples to %s", num_converted, storage.value)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", logging.INFO))
+
+    parser = argparse.ArgumentParser(description="Convert the stored geometry of split triples")
+    parser.add_argument(
+        "--to", required=True, choices=[storage.value for storage in GeometryStorage], help="Geometry storage"
+    )
+    parser.add_argument("--project", default=None, help="Only convert the split triples of this project")
+    parser.add_argument("--batch_size", type=int, default=100, help="Number of split triples converted at once")
+    args = parser.parse_args()
+    asyncio.run(migrate(GeometryStorage(args.to), args.project, args.batch_size))
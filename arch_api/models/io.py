@@ -1,8 +1,14 @@
-from collections.abc import Mapping
-from typing import Any
+import datetime
+from collections.abc import Mapping, Sequence
+from typing import Any, Literal, get_args
 
-from arch_api.models.geojson import NonEmptyPolygon2dFeatureCollection, Polygon2dFeature
-from pydantic import BaseModel, Field, field_validator
+import pydantic_core
+from arch_api.encoding import decode_feature_collection
+from arch_api.models.geojson import NonEmptyPolygon2dFeatureCollection, Polygon2d, Polygon2dFeature
+from pydantic import BaseModel, Field, NonNegativeInt, field_validator
+
+# Maximum number of items in a single request to the batch endpoint
+MAX_BATCH_SIZE = 500
 
 
 class ProjectMixin(BaseModel):
@@ -44,13 +50,88 @@ class Split(HeightPlateaus):
     as they need to have elevation populated
     """
 
-    ...
+    @classmethod
+    def from_trusted(cls, feature_collection: Mapping[str, Any]) -> "Split":
+        """
+        Builds a Split from a GeoJSON FeatureCollection of Polygons that we produced ourselves,
+        e.g. in arch_api.splitting, without validating it again.
+        Positions must be tuples for the Split to serialize without warnings
+        """
+        features = [
+            Polygon2dFeature.model_construct(
+                type="Feature",
+                geometry=Polygon2d.model_construct(type="Polygon", coordinates=feature["geometry"]["coordinates"]),
+                properties=feature["properties"],
+            )
+            for feature in feature_collection["features"]
+        ]
+        return cls.model_construct(type="FeatureCollection", features=features)
+
+
+class SplitSummary(BaseModel):
+    """
+    Summary metadata of a split, computed once when the split is created
+    """
+
+    # Bounding box as [west, south, east, north], like the bbox member of GeoJSON
+    bbox: tuple[float, float, float, float]
+    num_features: int
+    # Total area in square metres
+    area: float
+    min_elevation: float
+    max_elevation: float
+
+
+# Fields of a split triple that can be requested in addition to id and project
+SplitField = Literal["building_limits", "height_plateaus", "split", "summary"]
 
 
 class CreateSplitInput(BaseModel):
     building_limits: BuildingLimits
     height_plateaus: HeightPlateaus
 
+    def complexity(self) -> dict[str, int]:
+        """
+        Counts the features, vertices and holes of the building limits and height plateaus,
+        e.g. "building_limits_vertices"
+        """
+        stats = {}
+        for name, feature_collection in (
+            ("building_limits", self.building_limits),
+            ("height_plateaus", self.height_plateaus),
+        ):
+            features = feature_collection.features
+            rings = [ring for feature in features for ring in feature.geometry.coordinates]
+            stats[f"{name}_features"] = len(features)
+            stats[f"{name}_vertices"] = sum(len(ring) for ring in rings)
+            stats[f"{name}_holes"] = len(rings) - len(features)
+        return stats
+
+
+class FeatureChange(BaseModel):
+    """
+    A feature replacing the feature at index of a FeatureCollection
+    """
+
+    index: NonNegativeInt
+    feature: Polygon2dFeature
+
+
+class FeatureCollectionChanges(BaseModel):
+    """
+    Changes to the features of a stored FeatureCollection. Indices refer to the features as stored.
+    Modified features are replaced in place, removed features are dropped and added features are appended
+    """
+
+    added: list[Polygon2dFeature] = []
+    removed: list[NonNegativeInt] = []
+    modified: list[FeatureChange] = []
+
+
+class UpdateSplitInput(BaseModel):
+    building_limits: FeatureCollectionChanges | None = None
+    height_plateaus: FeatureCollectionChanges | None = None
+
 
 class CreateSplitOutput(ProjectMixin):
     id: str
@@ -63,7 +144,177 @@ class CreateSplitOutput(ProjectMixin):
         return CreateSplitOutput(
             id=str(doc["_id"]),
             project=doc["project"],
-            building_limits=doc["building_limits"],
-            height_plateaus=doc["height_plateaus"],
-            split=doc["split"],
+            building_limits=decode_feature_collection(doc["building_limits"]),
+            height_plateaus=decode_feature_collection(doc["height_plateaus"]),
+            split=decode_feature_collection(doc["split"]),
         )
+
+    @staticmethod
+    def json_from_doc(doc: Mapping[str, Any]) -> bytes:
+        """
+        Serializes a document of a split triple that was validated before it was written directly to JSON bytes,
+        without validating it again. Produces the same JSON as CreateSplitOutput.from_doc(doc).model_dump_json()
+        """
+        return pydantic_core.to_json(_trusted_output(doc, _FEATURE_COLLECTION_FIELDS))
+
+
+class SplitFieldsOutput(ProjectMixin):
+    """
+    A split triple with only the requested fields. Fields that were not requested are left out
+    """
+
+    id: str
+    building_limits: BuildingLimits | None = None
+    height_plateaus: HeightPlateaus | None = None
+    split: Split | None = None
+    # Splits created before summaries were introduced have none
+    summary: SplitSummary | None = None
+
+    @staticmethod
+    def from_doc(doc: Mapping[str, Any], fields: list[SplitField]) -> "SplitFieldsOutput":
+        values = {
+            field: decode_feature_collection(doc[field])
+            if field in _FEATURE_COLLECTION_FIELDS and doc.get(field) is not None
+            else doc.get(field)
+            for field in fields
+        }
+        return SplitFieldsOutput(id=str(doc["_id"]), project=doc["project"], **values)
+
+    @staticmethod
+    def json_from_doc(doc: Mapping[str, Any], fields: list[SplitField]) -> bytes:
+        """
+        Serializes the requested fields of a document of a split triple directly to JSON bytes, see
+        CreateSplitOutput.json_from_doc. Produces the same JSON as
+        SplitFieldsOutput.from_doc(doc, fields).model_dump_json(exclude_unset=True)
+        """
+        return pydantic_core.to_json(_trusted_output(doc, fields))
+
+
+class ListSplitsOutput(BaseModel):
+    """
+    A page of split triples. next_cursor points to the next page, it is None on the last page
+    """
+
+    items: list[CreateSplitOutput | SplitFieldsOutput]
+    next_cursor: str | None
+
+    @staticmethod
+    def json_from_docs(
+        docs: Sequence[Mapping[str, Any]], next_cursor: str | None, fields: list[SplitField] | None
+    ) -> bytes:
+        """
+        Serializes a page of documents of split triples directly to JSON bytes, see CreateSplitOutput.json_from_doc
+
+        Args:
+            docs (Sequence[Mapping[str, Any]]): Documents of the split triples of the page
+            next_cursor (str | None): Cursor pointing to the next page
+            fields (list[SplitField] | None): Fields to include besides id and project, or None for the split triple
+        """
+        items = [_trusted_output(doc, _FEATURE_COLLECTION_FIELDS if fields is None else fields) for doc in docs]
+        return pydantic_core.to_json({"items": items, "next_cursor": next_cursor})
+
+
+class CreateSplitBatchItemOutput(BaseModel):
+    """
+    Outcome of a single item of a batch of splits. Either the id of the created split triple,
+    or the error that prevented creating it, with the status code the item would have gotten on its own
+    """
+
+    status: int
+    id: str | None = None
+    error: dict[str, Any] | None = None
+
+
+class ImportSplitLineOutput(BaseModel):
+    """
+    Outcome of a single line of an import, see CreateSplitBatchItemOutput. Lines are numbered from 1
+    """
+
+    line: int
+    status: int
+    id: str | None = None
+    error: dict[str, Any] | None = None
+
+
+class ProfileSummaryOutput(BaseModel):
+    """
+    A stored profile of a split, without the profile itself and the input
+    """
+
+    id: str
+    created_at: datetime.datetime
+    # Method and route template of the profiled request
+    route: str
+    project: str
+    split_id: str | None
+    # "header" if the client asked for the profile, "sampled" if the request was picked at random
+    reason: str
+    # Duration of the request in seconds, until its split was stored
+    duration: float
+    # Durations of the stages of the splitting pipeline in seconds
+    timings: dict[str, float]
+    # Number of features, vertices and holes of the input, see CreateSplitInput.complexity
+    complexity: dict[str, int]
+
+    @staticmethod
+    def from_doc(doc: Mapping[str, Any]) -> "ProfileSummaryOutput":
+        return ProfileSummaryOutput(**_profile_fields(doc))
+
+
+class ProfileOutput(ProfileSummaryOutput):
+    """
+    A stored profile of a split with the input, so that the split can be reproduced,
+    and the functions with the highest cumulative time. The full profile is served separately
+    """
+
+    summary: str
+    input: CreateSplitInput
+    # The changes of a PATCH request, which were applied to the stored split to get the input
+    changes: UpdateSplitInput | None = None
+
+    @staticmethod
+    def from_doc(doc: Mapping[str, Any]) -> "ProfileOutput":
+        return ProfileOutput(
+            **_profile_fields(doc), summary=doc["summary"], input=doc["input"], changes=doc.get("changes")
+        )
+
+
+def _profile_fields(doc: Mapping[str, Any]) -> dict[str, Any]:
+    return {
+        "id": str(doc["_id"]),
+        "split_id": str(doc["split_id"]) if doc.get("split_id") is not None else None,
+        **{
+            field: doc[field]
+            for field in ("created_at", "route", "project", "reason", "duration", "timings", "complexity")
+        },
+    }
+
+
+_FEATURE_COLLECTION_FIELDS: list[SplitField] = ["building_limits", "height_plateaus", "split"]
+
+
+def _trusted_output(doc: Mapping[str, Any], fields: list[SplitField]) -> dict[str, Any]:
+    # Build the output of a stored document without validation, with the fields in the order of the output models.
+    # Geometry stored in binary is only decoded for the fields that are requested
+    output = {"project": doc["project"], "id": str(doc["_id"])}
+    for field in get_args(SplitField):
+        if field in fields:
+            value = doc.get(field)
+            output[field] = (
+                _clean_feature_collection(value) if field in _FEATURE_COLLECTION_FIELDS and value is not None else value
+            )
+    return output
+
+
+def _clean_feature_collection(feature_collection: Mapping[str, Any]) -> dict[str, Any]:
+    # Like the geojson_pydantic models, drop the optional members that are null, as GeoJSON does not allow them
+    feature_collection = decode_feature_collection(feature_collection)
+    features = []
+    for feature in feature_collection["features"]:
+        geometry = _without_null(feature["geometry"], ("bbox",))
+        features.append({**_without_null(feature, ("bbox", "id")), "geometry": geometry})
+    return {**_without_null(feature_collection, ("bbox",)), "features": features}
+
+
+def _without_null(member: Mapping[str, Any], optional_keys: tuple[str, ...]) -> dict[str, Any]:
+    return {key: value for key, value in member.items() if key not in optional_keys or value is not None}
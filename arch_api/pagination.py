@@ -0,0 +1,38 @@
+import base64
+import binascii
+
+import bson
+from arch_api.exceptions import InvalidCursorError
+
+
+def encode_cursor(id: bson.ObjectId) -> str:
+    """
+    Encodes the id of the last document of a page as an opaque cursor token
+
+    Args:
+        id (bson.ObjectId): Id of the last document of the page
+
+    Returns:
+        str: URL safe cursor token pointing behind the document
+    """
+    return base64.urlsafe_b64encode(id.binary).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> bson.ObjectId:
+    """
+    Decodes a cursor token created by encode_cursor
+
+    Args:
+        cursor (str): The cursor token
+
+    Returns:
+        bson.ObjectId: Id of the last document of the previous page
+
+    Raises:
+        InvalidCursorError: If the token was not created by encode_cursor
+    """
+    try:
+        binary = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return bson.ObjectId(binary)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise InvalidCursorError(f"'{cursor}' is not a valid cursor") from exc
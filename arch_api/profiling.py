@@ -0,0 +1,105 @@
+import cProfile
+import dataclasses
+import enum
+import io
+import marshal
+import pstats
+import random
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# Number of functions listed in the text summary of a profile
+SUMMARY_LENGTH = 40
+
+
+class ProfileReason(str, enum.Enum):
+    """
+    Why a request was profiled
+    """
+
+    # The client asked for it with the X-Profile header
+    HEADER = "header"
+    # The request was picked at random
+    SAMPLED = "sampled"
+
+
+@dataclasses.dataclass(frozen=True)
+class Profile:
+    """
+    A cProfile profile of a single call
+    """
+
+    # Statistics in the binary format of pstats.Stats.dump_stats, to load with pstats or e.g. snakeviz
+    stats: bytes
+    # The functions with the highest cumulative time, as printed by pstats
+    summary: str
+
+
+def run_profiled(fn: Callable[..., T], *args: Any, **kwargs: Any) -> tuple[T, Profile]:
+    """
+    Calls fn(*args, **kwargs) with cProfile enabled.
+    Defined on module level, so that it can be run on a process pool by arch_api.compute.ComputeExecutor
+
+    Returns:
+        tuple[T, Profile]: The result of fn and its profile
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(SUMMARY_LENGTH)
+    return result, Profile(stats=marshal.dumps(stats.stats), summary=summary.getvalue())  # type: ignore[attr-defined]
+
+
+class ProfilingPolicy:
+    """
+    Decides which requests are profiled and which of their profiles are kept.
+
+    A request is profiled if the client asks for it with the X-Profile header and allow_header is set,
+    or at random with probability sample_rate. Profiles of sampled requests are only kept
+    if the request took at least min_duration seconds, profiles asked for are always kept.
+    With the defaults, nothing is profiled and deciding costs a single comparison
+    """
+
+    def __init__(self, sample_rate: float = 0.0, min_duration: float = 0.0, allow_header: bool = False):
+        """
+        Args:
+            sample_rate (float): Probability that a request is profiled, between 0 and 1
+            min_duration (float): Minimum duration in seconds of a sampled request for its profile to be kept
+            allow_header (bool): Whether clients may ask for profiles with the X-Profile header
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if min_duration < 0:
+            raise ValueError("min_duration must not be negative")
+        self.sample_rate = sample_rate
+        self.min_duration = min_duration
+        self.allow_header = allow_header
+
+    @property
+    def enabled(self) -> bool:
+        return self.allow_header or self.sample_rate > 0
+
+    def decide(self, header: bool) -> ProfileReason | None:
+        """
+        Decides whether to profile a request
+
+        Args:
+            header (bool): Whether the request asks to be profiled
+
+        Returns:
+            ProfileReason | None: Why the request is profiled, or None if it is not
+        """
+        if header and self.allow_header:
+            return ProfileReason.HEADER
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return ProfileReason.SAMPLED
+        return None
+
+    def keep(self, reason: ProfileReason, duration: float) -> bool:
+        """
+        Decides whether to keep the profile of a request that took duration seconds
+        """
+        return reason is ProfileReason.HEADER or duration >= self.min_duration
@@ -1,15 +1,19 @@
-from arch_api.exceptions import SplittingError
-from arch_api.models.io import BuildingLimits, HeightPlateaus, Split
-from geopandas import GeoDataFrame
+import contextlib
+import functools
+import time
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
 
-# GeoJSON coordinates use 'WGS 84' as coordinate reference system (crs),
-# see GeoJSON format specification https://datatracker.ietf.org/doc/html/rfc7946#section-4
-# The corresponding authority code is 'EPSG:4326', see https://epsg.io/4326
-CRS = "EPSG:4326"
+import numpy as np
+import numpy.typing as npt
+import shapely
+from arch_api.exceptions import InvalidFeatureChangesError, SplittingError
+from arch_api.geometry import TOL, geodesic_area, polygons_from_features, polygons_to_coordinates
+from arch_api.models.io import BuildingLimits, FeatureCollectionChanges, HeightPlateaus, Split
 
-# Tolerance for geometry queries, empirically determined on the
-# vaterlandsparken example by checking the height plateau overlap
-TOL = 1e-7
+# Number of candidate pairs whose overlap is computed at once when checking for overlaps
+OVERLAP_CHUNK_SIZE = 1024
 
 
 def split_building_limits_by_height_plateaus(building_limits: BuildingLimits, height_plateaus: HeightPlateaus) -> Split:
@@ -28,72 +32,601 @@ def split_building_limits_by_height_plateaus(building_limits: BuildingLimits, he
         SplittingError: If the building limits overlap with themselves
         SplittingError: If the height plateaus overlap with themselves
     """
-    # Transform inputs into GeoDataFrames to enable geometric queries
-    # using the coordinate reference system (crs) defined above
-    building_limits_df = GeoDataFrame.from_features(building_limits.model_dump(), crs=CRS)
-    height_plateaus_df = GeoDataFrame.from_features(height_plateaus.model_dump(), crs=CRS)
-
-    # Check that the the input geometries do not intersect with themselves
-    if check_geometry_overlap(building_limits_df):
-        raise SplittingError("The building limits must not overlap with themselves")
-    if check_geometry_overlap(height_plateaus_df):
-        raise SplittingError("The height plateaus must not overlap with themselves")
-
-    # Check that the height plateaus completely cover the building limits
-    #
-    # Combine the areas of the polygons
-    # see https://shapely.readthedocs.io/en/latest/manual.html#shapely.ops.unary_union
-    building_limits_union_df = building_limits_df.unary_union
-    height_plateaus_union_df = height_plateaus_df.unary_union
-    # Add some tolerance to the points in the height plateaus to account for rounding errors,
-    # see https://shapely.readthedocs.io/en/latest/manual.html#object.buffer
-    height_plateaus_buffered_union_df = height_plateaus_union_df.buffer(TOL)
-    # Check that the combined height plateaus completely cover the building limits
-    covers = height_plateaus_buffered_union_df.covers(building_limits_union_df)
-    if not covers:
-        raise SplittingError("The height plateaus do not completely cover the building limits")
+    return run_split_pipeline(building_limits, height_plateaus).split
 
+
+@dataclass
+class SplitResult:
+    """
+    Result of the splitting pipeline
+    """
+
+    # The split building limits as GeoJSON FeatureCollection, ready to be stored or serialized
+    geojson: dict[str, Any]
+    # Summary metadata of the split, see arch_api.models.io.SplitSummary
+    summary: dict[str, Any]
+    # For each feature of the split, the index of its height plateau under "height_plateaus"
+    # and of its building limit under "building_limits". Lets run_resplit_pipeline reuse the features
+    provenance: dict[str, list[int]]
+    # Duration of each stage of the pipeline in seconds, in the order the stages ran
+    timings: dict[str, float]
+
+    @property
+    def split(self) -> Split:
+        """
+        The split building limits as Split model. As we produced the geometry ourselves, it is not validated again
+        """
+        return Split.from_trusted(self.geojson)
+
+
+class SplitContext:
+    """
+    Per-request state shared by the stages of the splitting pipeline.
+    Derived geometries such as spatial indexes are computed lazily,
+    at most once, and are then reused by all later stages
+    """
+
+    def __init__(self, building_limits: BuildingLimits, height_plateaus: HeightPlateaus):
+        self.building_limits = building_limits
+        self.height_plateaus = height_plateaus
+        self.timings: dict[str, float] = {}
+        # Populated by the stages
+        self.building_limits_geometries: npt.NDArray[np.object_]
+        self.height_plateaus_geometries: npt.NDArray[np.object_]
+        self.split_geometries: npt.NDArray[np.object_]
+        self.split_height_plateau_indices: npt.NDArray[np.int64]
+        self.split_building_limit_indices: npt.NDArray[np.int64]
+        self.split_properties: list[dict[str, Any]]
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Measures the duration of a stage of the pipeline
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    @functools.cached_property
+    def building_limits_tree(self) -> shapely.STRtree:
+        return shapely.STRtree(self.building_limits_geometries)
+
+    @functools.cached_property
+    def height_plateaus_tree(self) -> shapely.STRtree:
+        return shapely.STRtree(self.height_plateaus_geometries)
+
+
+def run_split_pipeline(building_limits: BuildingLimits, height_plateaus: HeightPlateaus) -> SplitResult:
+    """
+    Split a BuildingLimits by a HeightPlateaus, measuring the duration of each stage of the pipeline:
+    ingest -> validate -> cover_check -> intersect -> flatten -> summarize
+
+    Args:
+        building_limits (BuildingLimits): The building limits to split
+        height_plateaus (HeightPlateaus): The height plateaus to split by
+
+    Returns:
+        SplitResult: The split building limits, their summary and the timings of the stages
+
+    Raises:
+        SplittingError: If the height plateaus do not completely cover the building limits
+        SplittingError: If the building limits overlap with themselves
+        SplittingError: If the height plateaus overlap with themselves
+    """
+    context = SplitContext(building_limits, height_plateaus)
+    with context.stage("ingest"):
+        _ingest(context)
+    with context.stage("validate"):
+        _validate(context)
+    with context.stage("cover_check"):
+        _check_coverage(context)
+    with context.stage("intersect"):
+        _intersect(context)
+    with context.stage("flatten"):
+        geojson, provenance = _flatten(context)
+    with context.stage("summarize"):
+        summary = _summarize(context)
+    return SplitResult(geojson=geojson, summary=summary, provenance=provenance, timings=context.timings)
+
+
+def _ingest(context: SplitContext) -> None:
+    # Transform inputs into shapely geometries to enable geometric queries
+    context.building_limits_geometries = polygons_from_features(context.building_limits.features)
+    context.height_plateaus_geometries = polygons_from_features(context.height_plateaus.features)
+
+
+def _validate(
+    context: SplitContext,
+    building_limit_indices: npt.NDArray[np.int64] | None = None,
+    height_plateau_indices: npt.NDArray[np.int64] | None = None,
+) -> None:
+    # Check that the the input geometries do not intersect with themselves.
+    # If indices are given, only those geometries are checked against all others
+    if overlaps := find_geometry_overlaps(
+        context.building_limits_geometries, context.building_limits_tree, building_limit_indices
+    ):
+        raise SplittingError(
+            f"The building limits must not overlap with themselves (features {_format_overlaps(overlaps)} overlap)",
+            payload={"overlapping_features": overlaps},
+        )
+    if overlaps := find_geometry_overlaps(
+        context.height_plateaus_geometries, context.height_plateaus_tree, height_plateau_indices
+    ):
+        raise SplittingError(
+            f"The height plateaus must not overlap with themselves (features {_format_overlaps(overlaps)} overlap)",
+            payload={"overlapping_features": overlaps},
+        )
+
+
+def _check_coverage(context: SplitContext, building_limit_indices: npt.NDArray[np.int64] | None = None) -> None:
+    # Check that the height plateaus completely cover the building limits, or the ones with the given indices
+    building_limits = context.building_limits_geometries
+    if building_limit_indices is not None:
+        building_limits = building_limits[building_limit_indices]
+    uncovered = find_uncovered_region(building_limits, context.height_plateaus_geometries, context.height_plateaus_tree)
+    if uncovered is not None:
+        index, region = uncovered
+        if building_limit_indices is not None:
+            index = int(building_limit_indices[index])
+        raise SplittingError(
+            "The height plateaus do not completely cover the building limits",
+            payload={"building_limit": index, "uncovered": shapely.geometry.mapping(region)},
+        )
+
+
+def _intersect(context: SplitContext) -> None:
     # The split of the height plateaus by the building limits is their intersection
     # (Since the height plateaus fully cover)
-    #
-    # keep_geom_type=True because we want no intersections other than polygons (no points or lines)
-    split_df = height_plateaus_df.overlay(building_limits_df, keep_geom_type=True, how="intersection")
+    geometries, height_plateau_indices, building_limit_indices = intersect_geometries(
+        context.height_plateaus_geometries, context.building_limits_geometries, context.building_limits_tree
+    )
+    context.split_geometries = geometries
+    context.split_height_plateau_indices = height_plateau_indices
+    context.split_building_limit_indices = building_limit_indices
+    context.split_properties = [
+        _split_properties(context, i, j)
+        for i, j in zip(height_plateau_indices.tolist(), building_limit_indices.tolist(), strict=True)
+    ]
+
 
-    # Convert the output back to a FeatureCollection
-    features = []
+def _split_properties(context: SplitContext, height_plateau_index: int, building_limit_index: int) -> dict[str, Any]:
+    # Carry over the properties, where the "elevation" of the height plateaus takes precedence
+    return {
+        **(context.building_limits.features[building_limit_index].properties or {}),
+        **(context.height_plateaus.features[height_plateau_index].properties or {}),
+    }
+
+
+def _flatten(context: SplitContext) -> tuple[dict[str, Any], dict[str, list[int]]]:
+    # Convert the output back to a GeoJSON FeatureCollection
     # Results can be "MultiPolygon". We need to split those up to have a common interface
-    for feature in split_df.iterfeatures():
-        geometry = feature["geometry"]
-        geometry_type = geometry["type"]
-        if geometry_type == "MultiPolygon":
-            for polygon_coords in geometry["coordinates"]:
-                polygon = {**geometry, "coordinates": polygon_coords, "type": "Polygon"}
-                features.append({**feature, "geometry": polygon})
-        elif geometry_type == "Polygon":
-            features.append(feature)
-        else:
-            raise ValueError(f"Unexpected GeoJson type {geometry_type} in split results")
-    split = Split(type="FeatureCollection", features=features)
+    features, indices = _features(context.split_geometries, context.split_properties)
+    provenance = {
+        "height_plateaus": context.split_height_plateau_indices[indices].tolist(),
+        "building_limits": context.split_building_limit_indices[indices].tolist(),
+    }
+    return {"type": "FeatureCollection", "features": features}, provenance
+
 
-    return split
+def _features(
+    geometries: npt.NDArray[np.object_], properties: list[dict[str, Any]]
+) -> tuple[list[dict[str, Any]], npt.NDArray[np.int64]]:
+    # GeoJSON Polygon features of the parts of the geometries, and for each the index of its geometry
+    parts, indices = shapely.get_parts(geometries, return_index=True)
+    coordinates = polygons_to_coordinates(parts)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": polygon_coordinates},
+            "properties": properties[index],
+        }
+        for polygon_coordinates, index in zip(coordinates, indices.tolist(), strict=True)
+    ]
+    return features, indices
 
 
-def check_geometry_overlap(dataframe: GeoDataFrame) -> bool:
+def _summarize(context: SplitContext) -> dict[str, Any]:
+    # The split partitions the building limits, so they share bounding box and area.
+    # There are far fewer building limits than split features, which matters for the geodesic area
+    elevations = [properties["elevation"] for properties in context.split_properties]
+    return {
+        "bbox": shapely.total_bounds(context.building_limits_geometries).tolist(),
+        "num_features": int(shapely.get_num_geometries(context.split_geometries).sum()),
+        "area": geodesic_area(context.building_limits_geometries),
+        "min_elevation": min(elevations),
+        "max_elevation": max(elevations),
+    }
+
+
+@dataclass
+class AppliedChanges:
     """
-    Checks if the geometries in GeoDataFrame overlap with each other
+    How the features of a FeatureCollection moved when changes were applied to it, see apply_feature_changes
+    """
+
+    # For each previous feature its index among the new features, or None if it was removed
+    new_indices: list[int | None]
+    # Indices among the new features of the ones whose geometry was added or changed
+    changed: list[int]
+
+    @property
+    def is_geometry_changed(self) -> bool:
+        return bool(self.changed) or None in self.new_indices
+
+
+def apply_feature_changes(
+    features: Sequence[Mapping[str, Any]], changes: FeatureCollectionChanges
+) -> tuple[list[dict[str, Any]], AppliedChanges]:
+    """
+    Applies changes to the features of a GeoJSON FeatureCollection. Features whose geometry stays the same,
+    e.g. if only their elevation is modified, do not count as changed
 
     Args:
-        dataframe (GeoDataFrame): The GeoDataFrame to check. Must only contain Polygon geometries
+        features (Sequence[Mapping[str, Any]]): The previous features
+        changes (FeatureCollectionChanges): The changes to apply
+
     Returns:
-        bool: True if the geometry overlaps with itself, False otherwise
-    """
-    # A cheap and robust way to check whether the geometries overlap:
-    # They overlap if the sum of the areas of the individual geometries
-    # is larger than the area of the union of the geometries
-    union_area = dataframe.unary_union.area
-    assert isinstance(union_area, float)
-    sum_area = dataframe.area.sum()
-    assert isinstance(sum_area, float)
-    # Allow for some tolerance
-    is_overlap = abs(sum_area - union_area) > TOL
-    return is_overlap
+        tuple[list[dict[str, Any]], AppliedChanges]: The new features and how they relate to the previous ones
+
+    Raises:
+        InvalidFeatureChangesError: If a feature does not exist, is modified twice, or is both modified and removed
+    """
+    modified: dict[int, dict[str, Any]] = {}
+    for change in changes.modified:
+        if change.index in modified:
+            raise InvalidFeatureChangesError(f"Feature {change.index} is modified more than once")
+        modified[change.index] = change.feature.model_dump()
+    removed = set(changes.removed)
+    for index in sorted(removed | modified.keys()):
+        if index >= len(features):
+            raise InvalidFeatureChangesError(f"Feature {index} does not exist")
+        if index in removed and index in modified:
+            raise InvalidFeatureChangesError(f"Feature {index} is both modified and removed")
+
+    new_features: list[dict[str, Any]] = []
+    new_indices: list[int | None] = []
+    changed: list[int] = []
+    for index, feature in enumerate(features):
+        if index in removed:
+            new_indices.append(None)
+            continue
+        new_indices.append(len(new_features))
+        if index in modified:
+            if _coordinates(modified[index]) != _coordinates(feature):
+                changed.append(len(new_features))
+            feature = modified[index]
+        new_features.append(dict(feature))
+    for added in changes.added:
+        changed.append(len(new_features))
+        new_features.append(added.model_dump())
+    return new_features, AppliedChanges(new_indices=new_indices, changed=changed)
+
+
+def _coordinates(feature: Mapping[str, Any]) -> list[list[tuple[float, ...]]]:
+    # Positions are tuples or lists, depending on where the feature comes from
+    return [[tuple(position) for position in ring] for ring in feature["geometry"]["coordinates"]]
+
+
+def run_resplit_pipeline(
+    building_limits: BuildingLimits,
+    height_plateaus: HeightPlateaus,
+    previous: Mapping[str, Any],
+    building_limits_changes: AppliedChanges,
+    height_plateaus_changes: AppliedChanges,
+) -> SplitResult:
+    """
+    Splits building limits by height plateaus again after some of their features changed, reusing the features
+    of the previous split whose height plateau and building limit kept their geometry. Only added or changed
+    features are validated and intersected, found via spatial indexes, and only the building limits that lost
+    a part of the previous split are checked for coverage. If no geometry changed, e.g. if only elevations did,
+    no geometry work is done at all. The result is the same as the one of run_split_pipeline
+
+    Args:
+        building_limits (BuildingLimits): The new building limits
+        height_plateaus (HeightPlateaus): The new height plateaus
+        previous (Mapping[str, Any]): The previous split under "split", its summary under "summary" and
+            its provenance under "provenance", see SplitResult
+        building_limits_changes (AppliedChanges): How the building limits changed, see apply_feature_changes
+        height_plateaus_changes (AppliedChanges): How the height plateaus changed, see apply_feature_changes
+
+    Returns:
+        SplitResult: The split building limits, their summary and the timings of the stages
+
+    Raises:
+        SplittingError: If the height plateaus do not completely cover the building limits
+        SplittingError: If changed building limits overlap with others
+        SplittingError: If changed height plateaus overlap with others
+    """
+    context = SplitContext(building_limits, height_plateaus)
+    # Features of the split with the indices of their building limit and height plateau. At first the previous
+    # features whose building limit and height plateau kept their geometry, under their new indices
+    pieces: list[tuple[int, int, dict[str, Any]]] = []
+    # Building limits that lost a part of the previous split
+    uncovered_building_limits = set(building_limits_changes.changed)
+    with context.stage("reuse"):
+        height_plateau_changed = set(height_plateaus_changes.changed)
+        building_limit_changed = set(building_limits_changes.changed)
+        previous_provenance = previous["provenance"]
+        for feature, previous_i, previous_j in zip(
+            previous["split"]["features"],
+            previous_provenance["height_plateaus"],
+            previous_provenance["building_limits"],
+            strict=True,
+        ):
+            i = height_plateaus_changes.new_indices[previous_i]
+            j = building_limits_changes.new_indices[previous_j]
+            if i is not None and i not in height_plateau_changed and j is not None and j not in building_limit_changed:
+                # Properties may have changed even if the geometry did not
+                pieces.append((j, i, {**feature, "properties": _split_properties(context, i, j)}))
+            elif j is not None:
+                uncovered_building_limits.add(j)
+
+    if height_plateaus_changes.is_geometry_changed or building_limits_changes.is_geometry_changed:
+        height_plateau_indices = np.array(height_plateaus_changes.changed, dtype=np.int64)
+        building_limit_indices = np.array(building_limits_changes.changed, dtype=np.int64)
+        with context.stage("ingest"):
+            _ingest(context)
+        with context.stage("validate"):
+            _validate(context, building_limit_indices, height_plateau_indices)
+        with context.stage("cover_check"):
+            _check_coverage(context, np.array(sorted(uncovered_building_limits), dtype=np.int64))
+        with context.stage("intersect"):
+            _intersect_changed(context, building_limit_indices, height_plateau_indices)
+        with context.stage("flatten"):
+            new_features, indices = _features(context.split_geometries, context.split_properties)
+            pieces += zip(
+                context.split_building_limit_indices[indices].tolist(),
+                context.split_height_plateau_indices[indices].tolist(),
+                new_features,
+                strict=True,
+            )
+
+    with context.stage("merge"):
+        # Same order as run_split_pipeline: by building limit, then by height plateau.
+        # The sort is stable, so the parts of an intersection keep their order
+        pieces.sort(key=lambda piece: piece[:2])
+        features = [feature for _, _, feature in pieces]
+        geojson = {"type": "FeatureCollection", "features": features}
+        provenance = {
+            "height_plateaus": [i for _, i, _ in pieces],
+            "building_limits": [j for j, _, _ in pieces],
+        }
+    with context.stage("summarize"):
+        summary = _summarize_changed(context, features, previous["summary"], building_limits_changes)
+    return SplitResult(geojson=geojson, summary=summary, provenance=provenance, timings=context.timings)
+
+
+def _intersect_changed(
+    context: SplitContext, building_limit_indices: npt.NDArray[np.int64], height_plateau_indices: npt.NDArray[np.int64]
+) -> None:
+    # Intersect the changed height plateaus with all building limits, and the changed building limits with all
+    # height plateaus. All other pairs kept their geometry and thus their intersection
+    query_indices, building_limits_a = context.building_limits_tree.query(
+        context.height_plateaus_geometries[height_plateau_indices], predicate="intersects"
+    )
+    query_indices_b, height_plateaus_b = context.height_plateaus_tree.query(
+        context.building_limits_geometries[building_limit_indices], predicate="intersects"
+    )
+    # Pairs of a changed height plateau and a changed building limit are found twice
+    pairs_height_plateaus, pairs_building_limits = np.unique(
+        np.stack(
+            [
+                np.concatenate([height_plateau_indices[query_indices], height_plateaus_b]),
+                np.concatenate([building_limits_a, building_limit_indices[query_indices_b]]),
+            ]
+        ),
+        axis=1,
+    )
+    geometries, height_plateau_indices, building_limit_indices = _intersect_pairs(
+        context.height_plateaus_geometries,
+        context.building_limits_geometries,
+        pairs_height_plateaus,
+        pairs_building_limits,
+    )
+    context.split_geometries = geometries
+    context.split_height_plateau_indices = height_plateau_indices
+    context.split_building_limit_indices = building_limit_indices
+    context.split_properties = [
+        _split_properties(context, i, j)
+        for i, j in zip(height_plateau_indices.tolist(), building_limit_indices.tolist(), strict=True)
+    ]
+
+
+def _summarize_changed(
+    context: SplitContext,
+    features: list[dict[str, Any]],
+    previous_summary: Mapping[str, Any],
+    building_limits_changes: AppliedChanges,
+) -> dict[str, Any]:
+    # Like _summarize. Bounding box and area only depend on the building limits
+    elevations = [feature["properties"]["elevation"] for feature in features]
+    if building_limits_changes.is_geometry_changed:
+        bbox = shapely.total_bounds(context.building_limits_geometries).tolist()
+        area = geodesic_area(context.building_limits_geometries)
+    else:
+        bbox, area = previous_summary["bbox"], previous_summary["area"]
+    return {
+        "bbox": bbox,
+        "num_features": len(features),
+        "area": area,
+        "min_elevation": min(elevations),
+        "max_elevation": max(elevations),
+    }
+
+
+def find_geometry_overlaps(
+    geometries: npt.NDArray[np.object_],
+    tree: shapely.STRtree | None = None,
+    indices: npt.NDArray[np.int64] | None = None,
+) -> list[tuple[int, int]]:
+    """
+    Finds pairs of geometries that overlap with each other
+
+    Only pairs whose bounding boxes intersect with an area are candidates for an overlap. They are found using a
+    spatial index, and then checked in chunks of OVERLAP_CHUNK_SIZE pairs, stopping at the first chunk that contains
+    a real overlap. Neighbours that only touch are ruled out by their DE-9IM relation, which is cheaper than
+    computing their intersection.
+
+    Args:
+        geometries (npt.NDArray[np.object_]): Array of shapely Polygons to check
+        tree (shapely.STRtree | None): Spatial index of the geometries, if already available
+        indices (npt.NDArray[np.int64] | None): Indices of the geometries to check against all others,
+            e.g. the ones that changed, or None to check all pairs
+    Returns:
+        list[tuple[int, int]]: Pairs of indices of overlapping geometries found until stopping, ordered by
+            descending overlap area, or an empty list if the geometries do not overlap
+    """
+    # Bulk query of the spatial index for all pairs whose bounding boxes intersect
+    if tree is None:
+        tree = shapely.STRtree(geometries)
+    if indices is None:
+        left, right = tree.query(geometries)
+    else:
+        query_indices, others = tree.query(geometries[indices])
+        # Order each pair, so that pairs of two of the given geometries are found twice like above
+        left, right = np.unique(np.sort(np.stack([indices[query_indices], others]), axis=0), axis=1)
+    # Each pair is found twice, and each geometry is paired with itself
+    is_candidate = left < right
+    left, right = left[is_candidate], right[is_candidate]
+    # The overlap of a pair is at most the intersection of their bounding boxes, which is a line or a point for
+    # neighbours on a grid
+    bounds = shapely.bounds(geometries)
+    width = np.minimum(bounds[left, 2], bounds[right, 2]) - np.maximum(bounds[left, 0], bounds[right, 0])
+    height = np.minimum(bounds[left, 3], bounds[right, 3]) - np.maximum(bounds[left, 1], bounds[right, 1])
+    is_candidate = width * height > TOL**2
+    left, right = left[is_candidate], right[is_candidate]
+
+    overlap_area = 0.0
+    overlaps: list[tuple[float, int, int]] = []
+    for start in range(0, len(left), OVERLAP_CHUNK_SIZE):
+        chunk_left = left[start : start + OVERLAP_CHUNK_SIZE]
+        chunk_right = right[start : start + OVERLAP_CHUNK_SIZE]
+        # Only pairs whose interiors intersect can overlap
+        is_interior = shapely.relate_pattern(geometries[chunk_left], geometries[chunk_right], "2********")
+        chunk_left, chunk_right = chunk_left[is_interior], chunk_right[is_interior]
+        # Pairs that only touch have an intersection without area, apart from rounding errors
+        areas = shapely.area(shapely.intersection(geometries[chunk_left], geometries[chunk_right]))
+        is_overlap = areas > TOL**2
+        overlaps += zip(areas[is_overlap].tolist(), chunk_left[is_overlap].tolist(), chunk_right[is_overlap].tolist())
+        # Allow for some tolerance
+        overlap_area += float(areas.sum())
+        if overlap_area > TOL:
+            # Report the largest overlaps first
+            overlaps.sort(reverse=True)
+            return [(i, j) for _, i, j in overlaps]
+    return []
+
+
+def find_uncovered_region(
+    building_limits: npt.NDArray[np.object_],
+    height_plateaus: npt.NDArray[np.object_],
+    height_plateaus_tree: shapely.STRtree | None = None,
+) -> tuple[int, shapely.Geometry] | None:
+    """
+    Finds the first building limit that is not completely covered by the height plateaus
+
+    Each building limit is only checked against the height plateaus whose bounding boxes intersect its own,
+    using prepared geometries. Gaps thinner than TOL are attributed to rounding errors and ignored.
+
+    Args:
+        building_limits (npt.NDArray[np.object_]): Array of shapely Polygons that need to be covered
+        height_plateaus (npt.NDArray[np.object_]): Array of shapely Polygons that should cover the building limits
+        height_plateaus_tree (shapely.STRtree | None): Spatial index of the height plateaus, if already available
+    Returns:
+        tuple[int, shapely.Geometry] | None: The index of the first building limit that is not covered together
+            with the region that is not covered, or None if the building limits are completely covered
+    """
+    if height_plateaus_tree is None:
+        height_plateaus_tree = shapely.STRtree(height_plateaus)
+    # Preparing is done in place and speeds up the repeated predicates below
+    shapely.prepare(height_plateaus)
+
+    for index, building_limit in enumerate(building_limits):
+        candidates = height_plateaus[height_plateaus_tree.query(building_limit)]
+        # Fast path: a single height plateau covers the building limit
+        if shapely.covers(candidates, building_limit).any():
+            continue
+        candidates_union = shapely.union_all(candidates)
+        shapely.prepare(candidates_union)
+        if candidates_union.covers(building_limit):
+            continue
+        # Shrinking the uncovered region by TOL removes slivers caused by rounding errors
+        uncovered = shapely.difference(building_limit, candidates_union)
+        if not shapely.buffer(uncovered, -TOL).is_empty:
+            return index, uncovered
+    return None
+
+
+def intersect_geometries(
+    height_plateaus: npt.NDArray[np.object_],
+    building_limits: npt.NDArray[np.object_],
+    building_limits_tree: shapely.STRtree | None = None,
+) -> tuple[npt.NDArray[np.object_], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Intersects each height plateau with each building limit, keeping only the polygonal parts of the intersections
+
+    Candidate pairs are found with a spatial index and then intersected in a single vectorized call.
+    Pairs that only touch, i.e. have no polygonal intersection, are dropped.
+
+    Args:
+        height_plateaus (npt.NDArray[np.object_]): Array of shapely Polygons
+        building_limits (npt.NDArray[np.object_]): Array of shapely Polygons
+        building_limits_tree (shapely.STRtree | None): Spatial index of the building limits, if already available
+    Returns:
+        tuple[npt.NDArray[np.object_], npt.NDArray[np.int64], npt.NDArray[np.int64]]: The intersections,
+            which are Polygons or MultiPolygons, and for each intersection the index of its height plateau and
+            of its building limit. Ordered by building limit index first and height plateau index second
+    """
+    if building_limits_tree is None:
+        building_limits_tree = shapely.STRtree(building_limits)
+    height_plateau_indices, building_limit_indices = building_limits_tree.query(height_plateaus, predicate="intersects")
+    return _intersect_pairs(height_plateaus, building_limits, height_plateau_indices, building_limit_indices)
+
+
+def _intersect_pairs(
+    height_plateaus: npt.NDArray[np.object_],
+    building_limits: npt.NDArray[np.object_],
+    height_plateau_indices: npt.NDArray[np.int64],
+    building_limit_indices: npt.NDArray[np.int64],
+) -> tuple[npt.NDArray[np.object_], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    # Intersects the given pairs of a height plateau and a building limit whose geometries intersect,
+    # see intersect_geometries.
+    # Order the intersections by building limit, then by height plateau. GeoDataFrame.overlay, which was used before,
+    # ordered them by the first height plateau that intersects each building limit instead
+    order = np.lexsort((height_plateau_indices, building_limit_indices))
+    height_plateau_indices, building_limit_indices = height_plateau_indices[order], building_limit_indices[order]
+
+    left = height_plateaus[height_plateau_indices]
+    right = building_limits[building_limit_indices]
+    # Fast path: most height plateaus lie within a single building limit, or the other way around.
+    # Their intersection is the contained geometry itself and the expensive overlay can be skipped
+    shapely.prepare(right)
+    shapely.prepare(left)
+    is_plateau_within = shapely.covers(right, left)
+    is_building_limit_within = ~is_plateau_within & shapely.covers(left, right)
+    intersections = np.empty(len(left), dtype=object)
+    intersections[is_plateau_within] = left[is_plateau_within]
+    intersections[is_building_limit_within] = right[is_building_limit_within]
+    is_partial = ~(is_plateau_within | is_building_limit_within)
+    intersections[is_partial] = shapely.intersection(left[is_partial], right[is_partial])
+
+    # Intersections of polygons can be collections that also contain points and lines.
+    # Only keep their polygonal parts, as we want no intersections other than polygons
+    type_ids = shapely.get_type_id(intersections)
+    for index in np.flatnonzero(type_ids == shapely.GeometryType.GEOMETRYCOLLECTION):
+        parts = shapely.get_parts(intersections[index])
+        intersections[index] = shapely.multipolygons(parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON])
+        type_ids[index] = shapely.GeometryType.MULTIPOLYGON
+
+    is_polygonal = np.isin(type_ids, [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON])
+    keep = is_polygonal & ~shapely.is_empty(intersections)
+    return intersections[keep], height_plateau_indices[keep], building_limit_indices[keep]
+
+
+def _format_overlaps(overlaps: list[tuple[int, int]], max_pairs: int = 5) -> str:
+    formatted = ", ".join(f"{i} and {j}" for i, j in overlaps[:max_pairs])
+    if len(overlaps) > max_pairs:
+        formatted += ", ..."
+    return formatted
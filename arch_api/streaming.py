@@ -0,0 +1,139 @@
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Mapping
+from typing import Any
+
+import fastapi
+import pydantic_core
+from arch_api.encoding import decode_feature_collection
+from arch_api.models.io import CreateSplitOutput, SplitField, SplitFieldsOutput
+from starlette.types import Receive, Scope, Send
+
+# Size of the chunks sent to the client. Small documents are grouped, so that not every line is a separate write
+CHUNK_SIZE = 64 * 1024
+# Maximum size of a single line of a newline-delimited JSON request body
+MAX_RECORD_SIZE = 64 * 1024 * 1024
+
+
+class RequestStreamingResponse(fastapi.responses.StreamingResponse):
+    """
+    StreamingResponse whose content is produced while the request body is still being read.
+    The StreamingResponse of Starlette listens for the client to disconnect by reading from the request,
+    which would take body chunks away from the content. Here, a disconnect surfaces while reading the body instead
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def ndjson_lines(docs: AsyncIterable[Mapping[str, Any]], fields: list[SplitField] | None) -> AsyncIterator[bytes]:
+    """
+    Serializes split triples as newline-delimited JSON, one line per split triple
+
+    Args:
+        docs (AsyncIterable[Mapping[str, Any]]): Documents of the split triples
+        fields (list[SplitField] | None): Fields that were fetched besides id and project, or None for all fields
+
+    Yields:
+        bytes: One line per split triple, like the output of GET /projects/{project}/splits/{id}
+    """
+    async for doc in docs:
+        if fields is None:
+            yield CreateSplitOutput.json_from_doc(doc) + b"\n"
+        else:
+            yield SplitFieldsOutput.json_from_doc(doc, fields) + b"\n"
+
+
+async def geojson_feature_collection(docs: AsyncIterable[Mapping[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Serializes the features of the splits of split triples as a single GeoJSON FeatureCollection.
+    The id of the split triple is added to the properties of each feature as "split_id"
+
+    Args:
+        docs (AsyncIterable[Mapping[str, Any]]): Documents of the split triples, containing at least the split
+
+    Yields:
+        bytes: Consecutive parts of the FeatureCollection
+    """
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    async for doc in docs:
+        split_id = str(doc["_id"])
+        for feature in decode_feature_collection(doc["split"])["features"]:
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": feature["geometry"]["coordinates"]},
+                "properties": {**(feature["properties"] or {}), "split_id": split_id},
+            }
+            yield separator + pydantic_core.to_json(feature)
+            separator = b","
+    yield b"]}"
+
+
+async def chunked(parts: AsyncIterable[bytes], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Groups consecutive parts into chunks of at least chunk_size bytes, except for the last chunk
+    """
+    buffer = bytearray()
+    async for part in parts:
+        buffer += part
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def gzip_compressed(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Compresses a stream with gzip on the fly. Only the compressor state is kept in memory
+    """
+    # wbits=31 writes the gzip header and trailer
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+async def ndjson_records(
+    chunks: AsyncIterable[bytes], max_size: int = MAX_RECORD_SIZE
+) -> AsyncIterator[tuple[int, bytes | None]]:
+    """
+    Splits a newline-delimited JSON stream into its lines as they arrive. Empty lines are skipped
+
+    Args:
+        chunks (AsyncIterable[bytes]): The stream, in chunks of any size
+        max_size (int): Maximum size of a line. Longer lines are discarded while reading, so memory stays bounded
+
+    Yields:
+        tuple[int, bytes | None]: The line number, counted from 1, and the line, or None if it is longer than max_size
+    """
+    buffer = bytearray()
+    line = 1
+    too_long = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            if too_long:
+                yield line, None
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_size:
+                    yield line, None
+                elif buffer.strip():
+                    yield line, bytes(buffer)
+            buffer.clear()
+            too_long = False
+            line += 1
+            start = end + 1
+        if not too_long:
+            buffer += chunk[start:]
+            if len(buffer) > max_size:
+                too_long = True
+                buffer.clear()
+    if too_long:
+        yield line, None
+    elif buffer.strip():
+        yield line, bytes(buffer)
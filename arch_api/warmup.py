@@ -0,0 +1,48 @@
+import asyncio
+import importlib
+import logging
+import time
+
+
+class BackgroundImport:
+    """
+    Imports modules in a worker thread, so that the event loop keeps serving requests while they load.
+
+    Code that needs the modules awaits ready() and then imports them as usual, which is instant
+    once they are loaded. Importing them directly instead would block the event loop until they are loaded
+    """
+
+    def __init__(self, *modules: str):
+        """
+        Args:
+            modules (str): Names of the modules to import, e.g. arch_api.splitting
+        """
+        self.modules = modules
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """
+        Starts importing the modules, unless already started on the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        # Once the modules are loaded, importing them again on another event loop is instant
+        if self._task is None or self._task.get_loop() is not loop:
+            self._task = loop.create_task(asyncio.to_thread(self._import))
+
+    async def ready(self) -> None:
+        """
+        Starts importing the modules if not started yet, and waits until they are loaded
+
+        Raises:
+            ImportError: If a module could not be imported
+        """
+        self.start()
+        assert self._task is not None
+        # Shielded, so that a cancelled request does not cancel the import for the requests that follow
+        await asyncio.shield(self._task)
+
+    def _import(self) -> None:
+        start = time.perf_counter()
+        for module in self.modules:
+            importlib.import_module(module)
+        logging.info(f"Imported {', '.join(self.modules)} in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,191 @@
+"""
+End-to-end throughput and latency of the API for creating, reading, listing and updating splits of a synthetic input
+
+By default, the app runs in-process and uses the MongoDB at MONGODB_URL, e.g. the one of run_dev_stack.sh.
+With --mock-db, an in-memory stand-in replaces MongoDB, which isolates the overhead of the API itself.
+With --base-url, a running server is benchmarked over HTTP instead.
+
+Run with
+    poetry run python -m benchmarks.api [--mock-db] [--requests 200] [--concurrency 8] [--output api.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import json
+import os
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import fastapi
+import httpx
+from dotenv import load_dotenv
+
+from benchmarks.generator import SyntheticCase, complexity, generate_testcase
+from benchmarks.results import summarize_durations, write_results
+
+PROJECT = "benchmark"
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, request: Request, num_requests: int, concurrency: int
+) -> dict[str, Any]:
+    """
+    Sends num_requests requests from concurrency concurrent clients
+
+    Args:
+        client (httpx.AsyncClient): Client of the API
+        request (Request): Sends the i-th request
+        num_requests (int): Total number of requests
+        concurrency (int): Number of requests in flight at once
+
+    Returns:
+        dict[str, Any]: Number of errors, throughput in requests per second and latencies in milliseconds
+    """
+    indices = iter(range(num_requests))
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in indices:
+            start = time.perf_counter()
+            response = await request(client, index)
+            latencies.append(time.perf_counter() - start)
+            errors += response.is_error
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    return {
+        "requests": num_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": num_requests / duration,
+        "latency_ms": summarize_durations(latencies),
+    }
+
+
+async def benchmark(
+    client: httpx.AsyncClient, case: SyntheticCase, num_requests: int, concurrency: int
+) -> list[dict[str, Any]]:
+    """
+    Runs all scenarios one after the other against a clean project
+    """
+    splits_url = f"/projects/{PROJECT}/splits"
+    await client.delete(splits_url)
+
+    # Different elevations give different inputs, so that creating them misses the split cache
+    bodies = [
+        json.dumps(generate_testcase(dataclasses.replace(case, seed=seed))).encode() for seed in range(num_requests)
+    ]
+    headers = {"Content-Type": "application/json"}
+    ids: list[str] = []
+
+    async def create(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        response = await client.post(splits_url, content=bodies[index], headers=headers)
+        if response.status_code == 201:
+            ids.append(response.json()["id"])
+        return response
+
+    async def create_cached(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post(splits_url, content=bodies[0], headers=headers)
+
+    async def get(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get(f"{splits_url}/{ids[index % len(ids)]}")
+
+    async def get_summary(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get(f"{splits_url}/{ids[index % len(ids)]}", params={"fields": "summary"})
+
+    async def list_page(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get(splits_url, params={"limit": 100})
+
+    plateau = json.loads(bodies[0])["height_plateaus"]["features"][0]
+
+    async def update_elevation(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        feature = {**plateau, "properties": {"elevation": float(index)}}
+        changes = {"height_plateaus": {"modified": [{"index": 0, "feature": feature}]}}
+        return await client.patch(f"{splits_url}/{ids[index % len(ids)]}", json=changes)
+
+    scenarios: dict[str, Request] = {
+        "create": create,
+        "create_cached": create_cached,
+        "get": get,
+        "get_summary": get_summary,
+        "list": list_page,
+        "update_elevation": update_elevation,
+    }
+    results = []
+    for name, request in scenarios.items():
+        result = {"scenario": name, **await run_scenario(client, request, num_requests, concurrency)}
+        results.append(result)
+        latency = result["latency_ms"]
+        print(
+            f"{name:<18} {result['throughput_rps']:>9.1f} req/s   latency [ms]: median {latency['median']:.1f}, "
+            f"p90 {latency['p90']:.1f}, p99 {latency['p99']:.1f}   errors {result['errors']}"
+        )
+        if not ids:
+            raise RuntimeError("No split could be created, see the errors above")
+
+    await client.delete(splits_url)
+    return results
+
+
+def _in_process_app(mock_db: bool) -> fastapi.FastAPI:
+    if mock_db:
+        # Must happen before arch_api.db is imported
+        import mongomock_motor
+        import motor.motor_asyncio
+
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+        os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    from arch_api.app import app
+
+    return app
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="URL of a running API, instead of running it in-process")
+    parser.add_argument("--mock-db", action="store_true", help="Use an in-memory stand-in for MongoDB")
+    parser.add_argument("--grid-size", type=int, default=10, help="Size of the synthetic input, see SyntheticCase")
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of requests in flight at once")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    case = SyntheticCase("api", grid_size=args.grid_size, building_limits_per_row=2)
+    app = _in_process_app(args.mock_db) if args.base_url is None else None
+    if app is None:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=None)
+    else:
+        client = httpx.AsyncClient(app=app, base_url="http://benchmark", timeout=None)
+
+    async def run() -> list[dict[str, Any]]:
+        async with contextlib.AsyncExitStack() as stack:
+            if app is not None:
+                # httpx does not run the lifespan of the app, which connects to the database
+                await stack.enter_async_context(app.router.lifespan_context(app))
+            await stack.enter_async_context(client)
+            results = await benchmark(client, case, args.requests, args.concurrency)
+        return results
+
+    results = asyncio.run(run())
+    if args.output is not None:
+        write_results(
+            args.output,
+            "api",
+            results,
+            target=args.base_url or ("in-process, mock db" if args.mock_db else "in-process"),
+            case=dataclasses.asdict(case),
+            complexity=complexity(generate_testcase(case)),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares two JSON results of a benchmark, e.g. of the parent commit and of the current one,
+and reports the metrics that got worse by more than a threshold
+
+Run with
+    poetry run python -m benchmarks.compare before.json after.json [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+
+def metrics(results: dict[str, Any]) -> dict[str, tuple[float, bool]]:
+    """
+    Flattens the results of a benchmark into metrics
+
+    Returns:
+        dict[str, tuple[float, bool]]: For each metric its value, and whether higher values are better
+    """
+    flattened = {}
+    for result in results["results"]:
+        name = result.get("case") or result["scenario"]
+        for stage, timings in result.get("timings_ms", {}).items():
+            flattened[f"{name}.{stage}.median_ms"] = (timings["median"], False)
+        if "latency_ms" in result:
+            flattened[f"{name}.latency.median_ms"] = (result["latency_ms"]["median"], False)
+            flattened[f"{name}.latency.p99_ms"] = (result["latency_ms"]["p99"], False)
+            flattened[f"{name}.throughput_rps"] = (result["throughput_rps"], True)
+    return flattened
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path, help="Results of the baseline")
+    parser.add_argument("after", type=Path, help="Results to compare to the baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that counts as regression")
+    args = parser.parse_args()
+
+    before, after = (json.loads(path.read_text()) for path in (args.before, args.after))
+    before_metrics, after_metrics = metrics(before), metrics(after)
+    print(f"{before.get('commit') or '?':.10} -> {after.get('commit') or '?':.10}")
+
+    regressions = 0
+    for name, (after_value, higher_is_better) in after_metrics.items():
+        if name not in before_metrics:
+            continue
+        before_value = before_metrics[name][0]
+        change = (after_value - before_value) / before_value if before_value else 0.0
+        is_regression = (-change if higher_is_better else change) > args.threshold
+        regressions += is_regression
+        marker = "  REGRESSION" if is_regression else ""
+        print(f"{name:<48} {before_value:>12.2f} {after_value:>12.2f} {change:>+8.1%}{marker}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
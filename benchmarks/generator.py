@@ -0,0 +1,162 @@
+"""
+Generates synthetic inputs for splitting, scaled by the number of polygons and vertices, the number of holes
+in the building limits and the fragmentation of the split
+
+The height plateaus tile a grid of square cells. Each row of cells is crossed by a band of building limits.
+With fragmentation k > 1, each cell is tiled by two interlocking combs with k teeth each instead of a single square,
+so that every comb intersects a building limit in k separate parts, i.e. a MultiPolygon with k Polygons
+"""
+import dataclasses
+import random
+from typing import Any
+
+import numpy as np
+import shapely
+
+# Near Vaterlandsparken in Oslo, in the CRS of GeoJSON
+ORIGIN = (10.7597, 59.9124)
+# About 10 metres
+CELL_SIZE = 1e-4
+
+Testcase = dict[str, dict[str, Any]]
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticCase:
+    """
+    Parameters of a synthetic input
+    """
+
+    name: str
+    # Height plateaus tile a grid of grid_size x grid_size cells
+    grid_size: int = 10
+    # Number of building limits along each row of cells
+    building_limits_per_row: int = 1
+    # Number of vertices per cell edge, the rings of all polygons are densified accordingly
+    vertices_per_edge: int = 1
+    # Number of holes of each building limit, like the valid_inner_ring_* testcases
+    holes: int = 0
+    # Number of parts that each height plateau is split into by a building limit
+    fragmentation: int = 1
+    seed: int = 0
+
+
+def generate_testcase(case: SyntheticCase) -> Testcase:
+    """
+    Generates building limits and height plateaus that can be split without errors
+
+    Args:
+        case (SyntheticCase): Parameters of the input
+
+    Returns:
+        Testcase: GeoJSON FeatureCollections under "building_limits" and "height_plateaus",
+            like the files in tests/testcases
+    """
+    rng = random.Random(case.seed)
+    height_plateaus = _densify(_height_plateaus(case), case.vertices_per_edge)
+    building_limits = _densify(_building_limits(case), case.vertices_per_edge)
+    return {
+        "building_limits": _feature_collection(building_limits, [{} for _ in building_limits]),
+        "height_plateaus": _feature_collection(
+            height_plateaus, [{"elevation": round(rng.uniform(0, 50), 2)} for _ in height_plateaus]
+        ),
+    }
+
+
+def complexity(testcase: Testcase) -> dict[str, int]:
+    """
+    Counts features, vertices and holes of an input, e.g. to report them together with benchmark results
+    """
+    stats = {}
+    for name, feature_collection in testcase.items():
+        rings = [ring for feature in feature_collection["features"] for ring in feature["geometry"]["coordinates"]]
+        stats[f"{name}_features"] = len(feature_collection["features"])
+        stats[f"{name}_vertices"] = sum(len(ring) for ring in rings)
+        stats[f"{name}_holes"] = len(rings) - len(feature_collection["features"])
+    return stats
+
+
+def _cell(column: int, row: int) -> tuple[float, float]:
+    # Lower left corner of a cell. Computed the same way everywhere, so that shared edges match exactly
+    return ORIGIN[0] + column * CELL_SIZE, ORIGIN[1] + row * CELL_SIZE
+
+
+def _height_plateaus(case: SyntheticCase) -> list[shapely.Polygon]:
+    polygons = []
+    for row in range(case.grid_size):
+        for column in range(case.grid_size):
+            x0, y0 = _cell(column, row)
+            x1, y1 = _cell(column + 1, row + 1)
+            if case.fragmentation == 1:
+                polygons.append(shapely.box(x0, y0, x1, y1))
+            else:
+                polygons += _combs(x0, y0, x1, y1, case.fragmentation)
+    return polygons
+
+
+def _combs(x0: float, y0: float, x1: float, y1: float, teeth: int) -> list[shapely.Polygon]:
+    # Two combs tiling the cell. The middle band of the cell is divided into 2 * teeth slots. The upper comb has
+    # its spine at the top and its teeth in the even slots, the lower comb its spine at the bottom and its teeth
+    # in the odd slots
+    slots = np.linspace(x0, x1, 2 * teeth + 1).tolist()
+    bottom, top = y0 + 0.2 * (y1 - y0), y0 + 0.8 * (y1 - y0)
+    upper = [(x0, y1), (x0, bottom)]
+    for tooth in range(teeth):
+        upper += [(slots[2 * tooth + 1], bottom), (slots[2 * tooth + 1], top)]
+        if tooth < teeth - 1:
+            upper += [(slots[2 * tooth + 2], top), (slots[2 * tooth + 2], bottom)]
+    upper += [(x1, top), (x1, y1), (x0, y1)]
+    lower = [(x0, y0), (x1, y0), (x1, top)]
+    for tooth in reversed(range(teeth)):
+        lower += [(slots[2 * tooth + 1], top), (slots[2 * tooth + 1], bottom)]
+        if tooth > 0:
+            lower += [(slots[2 * tooth], bottom), (slots[2 * tooth], top)]
+    lower += [(x0, bottom), (x0, y0)]
+    return [shapely.Polygon(upper), shapely.Polygon(lower)]
+
+
+def _building_limits(case: SyntheticCase) -> list[shapely.Polygon]:
+    polygons = []
+    for row in range(case.grid_size):
+        _, y0 = _cell(0, row)
+        # The band lies within the teeth of the combs, and does not touch the neighbouring rows
+        bottom, top = y0 + 0.3 * CELL_SIZE, y0 + 0.7 * CELL_SIZE
+        edges = np.linspace(ORIGIN[0], ORIGIN[0] + case.grid_size * CELL_SIZE, case.building_limits_per_row + 1)
+        for left, right in zip(edges[:-1].tolist(), edges[1:].tolist(), strict=True):
+            # Leave a gap between neighbouring building limits
+            left, right = left + 0.05 * CELL_SIZE, right - 0.05 * CELL_SIZE
+            polygons.append(
+                shapely.Polygon(_ring(left, bottom, right, top), holes=_holes(case, left, bottom, right, top))
+            )
+    return polygons
+
+
+def _holes(
+    case: SyntheticCase, left: float, bottom: float, right: float, top: float
+) -> list[list[tuple[float, float]]]:
+    # Small squares evenly spaced along the middle of the building limit
+    size = 0.25 * (top - bottom)
+    center_y = (bottom + top) / 2
+    holes = []
+    for hole in range(case.holes):
+        center_x = left + (hole + 0.5) * (right - left) / case.holes
+        holes.append(_ring(center_x - size / 2, center_y - size / 2, center_x + size / 2, center_y + size / 2))
+    return holes
+
+
+def _ring(left: float, bottom: float, right: float, top: float) -> list[tuple[float, float]]:
+    return [(left, bottom), (right, bottom), (right, top), (left, top), (left, bottom)]
+
+
+def _densify(polygons: list[shapely.Polygon], vertices_per_edge: int) -> list[shapely.Polygon]:
+    if vertices_per_edge <= 1:
+        return polygons
+    return list(shapely.segmentize(np.array(polygons), CELL_SIZE / vertices_per_edge))
+
+
+def _feature_collection(polygons: list[shapely.Polygon], properties: list[dict[str, Any]]) -> dict[str, Any]:
+    features = [
+        {"type": "Feature", "geometry": shapely.geometry.mapping(polygon), "properties": feature_properties}
+        for polygon, feature_properties in zip(polygons, properties, strict=True)
+    ]
+    return {"type": "FeatureCollection", "features": features}
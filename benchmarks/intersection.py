@@ -0,0 +1,90 @@
+"""
+Benchmarks the intersection kernel of the splitting pipeline against GeoDataFrame.overlay
+
+Run with
+    poetry run python -m benchmarks.intersection
+"""
+import argparse
+import time
+from collections.abc import Callable
+
+import numpy as np
+import numpy.typing as npt
+import shapely
+from arch_api.geometry import CRS, polygons_from_features
+from arch_api.models.io import BuildingLimits, HeightPlateaus
+from arch_api.splitting import intersect_geometries
+from geopandas import GeoDataFrame
+
+from tests.conftest import load_testcase
+
+Geometries = npt.NDArray[np.object_]
+
+
+def grid_geometries(num_plateaus: int, num_building_limits: int) -> tuple[Geometries, Geometries]:
+    """
+    Square grid of num_plateaus height plateaus, covered by a coarser grid of num_building_limits building limits
+    that is shifted by half a plateau
+    """
+    n = int(np.sqrt(num_plateaus))
+    m = int(np.sqrt(num_building_limits))
+    x, y = (a.ravel() for a in np.meshgrid(np.arange(n, dtype=float), np.arange(n, dtype=float)))
+    height_plateaus = shapely.box(x, y, x + 1, y + 1)
+    size = (n - 1) / m
+    x, y = (a.ravel() for a in np.meshgrid(np.arange(m) * size + 0.5, np.arange(m) * size + 0.5))
+    building_limits = shapely.box(x, y, x + size, y + size)
+    return height_plateaus, building_limits
+
+
+def vaterlandsparken_geometries() -> tuple[Geometries, Geometries]:
+    testcase = load_testcase("vaterlandsparken")
+    height_plateaus = polygons_from_features(HeightPlateaus(**testcase["height_plateaus"]).features)
+    building_limits = polygons_from_features(BuildingLimits(**testcase["building_limits"]).features)
+    return height_plateaus, building_limits
+
+
+def overlay(height_plateaus: Geometries, building_limits: Geometries) -> int:
+    elevation = np.arange(len(height_plateaus), dtype=float)
+    height_plateaus_df = GeoDataFrame({"elevation": elevation}, geometry=height_plateaus, crs=CRS)
+    building_limits_df = GeoDataFrame(geometry=building_limits, crs=CRS)
+    split_df = height_plateaus_df.overlay(building_limits_df, keep_geom_type=True, how="intersection")
+    return len(split_df)
+
+
+def kernel(height_plateaus: Geometries, building_limits: Geometries) -> int:
+    geometries, _, _ = intersect_geometries(height_plateaus, building_limits)
+    return len(geometries)
+
+
+def best_of(repeat: int, fn: Callable[[Geometries, Geometries], int], *args: Geometries) -> tuple[float, int]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the fastest one is reported")
+    args = parser.parse_args()
+
+    cases = {
+        "vaterlandsparken": vaterlandsparken_geometries(),
+        "grid_1k_plateaus": grid_geometries(1_024, 16),
+        "grid_10k_plateaus": grid_geometries(10_000, 100),
+    }
+    print(f"{'case':<20} {'pieces':>8} {'overlay [ms]':>14} {'kernel [ms]':>13} {'speedup':>9}")
+    for name, geometries in cases.items():
+        overlay_duration, overlay_pieces = best_of(args.repeat, overlay, *geometries)
+        kernel_duration, kernel_pieces = best_of(args.repeat, kernel, *geometries)
+        assert overlay_pieces == kernel_pieces
+        print(
+            f"{name:<20} {kernel_pieces:>8} {overlay_duration * 1000:>14.2f} {kernel_duration * 1000:>13.2f} "
+            f"{overlay_duration / kernel_duration:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmarks the overlap check of the splitting pipeline against comparing the summed area to the area of the union
+
+Valid inputs, whose geometries only touch, are the common case and must not be slower than the union.
+
+Run with
+    poetry run python -m benchmarks.overlaps
+"""
+import argparse
+import time
+from collections.abc import Callable
+
+import numpy as np
+import numpy.typing as npt
+import shapely
+from arch_api.geometry import TOL, polygons_from_features
+from arch_api.models.io import HeightPlateaus
+from arch_api.splitting import find_geometry_overlaps
+
+from benchmarks.generator import SyntheticCase, generate_testcase
+
+Geometries = npt.NDArray[np.object_]
+
+
+def synthetic_geometries(case: SyntheticCase) -> Geometries:
+    """
+    Height plateaus of a synthetic input, which tile a grid
+    """
+    testcase = generate_testcase(case)
+    return polygons_from_features(HeightPlateaus(**testcase["height_plateaus"]).features)
+
+
+def voronoi_geometries(num_cells: int, seed: int = 0) -> Geometries:
+    """
+    Irregular tiling of a square by the Voronoi cells of random points, whose bounding boxes overlap
+    """
+    size = np.sqrt(num_cells)
+    points = shapely.multipoints(np.random.default_rng(seed).random((num_cells, 2)) * size)
+    extent = shapely.box(0, 0, size, size)
+    cells = shapely.get_parts(shapely.voronoi_polygons(points, extend_to=extent))
+    geometries: Geometries = shapely.intersection(cells, extent)
+    return geometries
+
+
+def overlapping(geometries: Geometries) -> Geometries:
+    """
+    Copy of the geometries in which the first one is shifted halfway into its neighbours
+    """
+    geometries = geometries.copy()
+    xmin, ymin, xmax, ymax = shapely.bounds(geometries[0])
+    geometries[0] = shapely.transform(geometries[0], lambda coordinates: coordinates + [(xmax - xmin) / 2, 0])
+    return geometries
+
+
+def union(geometries: Geometries) -> bool:
+    return bool(abs(shapely.area(geometries).sum() - shapely.union_all(geometries).area) > TOL)
+
+
+def overlaps(geometries: Geometries) -> bool:
+    return bool(find_geometry_overlaps(geometries))
+
+
+def best_of(repeat: int, fn: Callable[[Geometries], bool], geometries: Geometries) -> tuple[float, bool]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(geometries)
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the fastest one is reported")
+    args = parser.parse_args()
+
+    voronoi = voronoi_geometries(10_000)
+    cases = {
+        "grid_10k": synthetic_geometries(SyntheticCase("grid_10k", grid_size=100)),
+        "grid_10k_vertices_x4": synthetic_geometries(
+            SyntheticCase("grid_10k_vertices_x4", grid_size=100, vertices_per_edge=4)
+        ),
+        "voronoi_10k": voronoi,
+        # The cells of the synthetic grids are smaller than the tolerance of the overlap
+        "voronoi_10k_overlap": overlapping(voronoi),
+    }
+    print(f"{'case':<22} {'overlap':>8} {'union [ms]':>12} {'overlaps [ms]':>15} {'speedup':>9}")
+    for name, geometries in cases.items():
+        union_duration, union_overlap = best_of(args.repeat, union, geometries)
+        overlaps_duration, overlap = best_of(args.repeat, overlaps, geometries)
+        assert union_overlap == overlap
+        print(
+            f"{name:<22} {overlap!s:>8} {union_duration * 1000:>12.2f} {overlaps_duration * 1000:>15.2f} "
+            f"{union_duration / overlaps_duration:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
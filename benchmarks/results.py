@@ -0,0 +1,60 @@
+"""
+JSON output of the benchmarks, so that results can be compared between commits, see benchmarks.compare
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Any
+
+
+def metadata() -> dict[str, Any]:
+    """
+    Describes where and on which commit the benchmarks ran
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def summarize_durations(durations: list[float]) -> dict[str, float]:
+    """
+    Summarizes durations in seconds as minimum, median and percentiles in milliseconds
+    """
+    milliseconds = sorted(duration * 1000 for duration in durations)
+
+    def percentile(q: float) -> float:
+        return milliseconds[min(len(milliseconds) - 1, int(q * len(milliseconds)))]
+
+    return {
+        "min": milliseconds[0],
+        "median": statistics.median(milliseconds),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": milliseconds[-1],
+    }
+
+
+def write_results(path: Path, benchmark: str, results: list[dict[str, Any]], **parameters: Any) -> None:
+    """
+    Writes the results of a benchmark together with the metadata of the run as JSON
+
+    Args:
+        path (Path): File to write to
+        benchmark (str): Name of the benchmark
+        results (list[dict[str, Any]]): One entry per case or scenario of the benchmark
+        **parameters (Any): Parameters the benchmark ran with
+    """
+    output = {"benchmark": benchmark, **metadata(), "parameters": parameters, "results": results}
+    path.write_text(json.dumps(output, indent=2) + "\n")
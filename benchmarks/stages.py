@@ -0,0 +1,83 @@
+"""
+Micro-benchmarks of the stages of the splitting pipeline on synthetic inputs of growing size and complexity,
+plus parsing the request body and serializing the split
+
+Run with
+    poetry run python -m benchmarks.stages [--case <name>] [--repeat 5] [--output stages.json]
+"""
+import argparse
+import dataclasses
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+import pydantic_core
+from arch_api.models.io import CreateSplitInput
+from arch_api.splitting import run_split_pipeline
+
+from benchmarks.generator import SyntheticCase, complexity, generate_testcase
+from benchmarks.results import summarize_durations, write_results
+
+# Each case scales one dimension of the baseline
+BASELINE = SyntheticCase("baseline", grid_size=32, building_limits_per_row=4)
+CASES = [
+    BASELINE,
+    dataclasses.replace(BASELINE, name="polygons_x10", grid_size=100),
+    dataclasses.replace(BASELINE, name="vertices_x16", vertices_per_edge=16),
+    dataclasses.replace(BASELINE, name="holes_8", holes=8),
+    dataclasses.replace(BASELINE, name="fragmentation_4", fragmentation=4),
+]
+
+
+def benchmark_case(case: SyntheticCase, repeat: int) -> dict[str, Any]:
+    """
+    Runs the pipeline repeat times on the input of the case
+
+    Returns:
+        dict[str, Any]: Parameters and complexity of the input, and the durations of the stages in milliseconds
+    """
+    testcase = generate_testcase(case)
+    body = json.dumps(testcase).encode()
+    durations: dict[str, list[float]] = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        input = CreateSplitInput.model_validate_json(body)
+        durations.setdefault("parse", []).append(time.perf_counter() - start)
+
+        result = run_split_pipeline(input.building_limits, input.height_plateaus)
+        for stage, duration in result.timings.items():
+            durations.setdefault(stage, []).append(duration)
+
+        start = time.perf_counter()
+        pydantic_core.to_json(result.geojson)
+        durations.setdefault("serialize", []).append(time.perf_counter() - start)
+    return {
+        "case": case.name,
+        "parameters": dataclasses.asdict(case),
+        "complexity": {**complexity(testcase), "split_features": result.summary["num_features"]},
+        "timings_ms": {stage: summarize_durations(stage_durations) for stage, stage_durations in durations.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", action="append", choices=[case.name for case in CASES], help="Cases to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per case")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for case in CASES:
+        if args.case and case.name not in args.case:
+            continue
+        result = benchmark_case(case, args.repeat)
+        results.append(result)
+        medians = ", ".join(f"{stage} {timings['median']:.1f}" for stage, timings in result["timings_ms"].items())
+        print(f"{case.name:<16} {result['complexity']['split_features']:>7} pieces   median [ms]: {medians}")
+    if args.output is not None:
+        write_results(args.output, "stages", results, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
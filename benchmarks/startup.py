@@ -0,0 +1,145 @@
+"""
+Cold start of the API: how long importing the app takes in a fresh interpreter, and how long a server started
+with `python -m arch_api` takes until GET /health responds, and to shut down again
+
+The server does not need a reachable MongoDB to become ready, as the client connects in the background.
+
+Run with
+    poetry run python -m benchmarks.startup [--runs 5] [--workers 1] [--output startup.json]
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+from dotenv import load_dotenv
+
+from benchmarks.results import summarize_durations, write_results
+
+# Seconds between two attempts to reach GET /health. Polling more often than this takes noticeable CPU time
+# from the starting server on machines with few cores
+POLL_INTERVAL = 0.02
+
+# Prints the duration of importing the app, and of importing the splitting pipeline on top of it,
+# which the app defers to the background
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import arch_api.app
+app = time.perf_counter()
+import arch_api.splitting
+print(app - start, time.perf_counter() - app)
+"""
+
+
+def time_imports(env: dict[str, str]) -> tuple[float, float]:
+    """
+    Returns the durations in seconds of importing arch_api.app and then arch_api.splitting in a fresh interpreter
+    """
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], env=env, capture_output=True, text=True, check=True)
+    app, splitting = output.stdout.split()
+    return float(app), float(splitting)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def time_server(env: dict[str, str], workers: int, timeout: float) -> tuple[float, float]:
+    """
+    Starts the server, waits until GET /health responds and stops it with SIGTERM
+
+    Returns:
+        tuple[float, float]: The durations in seconds until the server was ready, and until it exited after SIGTERM
+    """
+    port = _free_port()
+    server_env = {**env, "UVICORN_HOST": "127.0.0.1", "UVICORN_PORT": str(port), "UVICORN_WORKERS": str(workers)}
+    server_env |= {"UVICORN_RELOAD": "false", "LOG_LEVEL": "WARNING"}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "arch_api"], env=server_env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"The server exited with code {process.returncode} before it was ready")
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"The server was not ready within {timeout} seconds")
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(POLL_INTERVAL)
+        ready = time.perf_counter() - start
+
+        stop = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=timeout)
+        return ready, time.perf_counter() - stop
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def benchmark(env: dict[str, str], runs: int, workers: int, timeout: float) -> list[dict[str, Any]]:
+    """
+    Times the imports and the server, runs times each
+
+    Returns:
+        list[dict[str, Any]]: One result per scenario with the summarized timings in milliseconds
+    """
+    imports = [time_imports(env) for _ in range(runs)]
+    servers = [time_server(env, workers, timeout) for _ in range(runs)]
+    results: list[dict[str, Any]] = [
+        {
+            "scenario": "import",
+            "runs": runs,
+            "timings_ms": {
+                "app": summarize_durations([app for app, _ in imports]),
+                "splitting": summarize_durations([splitting for _, splitting in imports]),
+            },
+        },
+        {
+            "scenario": "server",
+            "runs": runs,
+            "workers": workers,
+            "timings_ms": {
+                "health_ready": summarize_durations([ready for ready, _ in servers]),
+                "shutdown": summarize_durations([shutdown for _, shutdown in servers]),
+            },
+        },
+    ]
+    for result in results:
+        timings = ", ".join(f"{name} {summary['median']:.0f}" for name, summary in result["timings_ms"].items())
+        print(f"{result['scenario']:<8} median [ms]: {timings}")
+    return results
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of times each scenario runs")
+    parser.add_argument("--workers", type=int, default=1, help="Number of uvicorn worker processes of the server")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server to start or stop")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    results = benchmark(env, args.runs, args.workers, args.timeout)
+    if args.output is not None:
+        write_results(args.output, "startup", results, runs=args.runs, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
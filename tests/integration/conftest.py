@@ -3,9 +3,10 @@ from collections.abc import AsyncIterator, Iterator
 from typing import Any
 
 import pytest
-from arch_api.app import app
-from arch_api.db import MAX_PAGE_SIZE
+from arch_api.app import _MONGODB, app
+from arch_api.db import DEFAULT_PAGE_SIZE
 from httpx import AsyncClient, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 
 class TestClient(AsyncClient):
@@ -18,13 +19,64 @@ class TestClient(AsyncClient):
         assert isinstance(response, Response)
         return response
 
-    async def create_split(self, input: dict[str, Any]) -> Response:
-        response = await self.post(f"/projects/{self.project}/splits", json=input)
+    async def cache_stats(self) -> Response:
+        response = await self.get("/cache/stats")
         assert isinstance(response, Response)
         return response
 
-    async def get_split(self, id: str) -> Response:
-        response = await self.get(f"/projects/{self.project}/splits/{id}")
+    async def metrics(self) -> Response:
+        response = await self.get("/metrics")
+        assert isinstance(response, Response)
+        return response
+
+    async def list_profiles(self) -> Response:
+        response = await self.get("/profiles")
+        assert isinstance(response, Response)
+        return response
+
+    async def get_profile(self, id: str) -> Response:
+        response = await self.get(f"/profiles/{id}")
+        assert isinstance(response, Response)
+        return response
+
+    async def download_profile_stats(self, id: str) -> Response:
+        response = await self.get(f"/profiles/{id}/stats")
+        assert isinstance(response, Response)
+        return response
+
+    async def create_split(self, input: dict[str, Any], profile: bool = False) -> Response:
+        headers = {"X-Profile": "true"} if profile else {}
+        response = await self.post(f"/projects/{self.project}/splits", json=input, headers=headers)
+        assert isinstance(response, Response)
+        return response
+
+    async def create_splits_batch(self, items: list[dict[str, Any]]) -> Response:
+        response = await self.post(f"/projects/{self.project}/splits:batch", json=items)
+        assert isinstance(response, Response)
+        return response
+
+    async def import_splits(self, body: bytes) -> Response:
+        response = await self.post(
+            f"/projects/{self.project}/splits:import", content=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert isinstance(response, Response)
+        return response
+
+    async def get_split(self, id: str, fields: list[str] | None = None) -> Response:
+        params = {"fields": fields} if fields is not None else {}
+        response = await self.get(f"/projects/{self.project}/splits/{id}", params=params)
+        assert isinstance(response, Response)
+        return response
+
+    async def update_split(self, id: str, changes: dict[str, Any], profile: bool = False) -> Response:
+        headers = {"X-Profile": "true"} if profile else {}
+        response = await self.patch(f"/projects/{self.project}/splits/{id}", json=changes, headers=headers)
+        assert isinstance(response, Response)
+        return response
+
+    async def export_splits(self, params: dict[str, Any] | None = None, gzip: bool = False) -> Response:
+        headers = {"Accept-Encoding": "gzip" if gzip else "identity"}
+        response = await self.get(f"/projects/{self.project}/splits:export", params=params, headers=headers)
         assert isinstance(response, Response)
         return response
 
@@ -38,8 +90,15 @@ class TestClient(AsyncClient):
         assert isinstance(response, Response)
         return response
 
-    async def list_splits(self, skip: int = 0, limit: int = MAX_PAGE_SIZE) -> Response:
-        response = await self.get(f"/projects/{self.project}/splits", params={"skip": skip, "limit": limit})
+    async def list_splits(
+        self, after: str | None = None, limit: int = DEFAULT_PAGE_SIZE, fields: list[str] | None = None
+    ) -> Response:
+        params: dict[str, Any] = {"limit": limit}
+        if after is not None:
+            params["after"] = after
+        if fields is not None:
+            params["fields"] = fields
+        response = await self.get(f"/projects/{self.project}/splits", params=params)
         assert isinstance(response, Response)
         return response
 
@@ -57,5 +116,11 @@ def event_loop() -> Iterator[asyncio.AbstractEventLoop]:
 # test_client must be module scoped, same as event_loop
 @pytest.fixture(scope="module")
 async def test_client() -> AsyncIterator[TestClient]:
-    async with TestClient() as client:
+    # httpx does not run the lifespan of the app, which connects to the database
+    async with app.router.lifespan_context(app), TestClient() as client:
         yield client
+
+
+@pytest.fixture(scope="module")
+def database(test_client: TestClient) -> AsyncIOMotorDatabase:
+    return _MONGODB.db
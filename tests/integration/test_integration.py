@@ -1,8 +1,30 @@
+import concurrent.futures.process
+import copy
+import datetime
+import json
+import marshal
 from collections import OrderedDict
+from collections.abc import Callable
 from typing import Any
 
+import arch_api.app
+import bson
 import fastapi
 import pytest
+from arch_api.db import (
+    CLAIM_TIMEOUT,
+    INPUT_FIELDS,
+    MAX_PAGE_SIZE,
+    SPLIT_CACHE_TTL_INDEX,
+    SPLIT_INDEXES,
+    _with_inputs,
+    ensure_indexes,
+    ensure_split_cache_ttl,
+    find_missing_indexes,
+    migrate_geometry_storage,
+)
+from arch_api.encoding import GeometryStorage
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from tests.conftest import Testcase
 from tests.integration.conftest import TestClient
@@ -67,6 +89,27 @@ class TestCreateSplit:
         assert features[0]["properties"]["elevation"] != features[2]["properties"]["elevation"]
         assert features[1]["properties"]["elevation"] != features[2]["properties"]["elevation"]
 
+    @pytest.mark.asyncio
+    async def test_cached(self, test_client: TestClient, vaterlandsparken_testcase: Testcase) -> None:
+        split = await create_sample_split(test_client, vaterlandsparken_testcase)
+        hits = (await test_client.cache_stats()).json()["hits"]
+        # Creating the same split again is served from the cache
+        cached_split = await create_sample_split(test_client, vaterlandsparken_testcase)
+        assert (await test_client.cache_stats()).json()["hits"] == hits + 1
+        assert cached_split["id"] != split["id"]
+        assert cached_split["split"] == split["split"]
+
+    @pytest.mark.asyncio
+    async def test_server_timing(self, test_client: TestClient, vaterlandsparken_testcase: Testcase) -> None:
+        # Change the elevation, so that the split is not served from the cache
+        vaterlandsparken_testcase["height_plateaus"]["features"][0]["properties"]["elevation"] = 42.0
+        response = await test_client.create_split(vaterlandsparken_testcase)
+        assert response.status_code == fastapi.status.HTTP_201_CREATED
+        stages = [timing.split(";")[0] for timing in response.headers["Server-Timing"].split(", ")]
+        assert stages == ["ingest", "validate", "cover_check", "intersect", "flatten", "summarize"]
+        response = await test_client.create_split(vaterlandsparken_testcase)
+        assert response.headers["Server-Timing"] == 'cache;desc="hit"'
+
     @pytest.mark.asyncio
     async def test_height_plateaus_do_not_cover(
         self, test_client: TestClient, vaterlandsparken_testcase: Testcase
@@ -80,6 +123,8 @@ class TestCreateSplit:
         response = await test_client.create_split(vaterlandsparken_testcase)
         assert response.status_code == fastapi.status.HTTP_400_BAD_REQUEST
         assert "The height plateaus do not completely cover the building limits" in response.json().get("detail")
+        assert response.json().get("building_limit") == 0
+        assert response.json().get("uncovered").get("type") in ["Polygon", "MultiPolygon"]
 
     @pytest.mark.asyncio
     @pytest.mark.parametrize("missing", ["building_limits", "height_plateaus"])
@@ -129,6 +174,164 @@ class TestCreateSplit:
         assert response.status_code == fastapi.status.HTTP_201_CREATED
 
 
+# Elevations of the first height plateau that make the compute executor fail with the given error
+FAILING_ELEVATIONS: dict[float, Exception] = {
+    -1001.0: concurrent.futures.process.BrokenProcessPool("A worker died"),
+    -1002.0: RuntimeError("Unexpected error"),
+}
+
+
+def failing_testcase(testcase: Testcase, elevation: float) -> Testcase:
+    failing = copy.deepcopy(testcase)
+    failing["height_plateaus"]["features"][0]["properties"]["elevation"] = elevation
+    return failing
+
+
+@pytest.fixture
+def failing_compute(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Makes splitting the inputs with one of FAILING_ELEVATIONS fail, like a dying worker or a bug in the pipeline
+    """
+    run = arch_api.app._COMPUTE_EXECUTOR.run
+
+    async def failing_run(fn: Callable[..., Any], *args: Any) -> Any:
+        elevation = args[-1].features[0].properties["elevation"]
+        if elevation in FAILING_ELEVATIONS:
+            raise FAILING_ELEVATIONS[elevation]
+        return await run(fn, *args)
+
+    monkeypatch.setattr(arch_api.app._COMPUTE_EXECUTOR, "run", failing_run)
+
+
+class TestCreateSplitsBatch:
+    @pytest.fixture(autouse=True, scope="class")
+    async def cleanup_after_tests(self, test_client: TestClient) -> None:
+        """
+        Cleanup all created splits after all tests in the class are concluded
+        """
+        yield
+        await delete_all_splits(test_client)
+
+    @pytest.mark.asyncio
+    async def test_mixed(self, test_client: TestClient, vaterlandsparken_testcase: Testcase) -> None:
+        missing_elevation = copy.deepcopy(vaterlandsparken_testcase)
+        del missing_elevation["height_plateaus"]["features"][0]["properties"]["elevation"]
+        not_covering = copy.deepcopy(vaterlandsparken_testcase)
+        not_covering["height_plateaus"]["features"] = not_covering["height_plateaus"]["features"][:1]
+        items = [vaterlandsparken_testcase, missing_elevation, not_covering, vaterlandsparken_testcase]
+
+        response = await test_client.create_splits_batch(items)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        results = response.json()
+        assert [result["status"] for result in results] == [
+            fastapi.status.HTTP_201_CREATED,
+            fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+            fastapi.status.HTTP_400_BAD_REQUEST,
+            fastapi.status.HTTP_201_CREATED,
+        ]
+        assert "Missing 'elevation' property" in results[1]["error"]["detail"][0]["msg"]
+        assert "do not completely cover" in results[2]["error"]["detail"]
+        assert results[0]["id"] != results[3]["id"]
+
+        # The successful items are stored like single splits
+        for result in [results[0], results[3]]:
+            response = await test_client.get_split(result["id"])
+            assert response.status_code == fastapi.status.HTTP_200_OK
+            assert len(response.json()["split"]["features"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_compute_errors(
+        self, test_client: TestClient, vaterlandsparken_testcase: Testcase, failing_compute: None
+    ) -> None:
+        items = [
+            failing_testcase(vaterlandsparken_testcase, -1001.0),
+            vaterlandsparken_testcase,
+            failing_testcase(vaterlandsparken_testcase, -1002.0),
+        ]
+        response = await test_client.create_splits_batch(items)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        results = response.json()
+        assert [result["status"] for result in results] == [
+            fastapi.status.HTTP_503_SERVICE_UNAVAILABLE,
+            fastapi.status.HTTP_201_CREATED,
+            fastapi.status.HTTP_500_INTERNAL_SERVER_ERROR,
+        ]
+        # Internal errors are not exposed
+        assert results[2]["error"] == {"detail": "Failed to split the input"}
+        response = await test_client.get_split(results[1]["id"])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+
+    @pytest.mark.asyncio
+    async def test_all_invalid(self, test_client: TestClient) -> None:
+        response = await test_client.create_splits_batch([{}, {"building_limits": None}])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert [result["status"] for result in response.json()] == [fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY] * 2
+
+    @pytest.mark.asyncio
+    async def test_empty(self, test_client: TestClient) -> None:
+        response = await test_client.create_splits_batch([])
+        assert response.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TestImportSplits:
+    @pytest.fixture(autouse=True, scope="class")
+    async def cleanup_after_tests(self, test_client: TestClient) -> None:
+        """
+        Cleanup all created splits after all tests in the class are concluded
+        """
+        yield
+        await delete_all_splits(test_client)
+
+    @pytest.mark.asyncio
+    async def test_mixed(self, test_client: TestClient, vaterlandsparken_testcase: Testcase) -> None:
+        not_covering = copy.deepcopy(vaterlandsparken_testcase)
+        not_covering["height_plateaus"]["features"] = not_covering["height_plateaus"]["features"][:1]
+        lines = [json.dumps(vaterlandsparken_testcase)] * 3 + ["", "not json", json.dumps(not_covering)]
+        body = "\n".join(lines).encode()
+
+        response = await test_client.import_splits(body)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        results = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda result: result["line"])
+        assert [(result["line"], result["status"]) for result in results] == [
+            (1, fastapi.status.HTTP_201_CREATED),
+            (2, fastapi.status.HTTP_201_CREATED),
+            (3, fastapi.status.HTTP_201_CREATED),
+            (5, fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY),
+            (6, fastapi.status.HTTP_400_BAD_REQUEST),
+        ]
+        assert results[3]["error"]["detail"][0]["type"] == "json_invalid"
+
+        # The imported splits are stored like single splits
+        for result in results[:3]:
+            response = await test_client.get_split(result["id"])
+            assert response.status_code == fastapi.status.HTTP_200_OK
+            assert len(response.json()["split"]["features"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_compute_errors(
+        self, test_client: TestClient, vaterlandsparken_testcase: Testcase, failing_compute: None
+    ) -> None:
+        lines = [
+            failing_testcase(vaterlandsparken_testcase, -1001.0),
+            vaterlandsparken_testcase,
+            failing_testcase(vaterlandsparken_testcase, -1002.0),
+            vaterlandsparken_testcase,
+        ]
+        body = "\n".join(json.dumps(line) for line in lines).encode()
+
+        response = await test_client.import_splits(body)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        results = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda result: result["line"])
+        # The stream is not aborted by the failing lines
+        assert [(result["line"], result["status"]) for result in results] == [
+            (1, fastapi.status.HTTP_503_SERVICE_UNAVAILABLE),
+            (2, fastapi.status.HTTP_201_CREATED),
+            (3, fastapi.status.HTTP_500_INTERNAL_SERVER_ERROR),
+            (4, fastapi.status.HTTP_201_CREATED),
+        ]
+
+
 class TestDeleteSplit:
     @pytest.mark.asyncio
     async def test_valid(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
@@ -159,6 +362,30 @@ class TestGetSplit:
         # should be equal to created split except for ordering of elements
         assert dict_to_deep_ordered_dict(split) == dict_to_deep_ordered_dict(created_split)
 
+    @pytest.mark.asyncio
+    async def test_summary(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        response = await test_client.get_split(created_split["id"], fields=["summary"])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        split: dict[str, Any] = response.json()
+        assert list(split) == ["project", "id", "summary"]
+        assert split["summary"]["num_features"] == len(created_split["split"]["features"])
+        elevations = [feature["properties"]["elevation"] for feature in created_split["split"]["features"]]
+        assert split["summary"]["min_elevation"] == min(elevations)
+        assert split["summary"]["max_elevation"] == max(elevations)
+
+    @pytest.mark.asyncio
+    async def test_fields(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        response = await test_client.get_split(created_split["id"], fields=["split", "building_limits"])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        split: dict[str, Any] = response.json()
+        assert list(split) == ["project", "id", "building_limits", "split"]
+        assert split["split"] == created_split["split"]
+
+    @pytest.mark.asyncio
+    async def test_bad_fields(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        response = await test_client.get_split(created_split["id"], fields=["coordinates"])
+        assert response.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
+
     @pytest.mark.asyncio
     async def test_split_not_found(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
         response = await test_client.delete_split(created_split["id"])
@@ -174,6 +401,76 @@ class TestGetSplit:
         assert "'bad_id' is not a valid ObjectId" in response.json().get("detail")
 
 
+class TestUpdateSplit:
+    @pytest.mark.asyncio
+    async def test_elevation_only(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        plateau = {**created_split["height_plateaus"]["features"][0], "properties": {"elevation": 10.0}}
+        response = await test_client.update_split(
+            created_split["id"], {"height_plateaus": {"modified": [{"index": 0, "feature": plateau}]}}
+        )
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        # No geometry work
+        assert "intersect" not in response.headers["server-timing"]
+        split: dict[str, Any] = response.json()
+        assert split["id"] == created_split["id"]
+        assert split["height_plateaus"]["features"][0]["properties"] == {"elevation": 10.0}
+        elevations = [feature["properties"]["elevation"] for feature in split["split"]["features"]]
+        assert 10.0 in elevations
+        assert [feature["geometry"] for feature in split["split"]["features"]] == [
+            feature["geometry"] for feature in created_split["split"]["features"]
+        ]
+
+        response = await test_client.get_split(created_split["id"])
+        assert response.json() == split
+        response = await test_client.get_split(created_split["id"], fields=["summary"])
+        assert response.json()["summary"]["max_elevation"] == 10.0
+
+    @pytest.mark.asyncio
+    async def test_geometry(
+        self, test_client: TestClient, created_split: dict[str, Any], vaterlandsparken_testcase: Testcase
+    ) -> None:
+        # Shrink the building limit to the first height plateau
+        building_limit = {**created_split["height_plateaus"]["features"][0], "properties": {}}
+        response = await test_client.update_split(
+            created_split["id"], {"building_limits": {"modified": [{"index": 0, "feature": building_limit}]}}
+        )
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        split: dict[str, Any] = response.json()
+
+        # Same as splitting the changed inputs from scratch
+        testcase = copy.deepcopy(vaterlandsparken_testcase)
+        testcase["building_limits"]["features"] = [building_limit]
+        expected = await create_sample_split(test_client, testcase)
+        assert split["split"] == expected["split"]
+        await test_client.delete_split(expected["id"])
+
+    @pytest.mark.asyncio
+    async def test_not_covering(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        response = await test_client.update_split(created_split["id"], {"height_plateaus": {"removed": [0]}})
+        assert response.status_code == fastapi.status.HTTP_400_BAD_REQUEST
+        assert "do not completely cover" in response.json()["detail"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "changes, detail",
+        [
+            ({"height_plateaus": {"removed": [3]}}, "Feature 3 does not exist"),
+            ({"building_limits": {"removed": [0]}}, "building_limits"),
+        ],
+    )
+    async def test_invalid(
+        self, test_client: TestClient, created_split: dict[str, Any], changes: dict[str, Any], detail: str
+    ) -> None:
+        response = await test_client.update_split(created_split["id"], changes)
+        assert response.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert detail in json.dumps(response.json())
+
+    @pytest.mark.asyncio
+    async def test_not_found(self, test_client: TestClient) -> None:
+        response = await test_client.update_split(str(bson.ObjectId()), {})
+        assert response.status_code == fastapi.status.HTTP_404_NOT_FOUND
+
+
 class TestDeleteAllSplits:
     @pytest.fixture(autouse=True, scope="function")
     async def cleanup_before_each_test(self, test_client: TestClient) -> None:
@@ -198,6 +495,31 @@ class TestDeleteAllSplits:
         num_deleted = await delete_all_splits(test_client)
         assert num_deleted == len(created_multiple_splits)
 
+    @pytest.mark.asyncio
+    async def test_interrupted(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, vaterlandsparken_testcase: Testcase
+    ) -> None:
+        splits = [await create_sample_split(test_client, vaterlandsparken_testcase) for _ in range(3)]
+        ids = [bson.ObjectId(split["id"]) for split in splits]
+        # A deletion that failed after claiming the first two splits, and one that claimed the last split just now
+        failed_at = datetime.datetime.now(datetime.UTC) - CLAIM_TIMEOUT - datetime.timedelta(minutes=1)
+        await database["splits"].update_many(
+            {"_id": {"$in": ids[:2]}}, {"$set": {"deleting": bson.ObjectId.from_datetime(failed_at)}}
+        )
+        await database["splits"].update_one({"_id": ids[2]}, {"$set": {"deleting": bson.ObjectId()}})
+
+        # The claims of the failed deletion are taken over
+        response = await test_client.delete_split(splits[0]["id"])
+        assert response.status_code == fastapi.status.HTTP_204_NO_CONTENT
+        assert await delete_all_splits(test_client) == 1
+        # The split claimed by the running deletion is left to it
+        response = await test_client.delete_split(splits[2]["id"])
+        assert response.status_code == fastapi.status.HTTP_404_NOT_FOUND
+        assert [item["id"] for item in (await test_client.list_splits()).json()["items"]] == [splits[2]["id"]]
+
+        await database["splits"].update_one({"_id": ids[2]}, {"$unset": {"deleting": True}})
+        assert await delete_all_splits(test_client) == 1
+
 
 class TestListSplits:
     @pytest.fixture(autouse=True, scope="class")
@@ -212,14 +534,13 @@ class TestListSplits:
         pass
 
     @pytest.mark.asyncio
-    async def test_bad_skip(self, test_client: TestClient) -> None:
-        response = await test_client.list_splits(skip=-1)
-        assert response.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
-        type = response.json().get("detail")[0].get("type")
-        assert type == "greater_than_equal"
+    async def test_bad_cursor(self, test_client: TestClient) -> None:
+        response = await test_client.list_splits(after="not a cursor")
+        assert response.status_code == fastapi.status.HTTP_400_BAD_REQUEST
+        assert "not a valid cursor" in response.json().get("detail")
 
     @pytest.mark.asyncio
-    @pytest.mark.parametrize("limit", [-1, 11])
+    @pytest.mark.parametrize("limit", [0, MAX_PAGE_SIZE + 1])
     async def test_bad_limit(self, test_client: TestClient, limit: int) -> None:
         response = await test_client.list_splits(limit=limit)
         assert response.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -227,21 +548,354 @@ class TestListSplits:
         assert type in ["greater_than_equal", "less_than_equal"]
 
     @pytest.mark.asyncio
-    @pytest.mark.parametrize(
-        ["skip", "limit", "expected_len"], [(0, 0, 10), (0, 10, 10), (40, 10, 2), (42, 10, 0), (0, 5, 5), (38, 5, 4)]
-    )
-    async def test_skip_and_limit(
+    @pytest.mark.parametrize(["limit", "expected_lens"], [(10, [10, 10, 10, 10, 2]), (42, [42]), (100, [42])])
+    async def test_pages(
         self,
         test_client: TestClient,
         created_multiple_splits: list[dict[str, Any]],
-        skip: int,
         limit: int,
-        expected_len: int,
+        expected_lens: list[int],
+    ) -> None:
+        ids = []
+        after = None
+        for expected_len in expected_lens:
+            response = await test_client.list_splits(after=after, limit=limit)
+            assert response.status_code == fastapi.status.HTTP_200_OK
+            page = response.json()
+            assert len(page["items"]) == expected_len
+            ids += [item["id"] for item in page["items"]]
+            after = page["next_cursor"]
+        # The last page has no next page
+        assert after is None
+        # All splits are listed exactly once, in the order they were created
+        assert ids == [split["id"] for split in created_multiple_splits]
+
+    @pytest.mark.asyncio
+    async def test_summary(self, test_client: TestClient, created_multiple_splits: list[dict[str, Any]]) -> None:
+        response = await test_client.list_splits(limit=MAX_PAGE_SIZE, fields=["summary"])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        page = response.json()
+        assert page["next_cursor"] is None
+        assert len(page["items"]) == len(created_multiple_splits)
+        assert all(list(item) == ["project", "id", "summary"] for item in page["items"])
+
+
+class TestExportSplits:
+    @pytest.fixture(autouse=True, scope="class")
+    async def cleanup_before(self, test_client: TestClient) -> None:
+        """
+        Cleanup any previously created splits before running any tests in the class
+        """
+        await delete_all_splits(test_client)
+        yield
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("gzip", [False, True])
+    async def test_ndjson(
+        self, test_client: TestClient, created_multiple_splits: list[dict[str, Any]], gzip: bool
+    ) -> None:
+        response = await test_client.export_splits(gzip=gzip)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.headers.get("content-encoding") == ("gzip" if gzip else None)
+        splits = [json.loads(line) for line in response.text.splitlines()]
+        assert splits == created_multiple_splits
+
+    @pytest.mark.asyncio
+    async def test_ndjson_fields(self, test_client: TestClient, created_multiple_splits: list[dict[str, Any]]) -> None:
+        response = await test_client.export_splits(params={"fields": ["summary"]})
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        splits = [json.loads(line) for line in response.text.splitlines()]
+        assert [split["id"] for split in splits] == [split["id"] for split in created_multiple_splits]
+        assert all(list(split) == ["project", "id", "summary"] for split in splits)
+
+    @pytest.mark.asyncio
+    async def test_geojson(self, test_client: TestClient, created_multiple_splits: list[dict[str, Any]]) -> None:
+        response = await test_client.export_splits(params={"format": "geojson"})
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/geo+json"
+        features = response.json()["features"]
+        assert len(features) == sum(len(split["split"]["features"]) for split in created_multiple_splits)
+        assert features[0]["properties"]["split_id"] == created_multiple_splits[0]["id"]
+
+    @pytest.mark.asyncio
+    async def test_empty(self, test_client: TestClient) -> None:
+        response = await test_client.export_splits()
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert response.text == ""
+
+
+class TestIndexes:
+    @pytest.mark.asyncio
+    async def test_ensure_indexes(self, database: AsyncIOMotorDatabase) -> None:
+        names = await ensure_indexes(database)
+        assert names == [index.document["name"] for index in SPLIT_INDEXES]
+        assert await find_missing_indexes(database) == []
+        # Creating the indexes again is a no-op
+        assert await ensure_indexes(database) == names
+
+    @pytest.mark.asyncio
+    async def test_split_cache_ttl(self, database: AsyncIOMotorDatabase) -> None:
+        # A database of its own, as the app creates the index at startup if the shared cache is enabled
+        database = database.client["test_split_cache_ttl"]
+        # Creating the index again is a no-op
+        for _ in range(2):
+            await ensure_split_cache_ttl(database, datetime.timedelta(hours=1))
+            index = (await database["split_cache"].index_information())[SPLIT_CACHE_TTL_INDEX]
+            assert index["key"] == [("created_at", 1)]
+            assert index["expireAfterSeconds"] == 3600
+        await database.client.drop_database(database.name)
+
+
+class TestMigrateGeometryStorage:
+    @pytest.mark.asyncio
+    async def test_round_trip(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, created_split: dict[str, Any]
+    ) -> None:
+        project = created_split["project"]
+        # Start from GeoJSON, whatever the storage of new split triples is
+        await migrate_geometry_storage(database, GeometryStorage.GEOJSON, project=project)
+        assert await migrate_geometry_storage(database, GeometryStorage.BINARY, project=project) >= 1
+        doc = await database["splits"].find_one({"project": project, "split.encoding": {"$exists": True}})
+        assert doc is not None
+        # Already converted split triples are left alone
+        assert await migrate_geometry_storage(database, GeometryStorage.BINARY, project=project) == 0
+
+        # Binary geometry is decoded for the response
+        response = await test_client.get_split(created_split["id"])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert dict_to_deep_ordered_dict(response.json()) == dict_to_deep_ordered_dict(created_split)
+        response = await test_client.export_splits(params={"format": "geojson"})
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert len(response.json()["features"]) >= len(created_split["split"]["features"])
+
+        assert await migrate_geometry_storage(database, GeometryStorage.GEOJSON, project=project) >= 1
+        response = await test_client.get_split(created_split["id"])
+        assert dict_to_deep_ordered_dict(response.json()) == dict_to_deep_ordered_dict(created_split)
+
+
+class TestDeduplicateInputs:
+    @pytest.mark.asyncio
+    async def test_shared_inputs(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, created_multiple_splits: list[dict[str, Any]]
+    ) -> None:
+        ids = [bson.ObjectId(split["id"]) for split in created_multiple_splits]
+        docs = await database["splits"].find({"_id": {"$in": ids}}).to_list(length=None)
+        for field in INPUT_FIELDS:
+            # All splits reference the same stored input instead of embedding it
+            assert all(field not in doc for doc in docs)
+            keys = {doc[f"{field}_id"] for doc in docs}
+            assert len(keys) == 1
+            assert await database[field].count_documents({"_id": {"$in": list(keys)}}) == 1
+
+        response = await test_client.get_split(created_multiple_splits[0]["id"], fields=["building_limits"])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert response.json()["building_limits"] == created_multiple_splits[0]["building_limits"]
+
+    @pytest.mark.asyncio
+    async def test_embedded_inputs(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, created_split: dict[str, Any]
     ) -> None:
-        response = await test_client.list_splits(skip=skip, limit=limit)
+        # Split triples saved before inputs were deduplicated embed them
+        doc = {key: value for key, value in created_split.items() if key != "id"}
+        res = await database["splits"].insert_one(doc)
+        response = await test_client.get_split(str(res.inserted_id))
         assert response.status_code == fastapi.status.HTTP_200_OK
-        items = response.json()
-        assert isinstance(items, list)
-        assert len(items) == expected_len
+        assert response.json() == {**created_split, "id": str(res.inserted_id)}
+        response = await test_client.delete_split(str(res.inserted_id))
+        assert response.status_code == fastapi.status.HTTP_204_NO_CONTENT
+
+    @staticmethod
+    def unique_testcase(testcase: Testcase, elevation: float) -> Testcase:
+        # An elevation no other test uses, so that the stored height plateaus are referenced by this test only
+        testcase = copy.deepcopy(testcase)
+        testcase["height_plateaus"]["features"][0]["properties"]["elevation"] = elevation
+        return testcase
+
+    @staticmethod
+    async def input_keys(database: AsyncIOMotorDatabase, id: str) -> dict[str, str]:
+        doc = await database["splits"].find_one({"_id": bson.ObjectId(id)})
+        assert doc is not None
+        return {field: doc[f"{field}_id"] for field in INPUT_FIELDS}
+
+    @pytest.mark.asyncio
+    async def test_delete_releases_inputs(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, vaterlandsparken_testcase: Testcase
+    ) -> None:
+        testcase = self.unique_testcase(vaterlandsparken_testcase, 101.5)
+        splits = [await create_sample_split(test_client, testcase) for _ in range(2)]
+        keys = await self.input_keys(database, splits[0]["id"])
+        assert await database["height_plateaus"].find_one({"_id": keys["height_plateaus"]}, ["refs"]) == {
+            "_id": keys["height_plateaus"],
+            "refs": 2,
+        }
+
+        # The inputs are kept while another split references them
+        assert (await test_client.delete_split(splits[0]["id"])).status_code == fastapi.status.HTTP_204_NO_CONTENT
+        response = await test_client.get_split(splits[1]["id"], fields=["height_plateaus"])
+        assert response.json()["height_plateaus"] == testcase["height_plateaus"]
+
+        # Deleting the last split that references them deletes them
+        assert (await test_client.delete_split(splits[1]["id"])).status_code == fastapi.status.HTTP_204_NO_CONTENT
+        assert await database["height_plateaus"].count_documents({"_id": keys["height_plateaus"]}) == 0
+        # A split deleted again releases nothing
+        assert (await test_client.delete_split(splits[1]["id"])).status_code == fastapi.status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_update_releases_inputs(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, vaterlandsparken_testcase: Testcase
+    ) -> None:
+        split = await create_sample_split(test_client, self.unique_testcase(vaterlandsparken_testcase, 102.5))
+        keys = await self.input_keys(database, split["id"])
+        plateau = {**split["height_plateaus"]["features"][0], "properties": {"elevation": 102.75}}
+        changes = {"height_plateaus": {"modified": [{"index": 0, "feature": plateau}]}}
+        response = await test_client.update_split(split["id"], changes)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+
+        # The replaced height plateaus are deleted, the unchanged building limits are kept
+        new_keys = await self.input_keys(database, split["id"])
+        assert new_keys["building_limits"] == keys["building_limits"]
+        assert await database["height_plateaus"].count_documents({"_id": keys["height_plateaus"]}) == 0
+        assert await database["height_plateaus"].count_documents({"_id": new_keys["height_plateaus"]}) == 1
+        await test_client.delete_split(split["id"])
+
+    @pytest.mark.asyncio
+    async def test_delete_all_releases_inputs(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, vaterlandsparken_testcase: Testcase
+    ) -> None:
+        testcase = self.unique_testcase(vaterlandsparken_testcase, 103.5)
+        async with TestClient(project="delete_all_releases_inputs") as client:
+            splits = [await create_sample_split(client, testcase) for _ in range(3)]
+            keys = await self.input_keys(database, splits[0]["id"])
+            assert await delete_all_splits(client) == 3
+        assert await database["height_plateaus"].count_documents({"_id": keys["height_plateaus"]}) == 0
 
-    # def test_skip_non_negative()
+    @pytest.mark.asyncio
+    async def test_released_while_reading(
+        self, test_client: TestClient, database: AsyncIOMotorDatabase, vaterlandsparken_testcase: Testcase
+    ) -> None:
+        splits = [
+            await create_sample_split(test_client, self.unique_testcase(vaterlandsparken_testcase, elevation))
+            for elevation in (104.5, 105.5)
+        ]
+        # Read the split triples, then delete the first and replace the height plateaus of the second
+        # before their inputs are read
+        docs = (
+            await database["splits"]
+            .find({"_id": {"$in": [bson.ObjectId(split["id"]) for split in splits]}})
+            .to_list(length=None)
+        )
+        assert (await test_client.delete_split(splits[0]["id"])).status_code == fastapi.status.HTTP_204_NO_CONTENT
+        plateau = {**splits[1]["height_plateaus"]["features"][0], "properties": {"elevation": 105.75}}
+        changes = {"height_plateaus": {"modified": [{"index": 0, "feature": plateau}]}}
+        response = await test_client.update_split(splits[1]["id"], changes)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+
+        # The deleted split triple is left out, the replaced one is read again
+        (doc,) = await _with_inputs(database, docs)
+        assert doc["_id"] == bson.ObjectId(splits[1]["id"])
+        assert doc["height_plateaus"]["features"][0]["properties"] == {"elevation": 105.75}
+        await test_client.delete_split(splits[1]["id"])
+
+
+class TestHealth:
+    @pytest.mark.asyncio
+    async def test_health(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        response = await test_client.health()
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        body = response.json()
+        assert body["health"] == "OK"
+        pool = body["mongodb_pool"]
+        assert set(pool) == {"pools", "max_size", "open", "checked_out", "waiting", "wait_queue_timeouts", "saturation"}
+        assert 0 <= pool["checked_out"] <= pool["max_size"]
+        assert 0.0 <= pool["saturation"] <= 1.0
+
+
+class TestMetrics:
+    @pytest.mark.asyncio
+    async def test_metrics(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        response = await test_client.get_split(created_split["id"])
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        response = await test_client.metrics()
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        lines = response.text.splitlines()
+        route_samples = [
+            line
+            for line in lines
+            if line.startswith(
+                'arch_api_request_duration_seconds_count{method="GET",route="/projects/{project}/splits/{id}"'
+            )
+        ]
+        assert route_samples
+        for stage in ["intersect", "serialize"]:
+            assert any(line.startswith(f'arch_api_stage_duration_seconds_count{{stage="{stage}"}}') for line in lines)
+        assert any(
+            line.startswith('arch_api_split_input_vertices_count{collection="height_plateaus"}') for line in lines
+        )
+        assert "arch_api_requests_in_flight 1" in lines
+
+
+@pytest.fixture
+def header_profiling(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(arch_api.app._PROFILING, "allow_header", True)
+
+
+class TestProfiles:
+    @pytest.mark.asyncio
+    async def test_disabled(self, test_client: TestClient, vaterlandsparken_testcase: Testcase) -> None:
+        response = await test_client.create_split(vaterlandsparken_testcase, profile=True)
+        assert response.status_code == fastapi.status.HTTP_201_CREATED
+        assert "X-Profile-Id" not in response.headers
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("header_profiling")
+    async def test_create_split(self, test_client: TestClient, vaterlandsparken_testcase: Testcase) -> None:
+        # Profiled even though the split is cached
+        await test_client.create_split(vaterlandsparken_testcase)
+        response = await test_client.create_split(vaterlandsparken_testcase, profile=True)
+        assert response.status_code == fastapi.status.HTTP_201_CREATED
+        assert response.headers["Server-Timing"] != 'cache;desc="hit"'
+        profile_id = response.headers["X-Profile-Id"]
+
+        response = await test_client.get_profile(profile_id)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        profile = response.json()
+        assert profile["route"] == "POST /projects/{project}/splits"
+        assert profile["reason"] == "header"
+        assert profile["complexity"]["height_plateaus_features"] == 3
+        assert list(profile["timings"]) == ["ingest", "validate", "cover_check", "intersect", "flatten", "summarize"]
+        assert "run_split_pipeline" in profile["summary"]
+        # The input can be split again to reproduce the profile
+        response = await test_client.create_split(profile["input"])
+        assert response.status_code == fastapi.status.HTTP_201_CREATED
+
+        profiles = (await test_client.list_profiles()).json()
+        assert profiles[0]["id"] == profile_id
+        assert "input" not in profiles[0]
+
+        response = await test_client.download_profile_stats(profile_id)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        stats = marshal.loads(response.content)
+        assert any(function == "run_split_pipeline" for _, _, function in stats)
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("header_profiling")
+    async def test_update_split(self, test_client: TestClient, created_split: dict[str, Any]) -> None:
+        feature = copy.deepcopy(created_split["height_plateaus"]["features"][0])
+        feature["properties"]["elevation"] = 42.0
+        changes = {"height_plateaus": {"modified": [{"index": 0, "feature": feature}]}}
+        response = await test_client.update_split(created_split["id"], changes, profile=True)
+        assert response.status_code == fastapi.status.HTTP_200_OK
+        profile = (await test_client.get_profile(response.headers["X-Profile-Id"])).json()
+        assert profile["route"] == "PATCH /projects/{project}/splits/{id}"
+        assert profile["split_id"] == created_split["id"]
+        assert profile["changes"]["height_plateaus"]["modified"][0]["feature"]["properties"]["elevation"] == 42.0
+        assert profile["input"]["height_plateaus"]["features"][0]["properties"]["elevation"] == 42.0
+
+    @pytest.mark.asyncio
+    async def test_not_found(self, test_client: TestClient) -> None:
+        response = await test_client.get_profile(str(bson.ObjectId()))
+        assert response.status_code == fastapi.status.HTTP_404_NOT_FOUND
+        response = await test_client.download_profile_stats(str(bson.ObjectId()))
+        assert response.status_code == fastapi.status.HTTP_404_NOT_FOUND
@@ -0,0 +1,123 @@
+import copy
+from typing import Any
+
+import pydantic_core
+import pytest
+from arch_api.cache import SplitCache, split_cache_key
+from arch_api.models.io import BuildingLimits, HeightPlateaus
+from arch_api.splitting import run_split_pipeline
+
+from tests.conftest import Testcase
+
+
+def cache_key(testcase: Testcase) -> str:
+    return split_cache_key(BuildingLimits(**testcase["building_limits"]), HeightPlateaus(**testcase["height_plateaus"]))
+
+
+def first_ring(testcase: Testcase) -> list[list[float]]:
+    ring: list[list[float]] = testcase["height_plateaus"]["features"][0]["geometry"]["coordinates"][0]
+    return ring
+
+
+class TestSplitCacheKey:
+    def test_stable(self, vaterlandsparken_testcase: Testcase) -> None:
+        assert cache_key(vaterlandsparken_testcase) == cache_key(copy.deepcopy(vaterlandsparken_testcase))
+
+    def test_ring_start_vertex(self, vaterlandsparken_testcase: Testcase) -> None:
+        key = cache_key(vaterlandsparken_testcase)
+        ring = first_ring(vaterlandsparken_testcase)
+        # Start the ring at its second vertex
+        ring[:] = ring[1:] + ring[1:2]
+        assert cache_key(vaterlandsparken_testcase) == key
+
+    def test_ring_orientation(self, vaterlandsparken_testcase: Testcase) -> None:
+        key = cache_key(vaterlandsparken_testcase)
+        first_ring(vaterlandsparken_testcase).reverse()
+        assert cache_key(vaterlandsparken_testcase) == key
+
+    def test_rounding(self, vaterlandsparken_testcase: Testcase) -> None:
+        key = cache_key(vaterlandsparken_testcase)
+        ring = first_ring(vaterlandsparken_testcase)
+        ring[0][0] = round(ring[0][0], 7) + 1e-10
+        ring[-1][0] = ring[0][0]
+        assert cache_key(vaterlandsparken_testcase) == key
+
+    def test_different_geometry(self, vaterlandsparken_testcase: Testcase) -> None:
+        key = cache_key(vaterlandsparken_testcase)
+        ring = first_ring(vaterlandsparken_testcase)
+        ring[0][0] += 1e-3
+        ring[-1][0] = ring[0][0]
+        assert cache_key(vaterlandsparken_testcase) != key
+
+    def test_inner_rings(self, vaterlandsparken_testcase: Testcase) -> None:
+        def square(x: float, y: float, size: float) -> list[list[float]]:
+            return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+        building_limit = vaterlandsparken_testcase["building_limits"]["features"][0]
+        building_limit["geometry"]["coordinates"] = [square(0, 0, 10), square(1, 1, 2), square(5, 5, 2)]
+        key = cache_key(vaterlandsparken_testcase)
+        exterior, first, second = building_limit["geometry"]["coordinates"]
+        # Swap the inner rings, reverse the first and start the second at another vertex
+        building_limit["geometry"]["coordinates"] = [exterior, second[1:] + second[1:2], first[::-1]]
+        assert cache_key(vaterlandsparken_testcase) == key
+
+        building_limit["geometry"]["coordinates"] = [exterior, first, square(5, 5, 3)]
+        assert cache_key(vaterlandsparken_testcase) != key
+
+    def test_different_elevation(self, vaterlandsparken_testcase: Testcase) -> None:
+        key = cache_key(vaterlandsparken_testcase)
+        vaterlandsparken_testcase["height_plateaus"]["features"][0]["properties"]["elevation"] += 1.0
+        assert cache_key(vaterlandsparken_testcase) != key
+
+
+@pytest.fixture
+def split(vaterlandsparken_testcase: Testcase) -> dict[str, Any]:
+    result = run_split_pipeline(
+        BuildingLimits(**vaterlandsparken_testcase["building_limits"]),
+        HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"]),
+    )
+    return {"split": result.geojson, "summary": result.summary, "provenance": result.provenance}
+
+
+class TestSplitCache:
+    @pytest.mark.asyncio
+    async def test_hit_and_miss(self, split: dict[str, Any]) -> None:
+        cache = SplitCache(max_bytes=1024 * 1024)
+        assert await cache.get("key") is None
+        await cache.put("key", split)
+        assert await cache.get("key") is split
+        stats: dict[str, Any] = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        assert 0 < stats["size_bytes"] <= stats["max_bytes"]
+
+    @pytest.mark.asyncio
+    async def test_size(self, split: dict[str, Any]) -> None:
+        cache = SplitCache(max_bytes=1024 * 1024)
+        await cache.put("key", split)
+        # Estimated from the number of positions, close to the size serialized as JSON
+        assert 0.5 < cache.stats()["size_bytes"] / len(pydantic_core.to_json(split)) < 2
+
+    @pytest.mark.asyncio
+    async def test_eviction(self, split: dict[str, Any]) -> None:
+        cache = SplitCache(max_bytes=1024 * 1024)
+        await cache.put("key", split)
+        size = cache.stats()["size_bytes"]
+        # Room for two entries only
+        cache = SplitCache(max_bytes=2 * size + size // 2)
+        for key in ["a", "b"]:
+            await cache.put(key, split)
+        # Use "a", so that "b" is the least recently used entry
+        assert await cache.get("a") is not None
+        await cache.put("c", split)
+        assert await cache.get("b") is None
+        assert await cache.get("a") is not None
+        assert await cache.get("c") is not None
+        assert cache.stats()["entries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_disabled(self, split: dict[str, Any]) -> None:
+        cache = SplitCache(max_bytes=0)
+        await cache.put("key", split)
+        assert await cache.get("key") is None
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+from arch_api.compute import ComputeExecutor, ExecutorKind
+from arch_api.exceptions import ComputeQueueFullError, ComputeTimeoutError, SplittingError
+from arch_api.models.io import BuildingLimits, HeightPlateaus
+from arch_api.splitting import split_building_limits_by_height_plateaus
+
+from tests.conftest import Testcase
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+def sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+class TestComputeExecutor:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("kind", list(ExecutorKind))
+    async def test_run(self, kind: ExecutorKind) -> None:
+        executor = ComputeExecutor(kind=kind, max_workers=1)
+        try:
+            assert await executor.run(add, 1, b=2) == 3
+            assert executor.pending == 0
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_split_in_process_pool(self, vaterlandsparken_testcase: Testcase) -> None:
+        executor = ComputeExecutor(kind=ExecutorKind.PROCESS, max_workers=1)
+        try:
+            split = await executor.run(
+                split_building_limits_by_height_plateaus,
+                BuildingLimits(**vaterlandsparken_testcase["building_limits"]),
+                HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"]),
+            )
+            assert len(split.features) == 3
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_splitting_error_is_propagated(self, vaterlandsparken_testcase: Testcase) -> None:
+        executor = ComputeExecutor(kind=ExecutorKind.THREAD, max_workers=1)
+        try:
+            with pytest.raises(SplittingError, match="do not completely cover"):
+                await executor.run(
+                    split_building_limits_by_height_plateaus,
+                    BuildingLimits(**vaterlandsparken_testcase["building_limits"]),
+                    # Only keep the first height plateau, so the building limits are not covered
+                    HeightPlateaus(
+                        type="FeatureCollection", features=vaterlandsparken_testcase["height_plateaus"]["features"][:1]
+                    ),
+                )
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_queue_full(self) -> None:
+        executor = ComputeExecutor(kind=ExecutorKind.THREAD, max_workers=1, max_queue_size=1, retry_after=3)
+        try:
+            # One running and one queued job fill up the executor
+            jobs = [asyncio.create_task(executor.run(sleep, 0.2)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            with pytest.raises(ComputeQueueFullError) as exc_info:
+                await executor.run(add, 1, 2)
+            assert exc_info.value.retry_after == 3
+            assert await asyncio.gather(*jobs) == [0.2, 0.2]
+            # Capacity is available again once the jobs are done
+            assert await executor.run(add, 1, 2) == 3
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_timeout(self) -> None:
+        executor = ComputeExecutor(kind=ExecutorKind.THREAD, max_workers=1, timeout=0.05)
+        try:
+            with pytest.raises(ComputeTimeoutError):
+                await executor.run(sleep, 0.5)
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_warm_up(self) -> None:
+        executor = ComputeExecutor(kind=ExecutorKind.PROCESS, max_workers=2, warm_up_modules=["arch_api.splitting"])
+        try:
+            await executor.warm_up()
+            assert executor.pending == 0
+            # Checked with a builtin, as running a function of this module would import arch_api.splitting with it
+            assert await executor.run(eval, "'arch_api.splitting' in __import__('sys').modules")
+        finally:
+            executor.shutdown()
+
+    def test_invalid_max_workers(self) -> None:
+        with pytest.raises(ValueError, match="max_workers"):
+            ComputeExecutor(max_workers=0)
@@ -0,0 +1,98 @@
+import pytest
+from arch_api.db import DatabaseConnection, PoolMonitor, PoolSettings, ReadPreferenceMode, WriteConcernLevel
+from pymongo import ReadPreference, monitoring
+from pymongo.write_concern import WriteConcern
+
+
+class TestWriteConcernLevel:
+    @pytest.mark.parametrize(
+        "level, expected",
+        [
+            ("acknowledged", WriteConcern(w=1)),
+            ("majority", WriteConcern(w="majority")),
+            ("journaled", WriteConcern(w=1, j=True)),
+        ],
+    )
+    def test_write_concern(self, level: str, expected: WriteConcern) -> None:
+        assert WriteConcernLevel(level).write_concern() == expected
+
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError):
+            WriteConcernLevel("unacknowledged")
+
+
+class TestReadPreferenceMode:
+    @pytest.mark.parametrize("mode", list(ReadPreferenceMode))
+    def test_read_preference(self, mode: ReadPreferenceMode) -> None:
+        assert mode.read_preference().mongos_mode == mode.value
+
+
+class TestPoolSettings:
+    def test_client_options(self) -> None:
+        settings = PoolSettings(max_size=50, min_size=5, max_idle_time=60, wait_queue_timeout=0.5)
+        assert settings.client_options() == {
+            "maxPoolSize": 50,
+            "minPoolSize": 5,
+            "maxIdleTimeMS": 60000,
+            "waitQueueTimeoutMS": 500,
+        }
+
+    def test_defaults(self) -> None:
+        assert PoolSettings().client_options() == {}
+
+
+class TestPoolMonitor:
+    def test_stats(self) -> None:
+        monitor = PoolMonitor()
+        address = ("localhost", 27017)
+        monitor.pool_created(monitoring.PoolCreatedEvent(address, {"maxPoolSize": 4}))
+        for connection_id in range(3):
+            monitor.connection_created(monitoring.ConnectionCreatedEvent(address, connection_id))
+            monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+            monitor.connection_checked_out(monitoring.ConnectionCheckedOutEvent(address, connection_id))
+        monitor.connection_checked_in(monitoring.ConnectionCheckedInEvent(address, 0))
+        monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+        monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+        monitor.connection_check_out_failed(
+            monitoring.ConnectionCheckOutFailedEvent(address, monitoring.ConnectionCheckOutFailedReason.TIMEOUT)
+        )
+        assert monitor.stats() == {
+            "pools": 1,
+            "max_size": 4,
+            "open": 3,
+            "checked_out": 2,
+            "waiting": 1,
+            "wait_queue_timeouts": 1,
+            "saturation": 0.5,
+        }
+        monitor.pool_closed(monitoring.PoolClosedEvent(address))
+        assert monitor.stats()["pools"] == 0
+
+    def test_default_max_size(self) -> None:
+        monitor = PoolMonitor()
+        monitor.pool_created(monitoring.PoolCreatedEvent(("localhost", 27017), {}))
+        assert monitor.stats()["max_size"] == 100
+
+
+class TestDatabaseConnection:
+    def test_connect(self) -> None:
+        connection = DatabaseConnection(
+            "mongodb://localhost:27017",
+            read_preference=ReadPreferenceMode.SECONDARY_PREFERRED,
+            pool=PoolSettings(max_size=5, min_size=1),
+            compressors=["zlib"],
+        )
+        with pytest.raises(RuntimeError):
+            _ = connection.db
+        db = connection.connect()
+        try:
+            assert connection.db is db
+            assert db.read_preference == ReadPreference.SECONDARY_PREFERRED
+            options = db.client.options
+            assert options.pool_options.max_pool_size == 5
+            assert options.pool_options.min_pool_size == 1
+            assert connection.pool_monitor in options.event_listeners
+        finally:
+            connection.close()
+        with pytest.raises(RuntimeError):
+            _ = connection.db
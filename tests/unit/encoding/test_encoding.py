@@ -0,0 +1,60 @@
+from typing import Any
+
+import bson
+import pytest
+from arch_api.encoding import (
+    GeometryStorage,
+    decode_feature_collection,
+    encode_feature_collection,
+    encode_split_triple,
+    is_encoded,
+)
+from arch_api.models.io import HeightPlateaus
+
+
+@pytest.fixture
+def feature_collection(vaterlandsparken_testcase: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    return HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"]).model_dump()
+
+
+class TestEncodeFeatureCollection:
+    def test_round_trip(self, feature_collection: dict[str, Any]) -> None:
+        encoded = encode_feature_collection(feature_collection)
+        assert is_encoded(encoded)
+        assert all(feature["geometry"]["coordinates"] is None for feature in encoded["features"])
+        decoded = decode_feature_collection(encoded)
+        assert decoded == feature_collection
+        # Same members in the same order
+        assert list(decoded) == list(feature_collection)
+        assert [list(feature["geometry"]) for feature in decoded["features"]] == [
+            list(feature["geometry"]) for feature in feature_collection["features"]
+        ]
+
+    def test_smaller(self, feature_collection: dict[str, Any]) -> None:
+        encoded = encode_feature_collection(feature_collection)
+        assert len(bson.encode(encoded)) < len(bson.encode(feature_collection))
+
+    def test_bson_round_trip(self, feature_collection: dict[str, Any]) -> None:
+        # Binary fields come back from the database as bytes
+        encoded = bson.decode(bson.encode(encode_feature_collection(feature_collection)))
+        assert decode_feature_collection(encoded) == feature_collection
+
+    def test_idempotent(self, feature_collection: dict[str, Any]) -> None:
+        encoded = encode_feature_collection(feature_collection)
+        assert encode_feature_collection(encoded) == encoded
+        assert decode_feature_collection(feature_collection) == feature_collection
+
+    def test_empty(self) -> None:
+        feature_collection: dict[str, Any] = {"type": "FeatureCollection", "features": []}
+        assert decode_feature_collection(encode_feature_collection(feature_collection)) == feature_collection
+
+
+class TestEncodeSplitTriple:
+    @pytest.mark.parametrize("storage", list(GeometryStorage))
+    def test_storage(self, feature_collection: dict[str, Any], storage: GeometryStorage) -> None:
+        summary = {"num_features": 1}
+        split_triple = {"building_limits": feature_collection, "split": feature_collection, "summary": summary}
+        encoded = encode_split_triple(split_triple, storage)
+        assert is_encoded(encoded["split"]) == (storage is GeometryStorage.BINARY)
+        assert is_encoded(encoded["building_limits"]) == (storage is GeometryStorage.BINARY)
+        assert encoded["summary"] == summary
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import shapely
+from arch_api.geometry import (
+    polygon_buffers,
+    polygons_from_features,
+    polygons_to_coordinates,
+)
+from arch_api.models.io import BuildingLimits, HeightPlateaus
+
+from tests.conftest import Testcase, load_testcase
+
+
+@pytest.fixture
+def inner_ring_testcase() -> Testcase:
+    return load_testcase("valid_inner_ring_stripes")
+
+
+class TestPolygonBuffers:
+    def test_inner_rings(self, inner_ring_testcase: Testcase) -> None:
+        building_limits = BuildingLimits(**inner_ring_testcase["building_limits"])
+        coords, ring_offsets, polygon_offsets = polygon_buffers(building_limits.features)
+        rings = [ring for feature in building_limits.features for ring in feature.geometry.coordinates]
+        # The first building limit has an inner ring, the second one does not
+        assert polygon_offsets.tolist() == [0, 2, 3]
+        assert ring_offsets.tolist() == np.cumsum([0] + [len(ring) for ring in rings]).tolist()
+        assert coords.shape == (ring_offsets[-1], 2)
+        assert coords[ring_offsets[1]].tolist() == list(rings[1][0])
+
+
+class TestPolygonsFromFeatures:
+    def test_equal_to_shape(self, inner_ring_testcase: Testcase, vaterlandsparken_testcase: Testcase) -> None:
+        for testcase in [inner_ring_testcase, vaterlandsparken_testcase]:
+            height_plateaus = HeightPlateaus(**testcase["height_plateaus"])
+            building_limits = BuildingLimits(**testcase["building_limits"])
+            for features in [height_plateaus.features, building_limits.features]:
+                polygons = polygons_from_features(features)
+                expected = [shapely.geometry.shape(feature.geometry.model_dump()) for feature in features]
+                assert len(polygons) == len(expected)
+                assert all(shapely.equals_exact(polygons, expected, tolerance=0))
+
+
+class TestPolygonsToCoordinates:
+    def test_round_trip(self, inner_ring_testcase: Testcase) -> None:
+        building_limits = BuildingLimits(**inner_ring_testcase["building_limits"])
+        coordinates = polygons_to_coordinates(polygons_from_features(building_limits.features))
+        assert coordinates == [feature.geometry.coordinates for feature in building_limits.features]
+
+    def test_empty(self) -> None:
+        assert polygons_to_coordinates(np.array([], dtype=object)) == []
@@ -0,0 +1,124 @@
+import asyncio
+import datetime
+
+import fastapi
+import pytest
+from arch_api.metrics import (
+    ApiMetrics,
+    CommandDurationListener,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    RequestMetricsMiddleware,
+    monitor_event_loop_lag,
+)
+from httpx import AsyncClient
+from pymongo import monitoring
+
+
+class TestHistogram:
+    def test_render(self) -> None:
+        histogram = Histogram("duration_seconds", "Duration", ("route",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.1, route="/a")
+        histogram.observe(0.5, route="/a")
+        histogram.observe(5.0, route="/a")
+        assert histogram.render().splitlines() == [
+            "# HELP duration_seconds Duration",
+            "# TYPE duration_seconds histogram",
+            'duration_seconds_bucket{route="/a",le="0.1"} 2',
+            'duration_seconds_bucket{route="/a",le="1"} 3',
+            'duration_seconds_bucket{route="/a",le="+Inf"} 4',
+            'duration_seconds_sum{route="/a"} 5.65',
+            'duration_seconds_count{route="/a"} 4',
+        ]
+
+    def test_wrong_labels(self) -> None:
+        histogram = Histogram("duration_seconds", "Duration", ("route",))
+        with pytest.raises(ValueError):
+            histogram.observe(1.0)
+        with pytest.raises(ValueError):
+            histogram.observe(1.0, method="GET")
+
+    def test_unsorted_buckets(self) -> None:
+        with pytest.raises(ValueError):
+            Histogram("duration_seconds", "Duration", buckets=(1.0, 0.1))
+
+
+class TestGauge:
+    def test_inc_dec(self) -> None:
+        gauge = Gauge("in_flight", "In flight")
+        assert "in_flight 0" in gauge.render().splitlines()
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert "in_flight 1" in gauge.render().splitlines()
+
+    def test_function(self) -> None:
+        gauge = Gauge("pending", "Pending", function=lambda: 3)
+        assert "pending 3" in gauge.render().splitlines()
+
+    def test_escape_label_value(self) -> None:
+        gauge = Gauge("value", "Value", ("name",))
+        gauge.set(1.5, name='a "b"\\\n')
+        assert 'value{name="a \\"b\\"\\\\\\n"} 1.5' in gauge.render().splitlines()
+
+
+class TestMetricsRegistry:
+    def test_duplicate_name(self) -> None:
+        registry = MetricsRegistry()
+        registry.register(Gauge("value", "Value"))
+        with pytest.raises(ValueError):
+            registry.register(Gauge("value", "Other value"))
+
+
+class TestRequestMetricsMiddleware:
+    async def test_route_template(self) -> None:
+        metrics = ApiMetrics()
+        app = fastapi.FastAPI()
+        app.add_middleware(RequestMetricsMiddleware, metrics=metrics)
+
+        @app.get("/items/{id}")
+        async def get_item(id: str) -> dict[str, str]:
+            return {"id": id}
+
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            await client.get("/items/1")
+            await client.get("/items/2")
+            await client.get("/unknown")
+        rendered = metrics.render().splitlines()
+        assert 'arch_api_request_duration_seconds_count{method="GET",route="/items/{id}",status="200"} 2' in rendered
+        assert 'arch_api_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in rendered
+        assert "arch_api_requests_in_flight 0" in rendered
+
+
+class TestCommandDurationListener:
+    def test_observe(self) -> None:
+        histogram = Histogram("command_seconds", "Command", ("command", "outcome"))
+        listener = CommandDurationListener(histogram)
+        connection_id = ("localhost", 27017)
+        listener.succeeded(
+            monitoring.CommandSucceededEvent(
+                datetime.timedelta(microseconds=2500), {"ok": 1}, "find", 1, connection_id, 1
+            )
+        )
+        listener.failed(
+            monitoring.CommandFailedEvent(
+                datetime.timedelta(microseconds=1000), {"ok": 0}, "insert", 2, connection_id, 2
+            )
+        )
+        rendered = histogram.render().splitlines()
+        assert 'command_seconds_sum{command="find",outcome="succeeded"} 0.0025' in rendered
+        assert 'command_seconds_count{command="insert",outcome="failed"} 1' in rendered
+
+
+class TestMonitorEventLoopLag:
+    async def test_observe(self) -> None:
+        histogram = Histogram("lag_seconds", "Lag")
+        task = asyncio.create_task(monitor_event_loop_lag(histogram, interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        assert any(
+            line.startswith("lag_seconds_count ") and line != "lag_seconds_count 0"
+            for line in histogram.render().splitlines()
+        )
@@ -1,9 +1,23 @@
+import json
 from typing import Any
 
+import bson
 import pytest
-from arch_api.models.io import HeightPlateaus, ProjectMixin
+from arch_api.encoding import GeometryStorage, encode_split_triple
+from arch_api.models.io import (
+    BuildingLimits,
+    CreateSplitInput,
+    CreateSplitOutput,
+    HeightPlateaus,
+    ListSplitsOutput,
+    ProjectMixin,
+    SplitField,
+    SplitFieldsOutput,
+)
 from pydantic import ValidationError
 
+from tests.conftest import load_testcase
+
 
 class TestProjectMixin:
     @pytest.mark.parametrize("project", ["a", "a" * 50])
@@ -29,3 +43,70 @@ class TestHeightPlateaus:
         height_plateaus["features"][0]["properties"]["elevation"] = "a"
         with pytest.raises(ValidationError, match="'elevation' property must be a float"):
             _height_plateaus = HeightPlateaus(**height_plateaus)
+
+
+class TestCreateSplitInput:
+    def test_complexity(self) -> None:
+        testcase = load_testcase("valid_inner_ring_covering")
+        complexity = CreateSplitInput(**testcase).complexity()
+        for name in ["building_limits", "height_plateaus"]:
+            features = testcase[name]["features"]
+            rings = [ring for feature in features for ring in feature["geometry"]["coordinates"]]
+            assert complexity[f"{name}_features"] == len(features)
+            assert complexity[f"{name}_vertices"] == sum(len(ring) for ring in rings)
+            assert complexity[f"{name}_holes"] == len(rings) - len(features)
+        assert complexity["building_limits_holes"] > 0
+
+
+@pytest.fixture
+def doc(building_limits: dict[str, Any], height_plateaus: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "_id": bson.ObjectId(),
+        "project": "project",
+        "building_limits": BuildingLimits(**building_limits).model_dump(),
+        "height_plateaus": HeightPlateaus(**height_plateaus).model_dump(),
+        "split": HeightPlateaus(**height_plateaus).model_dump(),
+        "summary": {
+            "bbox": [0.0, 1.0, 2.0, 3.0],
+            "num_features": 3,
+            "area": 4.0,
+            "min_elevation": 5.0,
+            "max_elevation": 6.0,
+        },
+    }
+
+
+class TestCreateSplitOutput:
+    def test_json_from_doc(self, doc: dict[str, Any]) -> None:
+        expected = CreateSplitOutput.from_doc(doc).model_dump_json()
+        # Same members in the same order
+        assert list(json.loads(CreateSplitOutput.json_from_doc(doc))) == list(json.loads(expected))
+        assert json.loads(CreateSplitOutput.json_from_doc(doc)) == json.loads(expected)
+
+    def test_json_from_encoded_doc(self, doc: dict[str, Any]) -> None:
+        encoded_doc = encode_split_triple(doc, GeometryStorage.BINARY)
+        assert CreateSplitOutput.json_from_doc(encoded_doc) == CreateSplitOutput.json_from_doc(doc)
+        assert CreateSplitOutput.from_doc(encoded_doc) == CreateSplitOutput.from_doc(doc)
+
+
+class TestSplitFieldsOutput:
+    @pytest.mark.parametrize("fields", [["summary"], ["split", "building_limits"], ["summary", "split", "summary"]])
+    def test_json_from_doc(self, doc: dict[str, Any], fields: list[SplitField]) -> None:
+        expected = SplitFieldsOutput.from_doc(doc, fields).model_dump_json(exclude_unset=True)
+        assert SplitFieldsOutput.json_from_doc(doc, fields).decode() == expected
+
+    def test_json_from_doc_without_summary(self, doc: dict[str, Any]) -> None:
+        del doc["summary"]
+        assert json.loads(SplitFieldsOutput.json_from_doc(doc, ["summary"]))["summary"] is None
+
+
+class TestListSplitsOutput:
+    @pytest.mark.parametrize("fields", [None, ["summary"]])
+    def test_json_from_docs(self, doc: dict[str, Any], fields: list[SplitField] | None) -> None:
+        docs = [doc, {**doc, "_id": bson.ObjectId()}]
+        if fields is None:
+            items: list[CreateSplitOutput | SplitFieldsOutput] = [CreateSplitOutput.from_doc(doc) for doc in docs]
+        else:
+            items = [SplitFieldsOutput.from_doc(doc, fields) for doc in docs]
+        expected = ListSplitsOutput(items=items, next_cursor="cursor").model_dump_json(exclude_unset=True)
+        assert json.loads(ListSplitsOutput.json_from_docs(docs, "cursor", fields)) == json.loads(expected)
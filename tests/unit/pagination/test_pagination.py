@@ -0,0 +1,15 @@
+import bson
+import pytest
+from arch_api.exceptions import InvalidCursorError
+from arch_api.pagination import decode_cursor, encode_cursor
+
+
+class TestCursor:
+    def test_round_trip(self) -> None:
+        id = bson.ObjectId()
+        assert decode_cursor(encode_cursor(id)) == id
+
+    @pytest.mark.parametrize("cursor", ["", "a", "not a cursor", encode_cursor(bson.ObjectId()) + "AA"])
+    def test_invalid(self, cursor: str) -> None:
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor)
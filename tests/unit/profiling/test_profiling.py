@@ -0,0 +1,51 @@
+import pstats
+from pathlib import Path
+
+import pytest
+from arch_api.models.io import BuildingLimits, HeightPlateaus
+from arch_api.profiling import ProfileReason, ProfilingPolicy, run_profiled
+from arch_api.splitting import run_split_pipeline
+
+from tests.conftest import Testcase
+
+
+class TestRunProfiled:
+    def test_split_pipeline(self, vaterlandsparken_testcase: Testcase, tmp_path: Path) -> None:
+        building_limits = BuildingLimits(**vaterlandsparken_testcase["building_limits"])
+        height_plateaus = HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"])
+        result, profile = run_profiled(run_split_pipeline, building_limits, height_plateaus)
+        assert result.geojson == run_split_pipeline(building_limits, height_plateaus).geojson
+        assert "run_split_pipeline" in profile.summary
+
+        # The statistics can be loaded like a file written by cProfile
+        path = tmp_path / "split.prof"
+        path.write_bytes(profile.stats)
+        functions = {function for _, _, function in pstats.Stats(str(path)).stats}  # type: ignore[attr-defined]
+        assert "run_split_pipeline" in functions
+
+
+class TestProfilingPolicy:
+    def test_disabled(self) -> None:
+        policy = ProfilingPolicy()
+        assert not policy.enabled
+        assert policy.decide(header=True) is None
+        assert policy.decide(header=False) is None
+
+    def test_header(self) -> None:
+        policy = ProfilingPolicy(allow_header=True, min_duration=10.0)
+        assert policy.enabled
+        assert policy.decide(header=True) is ProfileReason.HEADER
+        assert policy.decide(header=False) is None
+        # Profiles that were asked for are kept no matter how long the request took
+        assert policy.keep(ProfileReason.HEADER, 0.1)
+
+    def test_sampled(self) -> None:
+        policy = ProfilingPolicy(sample_rate=1.0, min_duration=1.0)
+        assert policy.decide(header=True) is ProfileReason.SAMPLED
+        assert not policy.keep(ProfileReason.SAMPLED, 0.5)
+        assert policy.keep(ProfileReason.SAMPLED, 1.5)
+
+    @pytest.mark.parametrize("sample_rate", [-0.1, 1.1])
+    def test_invalid_sample_rate(self, sample_rate: float) -> None:
+        with pytest.raises(ValueError):
+            ProfilingPolicy(sample_rate=sample_rate)
@@ -1,35 +1,146 @@
+import pickle
+import warnings
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
 import pytest
-from arch_api.exceptions import SplittingError
-from arch_api.models.io import BuildingLimits, HeightPlateaus
-from arch_api.splitting import check_geometry_overlap, split_building_limits_by_height_plateaus
+import shapely
+from arch_api.exceptions import InvalidFeatureChangesError, SplittingError
+from arch_api.geometry import CRS, polygons_from_features
+from arch_api.models.io import BuildingLimits, FeatureCollectionChanges, HeightPlateaus, Split, SplitSummary
+from arch_api.splitting import (
+    SplitResult,
+    apply_feature_changes,
+    find_geometry_overlaps,
+    find_uncovered_region,
+    intersect_geometries,
+    run_resplit_pipeline,
+    run_split_pipeline,
+    split_building_limits_by_height_plateaus,
+)
 from geopandas import GeoDataFrame
 
 from tests.conftest import Testcase
 
 
-class TestCheckGeometryOverlap:
+def grid(n: int) -> npt.NDArray[np.object_]:
+    """
+    n x n grid of touching unit squares
+    """
+    x, y = np.meshgrid(np.arange(n, dtype=float), np.arange(n, dtype=float))
+    boxes: npt.NDArray[np.object_] = shapely.box(x.ravel(), y.ravel(), x.ravel() + 1, y.ravel() + 1)
+    return boxes
+
+
+class TestFindGeometryOverlaps:
+    def test_touching(self) -> None:
+        assert find_geometry_overlaps(grid(50)) == []
+
+    def test_touching_irregular(self) -> None:
+        # Voronoi cells share edges in arbitrary directions, so their bounding boxes overlap
+        points = shapely.multipoints(np.random.default_rng(0).random((200, 2)) * 10)
+        extent = shapely.box(0, 0, 10, 10)
+        cells = shapely.get_parts(shapely.voronoi_polygons(points, extend_to=extent))
+        assert find_geometry_overlaps(shapely.intersection(cells, extent)) == []
+
+    def test_overlapping(self) -> None:
+        geometries = grid(50)
+        # Shift the square with index 3 halfway into the square with index 4
+        geometries[3] = shapely.box(3.5, 0, 4.5, 1)
+        assert find_geometry_overlaps(geometries) == [(3, 4)]
+
+    def test_contained(self) -> None:
+        geometries = np.append(grid(2), shapely.box(0.25, 0.25, 0.75, 0.75))
+        assert find_geometry_overlaps(geometries) == [(0, 4)]
+
+    def test_below_tolerance(self) -> None:
+        geometries = grid(2)
+        geometries[0] = shapely.box(0, 0, 1 + 1e-8, 1)
+        assert find_geometry_overlaps(geometries) == []
+
     @staticmethod
-    def common(testcase: Testcase) -> tuple[GeoDataFrame, GeoDataFrame]:
-        height_plateaus = testcase["height_plateaus"]
-        building_limits = testcase["building_limits"]
-        height_plateaus_df = GeoDataFrame.from_features(height_plateaus["features"])
-        building_limits_df = GeoDataFrame.from_features(building_limits["features"])
-        return height_plateaus_df, building_limits_df
+    def polygons_of(testcase: Testcase) -> tuple[npt.NDArray[np.object_], npt.NDArray[np.object_]]:
+        height_plateaus = polygons_from_features(HeightPlateaus(**testcase["height_plateaus"]).features)
+        building_limits = polygons_from_features(BuildingLimits(**testcase["building_limits"]).features)
+        return height_plateaus, building_limits
 
     def test_overlapping_height_plateaus(self, overlapping_height_plateaus_testcase: Testcase) -> None:
-        height_plateaus_df, building_limits_df = TestCheckGeometryOverlap.common(overlapping_height_plateaus_testcase)
-        assert check_geometry_overlap(height_plateaus_df)
-        assert not check_geometry_overlap(building_limits_df)
+        height_plateaus, building_limits = TestFindGeometryOverlaps.polygons_of(overlapping_height_plateaus_testcase)
+        assert find_geometry_overlaps(height_plateaus)
+        assert not find_geometry_overlaps(building_limits)
 
     def test_overlapping_building_limits(self, overlapping_building_limits_testcase: Testcase) -> None:
-        height_plateaus_df, building_limits_df = TestCheckGeometryOverlap.common(overlapping_building_limits_testcase)
-        assert not check_geometry_overlap(height_plateaus_df)
-        assert check_geometry_overlap(building_limits_df)
+        height_plateaus, building_limits = TestFindGeometryOverlaps.polygons_of(overlapping_building_limits_testcase)
+        assert not find_geometry_overlaps(height_plateaus)
+        assert find_geometry_overlaps(building_limits)
 
     def test_no_overlap(self, vaterlandsparken_testcase: Testcase) -> None:
-        height_plateaus_df, building_limits_df = TestCheckGeometryOverlap.common(vaterlandsparken_testcase)
-        assert not check_geometry_overlap(height_plateaus_df)
-        assert not check_geometry_overlap(building_limits_df)
+        height_plateaus, building_limits = TestFindGeometryOverlaps.polygons_of(vaterlandsparken_testcase)
+        assert not find_geometry_overlaps(height_plateaus)
+        assert not find_geometry_overlaps(building_limits)
+
+
+class TestFindUncoveredRegion:
+    def test_covered(self) -> None:
+        building_limits = np.array([shapely.box(0.5, 0.5, 9.5, 9.5), shapely.box(20, 20, 21, 21)])
+        assert find_uncovered_region(building_limits, np.append(grid(10), shapely.box(19, 19, 22, 22))) is None
+
+    def test_not_covered(self) -> None:
+        building_limits = np.array([shapely.box(0.5, 0.5, 9.5, 9.5), shapely.box(20, 20, 21, 21)])
+        height_plateaus = np.delete(grid(10), 11)
+        uncovered = find_uncovered_region(building_limits, height_plateaus)
+        assert uncovered is not None
+        index, region = uncovered
+        assert index == 0
+        # The removed square (1, 1) - (2, 2) is not covered
+        assert shapely.equals(shapely.normalize(region), shapely.normalize(shapely.box(1, 1, 2, 2)))
+
+    def test_not_covered_without_candidates(self) -> None:
+        building_limits = np.array([shapely.box(0.5, 0.5, 9.5, 9.5), shapely.box(20, 20, 21, 21)])
+        uncovered = find_uncovered_region(building_limits, grid(10))
+        assert uncovered is not None
+        assert uncovered[0] == 1
+
+    def test_gap_below_tolerance(self) -> None:
+        building_limits = np.array([shapely.box(0, 0, 2, 1)])
+        height_plateaus = np.array([shapely.box(0, 0, 1, 1), shapely.box(1 + 1e-8, 0, 2, 1)])
+        assert find_uncovered_region(building_limits, height_plateaus) is None
+
+
+class TestIntersectGeometries:
+    def test_grid(self) -> None:
+        height_plateaus = grid(4)
+        building_limits = np.array([shapely.box(2, 2, 4, 4), shapely.box(0.5, 0.5, 1.5, 1.5)])
+        geometries, height_plateau_indices, building_limit_indices = intersect_geometries(
+            height_plateaus, building_limits
+        )
+        # Ordered by building limit first. Plateaus that only touch a building limit are dropped
+        assert building_limit_indices.tolist() == [0] * 4 + [1] * 4
+        assert height_plateau_indices.tolist() == [10, 11, 14, 15, 0, 1, 4, 5]
+        assert shapely.area(geometries).tolist() == [1.0] * 4 + [0.25] * 4
+
+    def test_order(self) -> None:
+        height_plateaus = grid(4)
+        # The building limit on the right intersects the height plateau with the lowest index
+        building_limits = np.array([shapely.box(2, 0, 4, 4), shapely.box(0, 0, 2, 4)])
+        _, height_plateau_indices, building_limit_indices = intersect_geometries(height_plateaus, building_limits)
+        assert building_limit_indices.tolist() == [0] * 8 + [1] * 8
+        assert height_plateau_indices.tolist() == [2, 3, 6, 7, 10, 11, 14, 15, 0, 1, 4, 5, 8, 9, 12, 13]
+
+        # Unlike GeoDataFrame.overlay, which starts with the building limit of the first height plateau
+        height_plateaus_df = GeoDataFrame({"height_plateau": range(len(height_plateaus))}, geometry=height_plateaus)
+        building_limits_df = GeoDataFrame({"building_limit": range(len(building_limits))}, geometry=building_limits)
+        split_df = height_plateaus_df.overlay(building_limits_df, keep_geom_type=True, how="intersection")
+        assert split_df["building_limit"].tolist() == [1] * 8 + [0] * 8
+
+    def test_only_polygonal_parts(self) -> None:
+        # The intersection consists of a polygon and a line
+        height_plateaus = np.array([shapely.Polygon([(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)])])
+        building_limits = np.array([shapely.Polygon([(1, 0), (2, 0), (2, 2), (1, 2)])])
+        geometries, _, _ = intersect_geometries(height_plateaus, building_limits)
+        assert shapely.get_type_id(geometries).tolist() == [shapely.GeometryType.MULTIPOLYGON]
+        assert shapely.equals(geometries[0], shapely.box(1, 0, 2, 1))
 
 
 class TestSplitBuildingLimitsByHeightPlateaus:
@@ -54,7 +165,8 @@ class TestSplitBuildingLimitsByHeightPlateaus:
 
     def test_overlapping_height_plateaus(self, overlapping_height_plateaus_testcase: Testcase) -> None:
         TestSplitBuildingLimitsByHeightPlateaus.common_failure(
-            overlapping_height_plateaus_testcase, "The height plateaus must not overlap with themselves"
+            overlapping_height_plateaus_testcase,
+            r"The height plateaus must not overlap with themselves \(features 0 and 1 overlap\)",
         )
 
     def test_overlapping_building_limits(self, overlapping_building_limits_testcase: Testcase) -> None:
@@ -66,3 +178,214 @@ class TestSplitBuildingLimitsByHeightPlateaus:
         TestSplitBuildingLimitsByHeightPlateaus.common_failure(
             height_plateaus_not_covering_testcase, "The height plateaus do not completely cover the building limits"
         )
+
+    def test_splitting_error_payload(self, height_plateaus_not_covering_testcase: Testcase) -> None:
+        with pytest.raises(SplittingError) as exc_info:
+            split_building_limits_by_height_plateaus(
+                BuildingLimits(**height_plateaus_not_covering_testcase["building_limits"]),
+                HeightPlateaus(**height_plateaus_not_covering_testcase["height_plateaus"]),
+            )
+        payload = exc_info.value.payload
+        assert payload["building_limit"] == 0
+        assert payload["uncovered"]["type"] == "Polygon"
+        # The payload survives pickling, e.g. when the error is raised in a process pool worker
+        unpickled = pickle.loads(pickle.dumps(exc_info.value))
+        assert str(unpickled) == str(exc_info.value)
+        assert unpickled.payload == payload
+
+
+class TestRunSplitPipeline:
+    def test_timings(self, vaterlandsparken_testcase: Testcase) -> None:
+        result = run_split_pipeline(
+            BuildingLimits(**vaterlandsparken_testcase["building_limits"]),
+            HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"]),
+        )
+        assert len(result.split.features) == 3
+        assert list(result.timings) == ["ingest", "validate", "cover_check", "intersect", "flatten", "summarize"]
+        assert all(duration >= 0 for duration in result.timings.values())
+
+    def test_order(self) -> None:
+        def feature_collection(polygons: npt.NDArray[np.object_], properties: list[dict[str, Any]]) -> dict[str, Any]:
+            features = [
+                {"type": "Feature", "geometry": shapely.geometry.mapping(polygon), "properties": properties}
+                for polygon, properties in zip(polygons, properties, strict=True)
+            ]
+            return {"type": "FeatureCollection", "features": features}
+
+        height_plateaus = grid(2)
+        # Right half first
+        building_limits = np.array([shapely.box(1, 0, 2, 2), shapely.box(0, 0, 1, 2)])
+        result = run_split_pipeline(
+            BuildingLimits(**feature_collection(building_limits, [{}, {}])),
+            HeightPlateaus(**feature_collection(height_plateaus, [{"elevation": float(i)} for i in range(4)])),
+        )
+        # By building limit, then by height plateau
+        assert result.provenance == {"height_plateaus": [1, 3, 0, 2], "building_limits": [0, 0, 1, 1]}
+
+    def test_trusted_split_equals_validated(self, vaterlandsparken_testcase: Testcase) -> None:
+        result = run_split_pipeline(
+            BuildingLimits(**vaterlandsparken_testcase["building_limits"]),
+            HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"]),
+        )
+        validated = Split(**result.geojson)
+        with warnings.catch_warnings():
+            # The trusted split must serialize without warnings about unexpected types
+            warnings.simplefilter("error")
+            assert result.split.model_dump_json() == validated.model_dump_json()
+            assert result.split.model_dump() == validated.model_dump()
+
+    def test_summary(self, vaterlandsparken_testcase: Testcase) -> None:
+        building_limits = BuildingLimits(**vaterlandsparken_testcase["building_limits"])
+        height_plateaus = HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"])
+        result = run_split_pipeline(building_limits, height_plateaus)
+        summary = SplitSummary(**result.summary)
+        assert summary.num_features == len(result.geojson["features"])
+        elevations = [feature.properties["elevation"] for feature in height_plateaus.features]
+        assert (summary.min_elevation, summary.max_elevation) == (min(elevations), max(elevations))
+        split_polygons = polygons_from_features(result.split.features)
+        assert summary.bbox == pytest.approx(shapely.total_bounds(split_polygons).tolist())
+        # The area in square metres matches the one in an equal area projection
+        area = GeoDataFrame(geometry=split_polygons, crs=CRS).to_crs("EPSG:3035").area.sum()
+        assert summary.area == pytest.approx(area, rel=1e-3)
+
+
+def feature_collection(polygons: npt.NDArray[np.object_], with_elevation: bool = False) -> dict[str, Any]:
+    features = [
+        {
+            "type": "Feature",
+            "geometry": shapely.geometry.mapping(polygon),
+            "properties": {"elevation": float(index)} if with_elevation else {},
+        }
+        for index, polygon in enumerate(polygons)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def feature(polygon: shapely.Polygon, elevation: float | None = None) -> dict[str, Any]:
+    properties = {} if elevation is None else {"elevation": elevation}
+    return {"type": "Feature", "geometry": shapely.geometry.mapping(polygon), "properties": properties}
+
+
+class TestApplyFeatureChanges:
+    @pytest.fixture
+    def features(self) -> list[dict[str, Any]]:
+        return list(BuildingLimits(**feature_collection(grid(2))).model_dump()["features"])
+
+    def test_changes(self, features: list[dict[str, Any]]) -> None:
+        changes = FeatureCollectionChanges(
+            added=[feature(shapely.box(5, 5, 6, 6))],
+            removed=[1],
+            modified=[
+                {"index": 0, "feature": {**features[0], "properties": {"name": "a"}}},
+                {"index": 2, "feature": feature(shapely.box(0, 1, 0.5, 2))},
+            ],
+        )
+        new_features, applied = apply_feature_changes(features, changes)
+        assert len(new_features) == 4
+        assert new_features[0]["properties"] == {"name": "a"}
+        assert applied.new_indices == [0, None, 1, 2]
+        # Only modifying properties does not change the geometry
+        assert applied.changed == [1, 3]
+        assert applied.is_geometry_changed
+
+    def test_properties_only(self, features: list[dict[str, Any]]) -> None:
+        changes = FeatureCollectionChanges(modified=[{"index": 3, "feature": {**features[3], "properties": {"a": 1}}}])
+        _, applied = apply_feature_changes(features, changes)
+        assert applied.changed == []
+        assert not applied.is_geometry_changed
+
+    @pytest.mark.parametrize(
+        "changes, match",
+        [
+            ({"removed": [4]}, "Feature 4 does not exist"),
+            ({"removed": [0], "modified": [{"index": 0, "feature": feature(shapely.box(0, 0, 1, 1))}]}, "both"),
+            ({"modified": [{"index": 0, "feature": feature(shapely.box(0, 0, 1, 1))}] * 2}, "more than once"),
+        ],
+    )
+    def test_invalid(self, features: list[dict[str, Any]], changes: dict[str, Any], match: str) -> None:
+        with pytest.raises(InvalidFeatureChangesError, match=match):
+            apply_feature_changes(features, FeatureCollectionChanges(**changes))
+
+
+class TestRunResplitPipeline:
+    @pytest.fixture
+    def previous(self) -> tuple[BuildingLimits, HeightPlateaus, SplitResult]:
+        building_limits = BuildingLimits(
+            **feature_collection(np.array([shapely.box(0.5, 0.5, 3.5, 1.5), shapely.box(0.5, 2, 3.5, 3.5)]))
+        )
+        height_plateaus = HeightPlateaus(**feature_collection(grid(4), with_elevation=True))
+        return building_limits, height_plateaus, run_split_pipeline(building_limits, height_plateaus)
+
+    def resplit(
+        self,
+        previous: tuple[BuildingLimits, HeightPlateaus, SplitResult],
+        building_limits_changes: dict[str, Any],
+        height_plateaus_changes: dict[str, Any],
+    ) -> SplitResult:
+        building_limits, height_plateaus, result = previous
+        building_limits_features, building_limits_applied = apply_feature_changes(
+            building_limits.model_dump()["features"], FeatureCollectionChanges(**building_limits_changes)
+        )
+        height_plateaus_features, height_plateaus_applied = apply_feature_changes(
+            height_plateaus.model_dump()["features"], FeatureCollectionChanges(**height_plateaus_changes)
+        )
+        new_building_limits = BuildingLimits(type="FeatureCollection", features=building_limits_features)
+        new_height_plateaus = HeightPlateaus(type="FeatureCollection", features=height_plateaus_features)
+        resplit = run_resplit_pipeline(
+            new_building_limits,
+            new_height_plateaus,
+            {"split": result.geojson, "summary": result.summary, "provenance": result.provenance},
+            building_limits_applied,
+            height_plateaus_applied,
+        )
+        # Same as splitting from scratch
+        expected = run_split_pipeline(new_building_limits, new_height_plateaus)
+        assert resplit.geojson == expected.geojson
+        assert resplit.provenance == expected.provenance
+        assert resplit.summary == expected.summary
+        return resplit
+
+    def test_elevation_only(self, previous: tuple[BuildingLimits, HeightPlateaus, SplitResult]) -> None:
+        changes = {"modified": [{"index": 5, "feature": feature(shapely.box(1, 1, 2, 2), elevation=42.0)}]}
+        result = self.resplit(previous, {}, changes)
+        # No geometry work at all
+        assert list(result.timings) == ["reuse", "merge", "summarize"]
+        assert result.summary["max_elevation"] == 42.0
+
+    def test_height_plateau_split_in_two(self, previous: tuple[BuildingLimits, HeightPlateaus, SplitResult]) -> None:
+        changes = {
+            "modified": [{"index": 5, "feature": feature(shapely.box(1, 1, 1.5, 2), elevation=1.0)}],
+            "added": [feature(shapely.box(1.5, 1, 2, 2), elevation=2.0)],
+        }
+        result = self.resplit(previous, {}, changes)
+        assert list(result.timings) == [
+            "reuse",
+            "ingest",
+            "validate",
+            "cover_check",
+            "intersect",
+            "flatten",
+            "merge",
+            "summarize",
+        ]
+
+    def test_building_limit_changed(self, previous: tuple[BuildingLimits, HeightPlateaus, SplitResult]) -> None:
+        changes = {
+            "modified": [{"index": 0, "feature": feature(shapely.box(0.25, 0.25, 3.5, 1.5))}],
+            "added": [feature(shapely.box(3.6, 0, 4, 4))],
+        }
+        self.resplit(previous, changes, {})
+
+    def test_building_limit_removed(self, previous: tuple[BuildingLimits, HeightPlateaus, SplitResult]) -> None:
+        self.resplit(previous, {"removed": [0]}, {})
+
+    def test_height_plateau_removed(self, previous: tuple[BuildingLimits, HeightPlateaus, SplitResult]) -> None:
+        with pytest.raises(SplittingError, match="do not completely cover") as exc_info:
+            self.resplit(previous, {}, {"removed": [5]})
+        assert exc_info.value.payload["building_limit"] == 0
+
+    def test_height_plateau_overlapping(self, previous: tuple[BuildingLimits, HeightPlateaus, SplitResult]) -> None:
+        changes = {"modified": [{"index": 5, "feature": feature(shapely.box(1, 1, 2.5, 2), elevation=1.0)}]}
+        with pytest.raises(SplittingError, match="height plateaus must not overlap") as exc_info:
+            self.resplit(previous, {}, changes)
+        assert exc_info.value.payload["overlapping_features"] == [(5, 6)]
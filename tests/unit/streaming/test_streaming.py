@@ -0,0 +1,97 @@
+import gzip
+import json
+from collections.abc import AsyncIterator, Iterable, Mapping
+from typing import Any
+
+import bson
+import pytest
+from arch_api.models.io import CreateSplitOutput, HeightPlateaus
+from arch_api.streaming import chunked, geojson_feature_collection, gzip_compressed, ndjson_lines, ndjson_records
+
+from tests.conftest import Testcase
+
+
+async def async_iter(items: Iterable[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+async def collect(parts: AsyncIterator[bytes]) -> bytes:
+    return b"".join([part async for part in parts])
+
+
+@pytest.fixture
+def docs(vaterlandsparken_testcase: Testcase) -> list[Mapping[str, Any]]:
+    height_plateaus = HeightPlateaus(**vaterlandsparken_testcase["height_plateaus"]).model_dump()
+    return [
+        {
+            "_id": bson.ObjectId(),
+            "project": "project",
+            "building_limits": vaterlandsparken_testcase["building_limits"],
+            "height_plateaus": height_plateaus,
+            "split": height_plateaus,
+            "summary": None,
+        }
+        for _ in range(3)
+    ]
+
+
+class TestNdjsonLines:
+    @pytest.mark.asyncio
+    async def test_full(self, docs: list[Mapping[str, Any]]) -> None:
+        lines = (await collect(ndjson_lines(async_iter(docs), None))).splitlines()
+        assert [json.loads(line) for line in lines] == [
+            json.loads(CreateSplitOutput.from_doc(doc).model_dump_json()) for doc in docs
+        ]
+
+    @pytest.mark.asyncio
+    async def test_fields(self, docs: list[Mapping[str, Any]]) -> None:
+        lines = (await collect(ndjson_lines(async_iter(docs), ["summary"]))).splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"project": "project", "id": str(doc["_id"]), "summary": None} for doc in docs
+        ]
+
+
+class TestGeojsonFeatureCollection:
+    @pytest.mark.asyncio
+    async def test_features(self, docs: list[Mapping[str, Any]]) -> None:
+        feature_collection = json.loads(await collect(geojson_feature_collection(async_iter(docs))))
+        features = feature_collection["features"]
+        assert len(features) == sum(len(doc["split"]["features"]) for doc in docs)
+        assert [feature["properties"]["split_id"] for feature in features[:2]] == [str(docs[0]["_id"])] * 2
+
+    @pytest.mark.asyncio
+    async def test_empty(self) -> None:
+        assert json.loads(await collect(geojson_feature_collection(async_iter([])))) == {
+            "type": "FeatureCollection",
+            "features": [],
+        }
+
+
+class TestChunked:
+    @pytest.mark.asyncio
+    async def test_chunk_size(self) -> None:
+        chunks = [chunk async for chunk in chunked(async_iter([b"ab"] * 10), chunk_size=5)]
+        assert [len(chunk) for chunk in chunks] == [6, 6, 6, 2]
+        assert b"".join(chunks) == b"ab" * 10
+
+
+class TestGzipCompressed:
+    @pytest.mark.asyncio
+    async def test_round_trip(self) -> None:
+        data = [b"line %d\n" % i for i in range(1000)]
+        assert gzip.decompress(await collect(gzip_compressed(async_iter(data)))) == b"".join(data)
+
+
+class TestNdjsonRecords:
+    @pytest.mark.asyncio
+    async def test_split_across_chunks(self) -> None:
+        chunks = [b'{"a": 1}\n{"b"', b": 2}\n\n", b'{"c": 3}']
+        records = [record async for record in ndjson_records(async_iter(chunks))]
+        assert records == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (4, b'{"c": 3}')]
+
+    @pytest.mark.asyncio
+    async def test_too_long(self) -> None:
+        chunks = [b"1234", b"56\n12\n", b"1234", b"567", b"\n123456789"]
+        records = [record async for record in ndjson_records(async_iter(chunks), max_size=5)]
+        assert records == [(1, None), (2, b"12"), (3, None), (4, None)]
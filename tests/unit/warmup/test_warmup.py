@@ -0,0 +1,26 @@
+import asyncio
+import sys
+
+import pytest
+from arch_api.warmup import BackgroundImport
+
+
+class TestBackgroundImport:
+    @pytest.mark.asyncio
+    async def test_ready(self) -> None:
+        background_import = BackgroundImport("json", "tabnanny")
+        await background_import.ready()
+        assert "tabnanny" in sys.modules
+        # Waiting again, e.g. for the next request, returns right away
+        await asyncio.wait_for(background_import.ready(), timeout=0.1)
+
+    @pytest.mark.asyncio
+    async def test_import_error(self) -> None:
+        background_import = BackgroundImport("arch_api.does_not_exist")
+        with pytest.raises(ImportError):
+            await background_import.ready()
+
+    def test_other_event_loop(self) -> None:
+        background_import = BackgroundImport("json")
+        asyncio.run(background_import.ready())
+        asyncio.run(background_import.ready())
@@ -8,7 +8,7 @@ import matplotlib.pyplot as plt
 import requests
 
 # Use the same CRS as in the API
-from arch_api.splitting import CRS
+from arch_api.geometry import CRS
 from dotenv import load_dotenv
 
 from tests.conftest import load_testcase